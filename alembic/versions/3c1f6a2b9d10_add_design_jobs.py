@@ -0,0 +1,45 @@
+"""Add design jobs queue
+
+Revision ID: 3c1f6a2b9d10
+Revises: 1704d953ad78
+Create Date: 2026-10-17 10:12:31.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f6a2b9d10'
+down_revision: Union[str, None] = '1704d953ad78'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('design_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=True),
+    sa.Column('stage', sa.String(), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_design_jobs_id'), 'design_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_design_jobs_status'), 'design_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_design_jobs_status'), table_name='design_jobs')
+    op.drop_index(op.f('ix_design_jobs_id'), table_name='design_jobs')
+    op.drop_table('design_jobs')
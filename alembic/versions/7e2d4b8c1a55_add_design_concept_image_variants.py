@@ -0,0 +1,26 @@
+"""Add design concept image variants
+
+Revision ID: 7e2d4b8c1a55
+Revises: 3c1f6a2b9d10
+Create Date: 2026-10-17 11:40:08.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2d4b8c1a55'
+down_revision: Union[str, None] = '3c1f6a2b9d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('design_concepts', sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('design_concepts', 'image_variants')
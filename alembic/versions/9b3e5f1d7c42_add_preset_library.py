@@ -0,0 +1,44 @@
+"""Add preset design library
+
+Revision ID: 9b3e5f1d7c42
+Revises: 7e2d4b8c1a55
+Create Date: 2026-10-17 14:05:42.611937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e5f1d7c42'
+down_revision: Union[str, None] = '7e2d4b8c1a55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('preset_library',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('combination_key', sa.String(), nullable=False),
+    sa.Column('property_type', sa.String(), nullable=False),
+    sa.Column('design_style', sa.String(), nullable=False),
+    sa.Column('room_type', sa.String(), nullable=False),
+    sa.Column('budget_range', sa.String(), nullable=False),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('last_requested_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('concept_id', sa.Integer(), nullable=True),
+    sa.Column('generated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('served_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['concept_id'], ['design_concepts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_preset_library_id'), 'preset_library', ['id'], unique=False)
+    op.create_index(op.f('ix_preset_library_combination_key'), 'preset_library', ['combination_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_preset_library_combination_key'), table_name='preset_library')
+    op.drop_index(op.f('ix_preset_library_id'), table_name='preset_library')
+    op.drop_table('preset_library')
@@ -0,0 +1,47 @@
+"""Add AI call accounting
+
+Revision ID: c4a7d2e9f013
+Revises: 9b3e5f1d7c42
+Create Date: 2026-10-17 15:22:10.874412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7d2e9f013'
+down_revision: Union[str, None] = '9b3e5f1d7c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ai_calls',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('provider', sa.String(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.Column('endpoint', sa.String(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+    sa.Column('completion_tokens', sa.Integer(), nullable=True),
+    sa.Column('images', sa.Integer(), nullable=True),
+    sa.Column('estimated_tokens', sa.Boolean(), nullable=True),
+    sa.Column('cost_usd', sa.Float(), nullable=True),
+    sa.Column('latency_ms', sa.Float(), nullable=True),
+    sa.Column('outcome', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ai_calls_id'), 'ai_calls', ['id'], unique=False)
+    op.create_index(op.f('ix_ai_calls_created_at'), 'ai_calls', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ai_calls_created_at'), table_name='ai_calls')
+    op.drop_index(op.f('ix_ai_calls_id'), table_name='ai_calls')
+    op.drop_table('ai_calls')
@@ -0,0 +1,40 @@
+"""Add estimation audit cache
+
+Revision ID: d81f3b6a5e27
+Revises: c4a7d2e9f013
+Create Date: 2026-10-17 16:48:31.093554
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3b6a5e27'
+down_revision: Union[str, None] = 'c4a7d2e9f013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('estimation_audits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('estimation_id', sa.Integer(), nullable=True),
+    sa.Column('fingerprint', sa.String(), nullable=False),
+    sa.Column('result', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['estimation_id'], ['estimations.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_estimation_audits_id'), 'estimation_audits', ['id'], unique=False)
+    op.create_index(op.f('ix_estimation_audits_project_id'), 'estimation_audits', ['project_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_estimation_audits_project_id'), table_name='estimation_audits')
+    op.drop_index(op.f('ix_estimation_audits_id'), table_name='estimation_audits')
+    op.drop_table('estimation_audits')
@@ -0,0 +1,26 @@
+"""Add area bucket to preset library combinations
+
+Revision ID: e6b2a4c8d913
+Revises: d81f3b6a5e27
+Create Date: 2026-10-17 18:42:10.274513
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b2a4c8d913'
+down_revision: Union[str, None] = 'd81f3b6a5e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('preset_library', sa.Column('area_bucket', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('preset_library', 'area_bucket')
@@ -0,0 +1,543 @@
+"""
+Local stand-in for the AI providers (ProxyAPI / OpenAI and Gemini)
+
+Serves the endpoints the app uses, so it can be load-tested and benchmarked
+without live keys:
+
+- ``POST /proxyapi/openai/v1/chat/completions`` (including ``stream: true``)
+- ``POST /proxyapi/openai/v1/images/generations``
+- ``POST /gemini/{version}/models/{model}:generateContent``
+- ``POST /gemini/{version}/models/{model}:streamGenerateContent``
+- ``POST /gemini/{version}/models/{model}:predict`` (Imagen)
+
+Three modes:
+
+- fake (default): synthetic responses with latencies drawn from a profile
+  and optional 5xx / 429 injection
+- record: forwards to the real providers and appends every exchange to a
+  cassette (JSON lines; API keys are never written)
+- replay: answers from a cassette. The n-th identical request gets the n-th
+  recorded response, with the recorded latency, so runs are repeatable
+
+Usage:
+    python scripts/fake_ai_provider.py --profile realistic --error-rate 0.05
+    python scripts/fake_ai_provider.py --record cassettes/design.jsonl
+    python scripts/fake_ai_provider.py --replay cassettes/design.jsonl
+
+Point the app at it (e.g. in .env):
+    PROXYAPI_BASE_URL=http://localhost:8900/proxyapi
+    GEMINI_BASE_URL=http://localhost:8900/gemini
+    GOOGLE_API_KEY=fake
+
+Settings can be changed while running via ``POST /_fake/config`` (same keys
+as ``GET /_fake/config``); counters are at ``GET /_fake/stats``.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# Latency profiles: (median_ms, p95_ms) per call kind, plus the gap between
+# streamed chunks. Latencies are drawn from a log-normal distribution.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "instant": {"text": (0, 0), "image": (0, 0), "chunk_ms": 0},
+    "fast": {"text": (80, 250), "image": (150, 500), "chunk_ms": 5},
+    "realistic": {"text": (8000, 25000), "image": (15000, 40000), "chunk_ms": 40},
+    "degraded": {"text": (25000, 70000), "image": (45000, 100000), "chunk_ms": 150},
+}
+
+UPSTREAMS = {
+    "proxyapi": "https://api.proxyapi.ru",
+    "gemini": "https://generativelanguage.googleapis.com",
+}
+
+# Headers worth keeping in a cassette (never auth headers)
+RECORDED_HEADERS = ("content-type", "retry-after", "x-ratelimit-remaining-requests", "x-ratelimit-reset-requests")
+FORWARDED_HEADERS = ("authorization", "x-goog-api-key", "content-type", "accept")
+ASSET_PLACEHOLDER = "{FAKE_BASE_URL}"
+
+STYLES = ["Contemporary Luxury", "Modern Arabic", "Minimalist Coastal", "Art Deco Revival", "Desert Modernism"]
+PALETTES = [
+    [("Ivory White", "#FFFFF0"), ("Champagne Gold", "#D4AF37"), ("Warm Taupe", "#8B7D6B"), ("Charcoal", "#36454F")],
+    [("Sand Beige", "#E8D5B7"), ("Deep Teal", "#014D4E"), ("Terracotta", "#E2725B"), ("Soft Linen", "#FAF0E6")],
+    [("Pearl Grey", "#EAE0C8"), ("Midnight Blue", "#191970"), ("Brushed Brass", "#B5A642"), ("Onyx", "#353839")],
+]
+MATERIALS = ["Calacatta marble", "smoked oak", "travertine", "brushed brass", "fluted walnut", "honed limestone"]
+FURNITURE = ["a low bouclé sofa", "a sculptural coffee table", "velvet lounge chairs", "a hand-knotted silk rug"]
+
+
+class FakeConfig:
+    """Runtime-adjustable behaviour of the fake"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.profile = args.profile
+        self.latency_scale = args.latency_scale
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.random = random.Random(args.seed)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "latency_scale": self.latency_scale,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "retry_after": self.retry_after,
+        }
+
+    def update(self, values: Dict[str, Any]) -> None:
+        if "profile" in values and values["profile"] not in PROFILES:
+            raise ValueError(f"Unknown profile {values['profile']!r}; choose from {sorted(PROFILES)}")
+        for key in self.as_dict():
+            if key in values:
+                setattr(self, key, type(getattr(self, key))(values[key]))
+        if "seed" in values:
+            self.random = random.Random(values["seed"])
+
+    def latency(self, kind: str) -> float:
+        """Seconds to wait before answering a ``kind`` ("text"/"image") call"""
+        median_ms, p95_ms = PROFILES[self.profile][kind]
+        if median_ms <= 0:
+            return 0.0
+        sigma = math.log(p95_ms / median_ms) / 1.645 if p95_ms > median_ms else 0.0
+        return self.random.lognormvariate(math.log(median_ms), sigma) / 1000 * self.latency_scale
+
+    def chunk_delay(self) -> float:
+        return PROFILES[self.profile]["chunk_ms"] / 1000 * self.latency_scale
+
+    def injected_error(self) -> Optional[int]:
+        """Status code to fail this call with, if any"""
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return self.random.choice([500, 502, 503])
+        return None
+
+
+class Cassette:
+    """
+    Recorded exchanges, stored as JSON lines
+
+    Each line is either an interaction (request key, status, headers, body or
+    streamed chunks with their offsets, elapsed time) or an image asset
+    (bytes referenced from a recorded response).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.interactions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.assets: Dict[str, bytes] = {}
+        self._served: Counter = Counter()
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "asset" in entry:
+                    self.assets[entry["asset"]] = base64.b64decode(entry["body_b64"])
+                else:
+                    self.interactions[entry["key"]].append(entry)
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        if "asset" in entry:
+            self.assets[entry["asset"]] = base64.b64decode(entry["body_b64"])
+        else:
+            self.interactions[entry["key"]].append(entry)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def next_for(self, key: str) -> Optional[Dict[str, Any]]:
+        """The n-th recording for the n-th identical request (the last one repeats)"""
+        recordings = self.interactions.get(key)
+        if not recordings:
+            return None
+        index = min(self._served[key], len(recordings) - 1)
+        self._served[key] += 1
+        return recordings[index]
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Match requests by method, path and canonical JSON body"""
+    try:
+        canonical = json.dumps(json.loads(body or b"null"), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        canonical = hashlib.sha256(body).hexdigest()
+    return hashlib.sha256(f"{method} {path} {canonical}".encode("utf-8")).hexdigest()
+
+
+def _seed_for(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:12], 16)
+
+
+def fake_design_text(prompt: str) -> str:
+    """A design-concept-shaped answer, deterministic per prompt"""
+    rng = random.Random(_seed_for(prompt))
+    style = rng.choice(STYLES)
+    palette = rng.choice(PALETTES)
+    materials = rng.sample(MATERIALS, 3)
+    furniture = rng.sample(FURNITURE, 2)
+    colours = "\n".join(f"- {name} ({hex_code})" for name, hex_code in palette)
+    return (
+        f"1. DESIGN STYLE: {style}\n"
+        f"A calm, layered interior that balances {materials[0]} with warm textiles and soft daylight.\n\n"
+        f"2. COLOR PALETTE:\n{colours}\n\n"
+        f"3. MAIN DESIGN ELEMENTS:\n"
+        f"Flooring in {materials[0]} with a honed finish. Walls in {materials[1]} panels. "
+        f"A coffered ceiling with concealed linear lighting and {materials[2]} accents.\n"
+        f"Furniture: {furniture[0]} facing {furniture[1]}.\n\n"
+        f"4. MOOD AND AMBIENCE:\nSerene and refined, glowing at dusk.\n"
+    )
+
+
+def render_image(seed: str, width: int = 1024, height: int = 1024, image_format: str = "PNG") -> bytes:
+    """A flat-coloured placeholder render, deterministic per seed"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(_seed_for(seed))
+    colour = tuple(rng.randrange(60, 230) for _ in range(3))
+    accent = tuple(255 - c for c in colour)
+    image = Image.new("RGB", (width, height), colour)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([width // 4, height // 3, width * 3 // 4, height * 2 // 3], fill=accent)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=85)
+    return buffer.getvalue()
+
+
+def error_response(provider: str, status_code: int, config: FakeConfig) -> JSONResponse:
+    """An error shaped like the provider's own"""
+    headers = {}
+    if status_code == 429:
+        headers = {
+            "retry-after": str(config.retry_after),
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": f"{config.retry_after}s",
+        }
+    message = "Rate limit reached (injected)" if status_code == 429 else "Upstream error (injected)"
+    if provider == "gemini":
+        status_name = "RESOURCE_EXHAUSTED" if status_code == 429 else "UNAVAILABLE"
+        body = {"error": {"code": status_code, "message": message, "status": status_name}}
+    else:
+        body = {"error": {"message": message, "type": "fake_error", "code": status_code}}
+    return JSONResponse(body, status_code=status_code, headers=headers)
+
+
+def _sse(payload: Any) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _words(text: str, size: int = 4) -> List[str]:
+    words = text.split(" ")
+    return [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "") for i in range(0, len(words), size)]
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    config = FakeConfig(args)
+    cassette = Cassette(Path(args.record or args.replay)) if (args.record or args.replay) else None
+    mode = "record" if args.record else "replay" if args.replay else "fake"
+    upstreams = {"proxyapi": args.proxyapi_upstream, "gemini": args.gemini_upstream}
+    stats: Counter = Counter()
+    state: Dict[str, Any] = {}
+
+    app = FastAPI(title="Fake AI provider", docs_url=None, redoc_url=None)
+
+    def upstream_client() -> httpx.AsyncClient:
+        if state.get("client") is None:
+            state["client"] = httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=10.0))
+        return state["client"]
+
+    @app.on_event("shutdown")
+    async def close_client():
+        if state.get("client") is not None:
+            await state["client"].aclose()
+
+    # --- fake responses ----------------------------------------------------
+
+    async def fake_chat(request: Request, body: Dict[str, Any]) -> Response:
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        content = fake_design_text(prompt)
+        created = int(time.time())
+        model = body.get("model", "gpt-4")
+        await asyncio.sleep(config.latency("text"))
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": f"chatcmpl-fake-{_seed_for(prompt):x}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4},
+            })
+
+        async def events() -> AsyncIterator[str]:
+            for piece in _words(content):
+                yield _sse({"object": "chat.completion.chunk", "created": created, "model": model,
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+                await asyncio.sleep(config.chunk_delay())
+            yield _sse({"object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield _sse({"object": "chat.completion.chunk", "created": created, "model": model, "choices": [],
+                            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                                      "total_tokens": (len(prompt) + len(content)) // 4}})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def fake_openai_images(request: Request, body: Dict[str, Any]) -> Response:
+        prompt = body.get("prompt", "")
+        size = body.get("size", "1024x1024")
+        await asyncio.sleep(config.latency("image"))
+        base = str(request.base_url).rstrip("/")
+        # Every call renders new images, like the real API (reproducible with --seed)
+        seed = f"{_seed_for(prompt):x}-{config.random.getrandbits(32):08x}"
+        return JSONResponse({
+            "created": int(time.time()),
+            "data": [
+                {"url": f"{base}/fake/images/{seed}-{i}.png?size={size}", "revised_prompt": prompt}
+                for i in range(max(1, int(body.get("n", 1))))
+            ],
+        })
+
+    async def fake_gemini(request: Request, model: str, action: str, body: Dict[str, Any]) -> Response:
+        if action == "predict":
+            # Imagen: base64 JPEG bytes per image
+            prompt = (body.get("instances") or [{}])[0].get("prompt", "")
+            count = int((body.get("parameters") or {}).get("sampleCount", 1))
+            await asyncio.sleep(config.latency("image"))
+            return JSONResponse({"predictions": [
+                {"bytesBase64Encoded": base64.b64encode(render_image(f"{prompt}-{i}", 1024, 768, "JPEG")).decode("ascii"),
+                 "mimeType": "image/jpeg"}
+                for i in range(max(1, count))
+            ]})
+
+        prompt = "\n".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in (content.get("parts", []) if isinstance(content, dict) else [])
+        )
+        text = fake_design_text(prompt)
+        await asyncio.sleep(config.latency("text"))
+
+        def candidate(piece: str, finish: Optional[str]) -> Dict[str, Any]:
+            entry: Dict[str, Any] = {"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}
+            if finish:
+                entry["finishReason"] = finish
+            return {"candidates": [entry], "modelVersion": model}
+
+        if action == "generateContent":
+            return JSONResponse({
+                **candidate(text, "STOP"),
+                "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                                  "totalTokenCount": (len(prompt) + len(text)) // 4},
+            })
+
+        async def events() -> AsyncIterator[str]:
+            pieces = _words(text)
+            for i, piece in enumerate(pieces):
+                yield _sse(candidate(piece, "STOP" if i == len(pieces) - 1 else None))
+                await asyncio.sleep(config.chunk_delay())
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # --- record / replay ---------------------------------------------------
+
+    async def record(request: Request, provider: str, upstream_path: str, raw: bytes, key: str) -> Response:
+        url = f"{upstreams[provider]}{upstream_path}"
+        if request.url.query:
+            url += f"?{request.url.query}"
+        headers = {name: value for name, value in request.headers.items() if name in FORWARDED_HEADERS}
+        client = upstream_client()
+        started = time.perf_counter()
+        upstream_request = client.build_request(request.method, url, content=raw, headers=headers)
+        upstream = await client.send(upstream_request, stream=True)
+        kept_headers = {name: value for name, value in upstream.headers.items() if name in RECORDED_HEADERS}
+        entry = {"key": key, "method": request.method, "path": request.url.path, "status": upstream.status_code,
+                 "headers": kept_headers}
+
+        if "text/event-stream" in upstream.headers.get("content-type", ""):
+            async def relay() -> AsyncIterator[str]:
+                chunks = []
+                try:
+                    async for text in upstream.aiter_text():
+                        chunks.append([round((time.perf_counter() - started) * 1000, 1), text])
+                        yield text
+                finally:
+                    await upstream.aclose()
+                    cassette.append({**entry, "chunks": chunks,
+                                     "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+                    stats["recorded"] += 1
+
+            return StreamingResponse(relay(), status_code=upstream.status_code, headers=kept_headers)
+
+        content = await upstream.aread()
+        await upstream.aclose()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        if upstream_path.endswith("/images/generations") and upstream.status_code == 200:
+            # Provider image URLs expire; keep the bytes and serve them ourselves
+            content = await _capture_assets(content)
+        cassette.append({**entry, "body": content.decode("utf-8", errors="replace"), "elapsed_ms": elapsed_ms})
+        stats["recorded"] += 1
+        body = content.replace(ASSET_PLACEHOLDER.encode(), str(request.base_url).rstrip("/").encode())
+        return Response(body, status_code=upstream.status_code, headers=kept_headers)
+
+    async def _capture_assets(content: bytes) -> bytes:
+        payload = json.loads(content)
+        for item in payload.get("data", []):
+            if not item.get("url"):
+                continue
+            image = await upstream_client().get(item["url"])
+            image.raise_for_status()
+            digest = hashlib.sha256(image.content).hexdigest()
+            if digest not in cassette.assets:
+                cassette.append({"asset": digest, "body_b64": base64.b64encode(image.content).decode("ascii")})
+            item["url"] = f"{ASSET_PLACEHOLDER}/fake/assets/{digest}"
+        return json.dumps(payload).encode("utf-8")
+
+    async def replay(request: Request, key: str) -> Response:
+        entry = cassette.next_for(key)
+        if entry is None:
+            stats["replay_misses"] += 1
+            if args.replay_miss == "fake":
+                return None
+            return JSONResponse({"error": {"message": f"No recording for {request.method} {request.url.path}",
+                                           "type": "cassette_miss"}}, status_code=404)
+        stats["replay_hits"] += 1
+        scale = 0.0 if args.replay_latency == "none" else config.latency_scale
+        base = str(request.base_url).rstrip("/")
+
+        if "chunks" in entry:
+            async def events() -> AsyncIterator[str]:
+                previous = 0.0
+                for offset_ms, text in entry["chunks"]:
+                    await asyncio.sleep(max(0.0, offset_ms - previous) / 1000 * scale)
+                    previous = offset_ms
+                    yield text
+
+            return StreamingResponse(events(), status_code=entry["status"], headers=entry["headers"])
+
+        await asyncio.sleep(entry.get("elapsed_ms", 0) / 1000 * scale)
+        return Response(entry["body"].replace(ASSET_PLACEHOLDER, base), status_code=entry["status"],
+                        headers=entry["headers"])
+
+    # --- routes ------------------------------------------------------------
+
+    async def dispatch(request: Request, provider: str, upstream_path: str, handler) -> Response:
+        raw = await request.body()
+        stats[f"{provider}:{upstream_path.rsplit('/', 1)[-1]}"] += 1
+        key = request_key(request.method, upstream_path, raw)
+
+        if mode == "record":
+            return await record(request, provider, upstream_path, raw, key)
+        if mode == "replay":
+            response = await replay(request, key)
+            if response is not None:
+                return response
+
+        status_code = config.injected_error()
+        if status_code is not None:
+            stats[f"injected_{status_code}"] += 1
+            await asyncio.sleep(config.latency("text") / 10)
+            return error_response(provider, status_code, config)
+        return await handler(json.loads(raw or b"{}"))
+
+    @app.post("/proxyapi/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        return await dispatch(request, "proxyapi", "/openai/v1/chat/completions",
+                              lambda body: fake_chat(request, body))
+
+    @app.post("/proxyapi/openai/v1/images/generations")
+    async def images_generations(request: Request):
+        return await dispatch(request, "proxyapi", "/openai/v1/images/generations",
+                              lambda body: fake_openai_images(request, body))
+
+    @app.post("/gemini/{version}/models/{model_action}")
+    async def gemini_models(version: str, model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        if action not in ("generateContent", "streamGenerateContent", "predict"):
+            return JSONResponse({"error": {"code": 404, "message": f"Unsupported action {action!r}",
+                                           "status": "NOT_FOUND"}}, status_code=404)
+        return await dispatch(request, "gemini", f"/{version}/models/{model_action}",
+                              lambda body: fake_gemini(request, model, action, body))
+
+    @app.get("/fake/images/{name}")
+    async def fake_image(name: str, size: str = "1024x1024"):
+        try:
+            width, height = (max(16, min(2048, int(v))) for v in size.lower().split("x"))
+        except ValueError:
+            width = height = 1024
+        return Response(render_image(name, width, height), media_type="image/png")
+
+    @app.get("/fake/assets/{digest}")
+    async def cassette_asset(digest: str):
+        if cassette is None or digest not in cassette.assets:
+            return JSONResponse({"detail": "Unknown asset"}, status_code=404)
+        data = cassette.assets[digest]
+        media_type = "image/png" if data.startswith(b"\x89PNG") else "image/jpeg"
+        return Response(data, media_type=media_type)
+
+    @app.get("/_fake/config")
+    async def get_config():
+        return {"mode": mode, **config.as_dict(), "profiles": PROFILES}
+
+    @app.post("/_fake/config")
+    async def set_config(request: Request):
+        try:
+            config.update(await request.json())
+        except (ValueError, TypeError) as e:
+            return JSONResponse({"detail": str(e)}, status_code=400)
+        return {"mode": mode, **config.as_dict()}
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return {"mode": mode, "counters": dict(stats)}
+
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local stand-in for the ProxyAPI and Gemini endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast", help="Latency profile")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every latency by this factor")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with 5xx")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls failing with 429")
+    parser.add_argument("--retry-after", type=int, default=2, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latencies and injected errors")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--record", metavar="CASSETTE", help="Forward to the real providers and record")
+    modes.add_argument("--replay", metavar="CASSETTE", help="Answer from a recorded cassette")
+    parser.add_argument("--replay-latency", choices=["recorded", "none"], default="recorded")
+    parser.add_argument("--replay-miss", choices=["error", "fake"], default="error",
+                        help="On a request missing from the cassette: 404, or a synthetic response")
+    parser.add_argument("--proxyapi-upstream", default=UPSTREAMS["proxyapi"])
+    parser.add_argument("--gemini-upstream", default=UPSTREAMS["gemini"])
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    arguments = parse_args()
+    print(f"🧪 Fake AI provider on http://{arguments.host}:{arguments.port} "
+          f"(mode: {'record' if arguments.record else 'replay' if arguments.replay else 'fake'}, "
+          f"profile: {arguments.profile})")
+    uvicorn.run(create_app(arguments), host=arguments.host, port=arguments.port, log_level="warning")
@@ -0,0 +1,173 @@
+"""
+Content-addressed blob store for generated images
+
+Blobs are keyed by the SHA-256 of their bytes, so identical renders are stored
+once and a key never changes content. Files are written atomically (temp file
++ ``os.replace``) under ``<storage>/media/<key[:2]>/<key>`` and served by the
+media route with immutable cache headers.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config.settings import settings, BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Magic-byte prefixes of the image formats providers return
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def sniff_content_type(head: bytes) -> str:
+    """Guess an image content type from the first bytes of a blob"""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class BlobStore:
+    """
+    Deduplicating, atomic file store keyed by SHA-256
+
+    Args:
+        root: Directory holding the blobs
+        url_prefix: Public URL prefix the media route is mounted at
+    """
+
+    def __init__(self, root: Path, url_prefix: str):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self._download_client: Optional[httpx.AsyncClient] = None
+        self._stats = {"writes": 0, "deduplicated": 0, "bytes_written": 0, "downloads": 0, "download_errors": 0}
+
+    def path_for(self, digest: str) -> Optional[Path]:
+        """Path of a blob, or None if the key is malformed"""
+        if not _DIGEST_RE.match(digest):
+            return None
+        return self.root / digest[:2] / digest
+
+    def url_for(self, digest: str) -> str:
+        return f"{self.url_prefix}/{digest}"
+
+    def digest_from_url(self, url: Optional[str]) -> Optional[str]:
+        """Key of a media URL produced by this store, else None"""
+        if not url or not url.startswith(self.url_prefix + "/"):
+            return None
+        digest = url[len(self.url_prefix) + 1:].split("?", 1)[0]
+        return digest if _DIGEST_RE.match(digest) else None
+
+    def exists(self, digest: str) -> bool:
+        path = self.path_for(digest)
+        return path is not None and path.exists()
+
+    def put(self, data: bytes) -> str:
+        """Store bytes (blocking) and return their key"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            self._stats["deduplicated"] += 1
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._stats["writes"] += 1
+        self._stats["bytes_written"] += len(data)
+        return digest
+
+    async def put_async(self, data: bytes) -> str:
+        """Store bytes without blocking the event loop and return their media URL"""
+        digest = await asyncio.to_thread(self.put, data)
+        if settings.media_eager_derivatives:
+            from ai_modules.image_derivatives import derivative_generator
+
+            derivative_generator.schedule(self.path_for(digest), digest)
+        return self.url_for(digest)
+
+    @property
+    def download_client(self) -> httpx.AsyncClient:
+        # Separate from the ProxyAPI pool: provider image URLs live on other
+        # hosts and must not receive our API key
+        if self._download_client is None or self._download_client.is_closed:
+            self._download_client = httpx.AsyncClient(
+                timeout=settings.media_download_timeout, follow_redirects=True
+            )
+        return self._download_client
+
+    async def store_from_url(self, url: str) -> str:
+        """
+        Download a remote image into the store and return its media URL
+
+        Raises:
+            httpx.HTTPError: If the download fails
+            ValueError: If the image exceeds ``media_max_download_mb``
+        """
+        limit = settings.media_max_download_mb * 1024 * 1024
+        try:
+            async with self.download_client.stream("GET", url) as response:
+                response.raise_for_status()
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > limit:
+                        raise ValueError(f"Image at {url} exceeds {settings.media_max_download_mb} MB")
+                    chunks.append(chunk)
+        except Exception:
+            self._stats["download_errors"] += 1
+            raise
+        self._stats["downloads"] += 1
+        return await self.put_async(b"".join(chunks))
+
+    async def localize_urls(self, urls: List[str]) -> List[str]:
+        """
+        Replace expiring provider URLs with media URLs, concurrently.
+        URLs that fail to download are kept as they are.
+        """
+        async def localize(url: str) -> str:
+            if self.digest_from_url(url) or not url.startswith(("http://", "https://")):
+                return url
+            try:
+                return await self.store_from_url(url)
+            except Exception as e:
+                logger.warning(f"Could not store image {url[:80]}: {e!r}")
+                return url
+
+        return list(await asyncio.gather(*(localize(url) for url in urls)))
+
+    async def aclose(self) -> None:
+        if self._download_client is not None:
+            await self._download_client.aclose()
+            self._download_client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"root": str(self.root), **self._stats}
+
+
+# Global store instance
+blob_store = BlobStore(
+    root=Path(settings.media_dir) if settings.media_dir else BASE_DIR / "storage" / "media",
+    url_prefix=settings.media_url_prefix,
+)
@@ -0,0 +1,131 @@
+"""
+Per-request deadlines
+
+A request handler opens a ``deadline_scope`` with its time budget; the
+absolute deadline is kept in a context variable, so it follows the request
+into pipeline stages, tasks and ``asyncio.to_thread`` calls without being
+passed around. Downstream code asks for the ``remaining`` budget and caps its
+own timeouts with it, and code with a cheap fallback checks ``expired`` to
+switch to it immediately instead of starting work that cannot finish.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Absolute deadline on the time.monotonic() clock, None when unbounded
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when the request's time budget runs out"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget (None when unbounded)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired() -> bool:
+    """Whether the current request's budget is used up"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(what: str = "request") -> None:
+    """Raise DeadlineExceeded if the budget is used up"""
+    if expired():
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+
+
+def timeout_for(timeout: Optional[float]) -> Optional[float]:
+    """
+    Cap a timeout by the remaining budget
+
+    Returns:
+        The smaller of ``timeout`` and the remaining budget (None if both are unbounded)
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def fits(seconds: float) -> bool:
+    """Whether ``seconds`` of waiting still leaves some budget"""
+    left = remaining()
+    return left is None or seconds < left
+
+
+async def run_within(awaitable: Awaitable[T], what: str = "call") -> T:
+    """
+    Await ``awaitable`` for at most the remaining budget
+
+    Raises:
+        DeadlineExceeded: If the budget runs out first (the awaitable is cancelled)
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded) or not expired():
+            raise
+        raise DeadlineExceeded(f"Deadline exceeded during {what}") from e
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Bound the enclosed code by ``seconds`` from now
+
+    An enclosing, tighter deadline stays in force; ``None`` leaves the
+    current deadline unchanged.
+
+    Yields:
+        The absolute deadline in effect (time.monotonic() clock) or None
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        proposed = time.monotonic() + max(0.0, seconds)
+        deadline = proposed if current is None else min(current, proposed)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def budget_from_header(value: Optional[str], default: float, maximum: float) -> float:
+    """
+    Time budget for a request from its ``X-Request-Deadline`` header
+
+    The header holds the budget in seconds ("30", "1.5"), as a duration
+    ("1m30s") or as an HTTP date. Missing or malformed values fall back to
+    ``default``; the result is capped at ``maximum``.
+    """
+    from ai_modules.resilience import parse_duration
+
+    budget = parse_duration(value) if value else None
+    if budget is None:
+        budget = default
+    return min(budget, maximum)
+
+
+def remaining_ms() -> Optional[float]:
+    """Remaining budget in milliseconds for logs and timings"""
+    left = remaining()
+    return None if left is None else round(left * 1000, 1)
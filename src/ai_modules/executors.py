@@ -0,0 +1,170 @@
+"""
+Bounded, metered thread pools for blocking work called from async code
+
+Blocking SDK calls and CPU-bound work must not run on the event loop. Each
+``MeteredExecutor`` owns a dedicated thread pool with a fixed size and an
+optional queue limit, and tracks queue depth and timings for monitoring.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when an executor's queue limit is reached"""
+
+
+class MeteredExecutor:
+    """
+    Dedicated thread pool with queue-depth and latency metrics
+
+    Args:
+        name: Name used for thread names and stats
+        max_workers: Number of worker threads
+        max_queue: Maximum number of calls waiting for a worker (None for unbounded)
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "wait_ms_sum": 0.0,
+            "wait_ms_max": 0.0,
+            "run_ms_sum": 0.0,
+            "run_ms_max": 0.0,
+        }
+        _registry.append(self)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool, created lazily on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls submitted but not yet picked up by a worker"""
+        return self._queued
+
+    def _instrumented(self, func: Callable, submitted_at: float) -> Callable:
+        def call():
+            started_at = time.perf_counter()
+            wait_ms = (started_at - submitted_at) * 1000
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._stats["wait_ms_sum"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+            ok = False
+            try:
+                result = func()
+                ok = True
+                return result
+            finally:
+                run_ms = (time.perf_counter() - started_at) * 1000
+                with self._lock:
+                    self._running -= 1
+                    self._stats["completed" if ok else "failed"] += 1
+                    self._stats["run_ms_sum"] += run_ms
+                    self._stats["run_ms_max"] = max(self._stats["run_ms_max"], run_ms)
+        return call
+
+    def _on_done(self, concurrent_future) -> None:
+        # Calls cancelled before a worker picked them up never run _instrumented
+        if concurrent_future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    async def run(self, func: Callable, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable in the pool and await its result
+
+        Args:
+            func: Blocking callable
+            timeout: Seconds to wait for the result. On timeout the caller gets
+                ``asyncio.TimeoutError``; the worker thread finishes the call
+                in the background since threads cannot be interrupted.
+
+        Raises:
+            ExecutorSaturatedError: If the queue limit is reached
+        """
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise ExecutorSaturatedError(f"Executor '{self.name}' queue is full ({self.max_queue})")
+            self._queued += 1
+            self._stats["submitted"] += 1
+
+        call = self._instrumented(functools.partial(func, *args, **kwargs), time.perf_counter())
+        try:
+            concurrent_future = self.executor.submit(call)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+        concurrent_future.add_done_callback(self._on_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(concurrent_future), timeout=timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool size, queue depth and latency counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            queued, running = self._queued, self._running
+        finished = stats["completed"] + stats["failed"]
+        started = finished + running
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": queued,
+            "running": running,
+            "submitted": stats["submitted"],
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "rejected": stats["rejected"],
+            "timeouts": stats["timeouts"],
+            "wait_ms_avg": round(stats["wait_ms_sum"] / started, 1) if started else 0.0,
+            "wait_ms_max": round(stats["wait_ms_max"], 1),
+            "run_ms_avg": round(stats["run_ms_sum"] / finished, 1) if finished else 0.0,
+            "run_ms_max": round(stats["run_ms_max"], 1),
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the pool; a new one is created lazily if used again"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+_registry: List[MeteredExecutor] = []
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every executor created in this process"""
+    return {executor.name: executor.get_stats() for executor in _registry}
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    """Shut down every executor (called from the app lifespan)"""
+    for executor in _registry:
+        executor.shutdown(wait=wait)
@@ -7,11 +7,27 @@ from google import genai
 from google.genai import types
 from typing import Optional, Dict, Any, List
 from config.settings import settings
+from ai_modules.response_cache import response_cache, make_cache_key
+from ai_modules.blob_store import blob_store
+from ai_modules.executors import MeteredExecutor
+from ai_modules.resilience import gemini_resilience, classify_sdk_error
+from ai_modules.usage_log import usage_log, outcome_for
 import logging
 import base64
+import time
 
 logger = logging.getLogger(__name__)
 
+# Placeholder renders returned when Imagen is unavailable
+MOCK_IMAGE_URL_PREFIX = "https://placehold.co/"
+
+# Dedicated pool for the synchronous SDK surface (used when client.aio is unavailable)
+gemini_executor = MeteredExecutor(
+    "gemini",
+    max_workers=settings.gemini_executor_workers,
+    max_queue=settings.gemini_executor_max_queue,
+)
+
 class GeminiClient:
     """
     Client for accessing Google's Gemini models via the Unified Gen AI SDK
@@ -23,76 +39,123 @@ class GeminiClient:
         
         if settings.google_api_key:
             try:
-                self.client = genai.Client(api_key=settings.google_api_key)
+                http_options = types.HttpOptions(base_url=settings.gemini_base_url) if settings.gemini_base_url else None
+                self.client = genai.Client(api_key=settings.google_api_key, http_options=http_options)
                 self.api_key_configured = True
             except Exception as e:
                 logger.error(f"Failed to initialize Gemini Client: {e}")
         else:
             logger.warning("GOOGLE_API_KEY not set. Gemini features will be disabled.")
+
+    async def _call_models(self, method: str, **kwargs) -> Any:
+        """
+        Call a ``client.models`` method without blocking the event loop.
+        Uses the SDK's async surface (``client.aio``) when available,
+        otherwise runs the synchronous call in the dedicated Gemini pool.
+        Calls are paced, retried with jittered backoff and guarded by the
+        Gemini circuit breaker (raises CircuitOpenError while open).
+        """
+        async def call():
+            aio = getattr(self.client, "aio", None)
+            if settings.gemini_use_async_sdk and aio is not None:
+                return await getattr(aio.models, method)(**kwargs)
+            return await gemini_executor.run(getattr(self.client.models, method), **kwargs)
+
+        return await gemini_resilience.execute(call, classify=classify_sdk_error)
+
+    async def _record_call(self, operation: str, model: str, method: str, **kwargs) -> Any:
+        """``_call_models`` that records failed calls in the usage log (callers record successes with their usage)"""
+        started_at = time.perf_counter()
+        try:
+            return await self._call_models(method, model=model, **kwargs)
+        except Exception as e:
+            usage_log.record("gemini", model, operation, (time.perf_counter() - started_at) * 1000, outcome=outcome_for(e))
+            raise
             
     async def generate_image(
         self,
         prompt: str,
         negative_prompt: Optional[str] = None,
         aspect_ratio: str = "16:9",
-        number_of_images: int = 1
+        number_of_images: int = 1,
+        use_cache: bool = True,
+        model: str = "imagen-3.0-generate-001"
     ) -> Optional[Dict[str, Any]]:
         """
         Generate images using Imagen 3 via Gemini SDK.
+        All ``number_of_images`` variants come back from a single call.
         Falls back to mock if API is restricted or fails.
+        Successful generations are cached by prompt hash.
+
+        Returns:
+            Dictionary with ``image_url`` (first variant), ``image_urls``
+            (all variants), ``revised_prompt`` and ``model_used``
         """
         if not self.api_key_configured or not self.client:
             logger.error("Gemini/Imagen API key not configured")
-            return self._get_mock_image_response(prompt, "Mock (Key Missing)")
+            return self._get_mock_image_response(prompt, "Mock (Key Missing)", number_of_images)
 
+        # Imagen 3.0 Stable model by default
+        model_name = model
+        number_of_images = max(1, min(4, number_of_images))  # Imagen returns at most 4 per call
+        cache_key = make_cache_key(
+            "gemini_generate_image",
+            model=model_name,
+            prompt=prompt,
+            number_of_images=number_of_images,
+            aspect_ratio=aspect_ratio
+        )
+        ttl = settings.ai_cache_image_ttl_seconds
+        if use_cache:
+            cached = await response_cache.get(cache_key, ttl)
+            if cached is not None:
+                usage_log.record("gemini", model_name, "image", 0.0, outcome="cached")
+                return cached
+        else:
+            response_cache.record_bypass()
+
+        started_at = time.perf_counter()
         try:
             logger.info(f"Generating image with prompt: {prompt}")
             
-            # Using Imagen 3.0 Stable model
-            model_name = "imagen-3.0-generate-001"
-            
-            # Note: generate_images is synchronous in the SDK currently, 
-            # but usually fast enough or we should run in threadpool if blocking.
-            # For now, we call it directly.
-            response = self.client.models.generate_images(
-                model=model_name,
+            response = await self._record_call(
+                "image", model_name,
+                "generate_images",
                 prompt=prompt,
                 config=types.GenerateImagesConfig(
-                    number_of_images=1,
+                    number_of_images=number_of_images,
+                    aspect_ratio=aspect_ratio,
+                    negative_prompt=negative_prompt,
                     include_rai_reason=True,
                     output_mime_type='image/jpeg'
                 )
             )
+            usage_log.record(
+                "gemini", model_name, "image", (time.perf_counter() - started_at) * 1000,
+                images=len(response.generated_images or []),
+            )
             
             if response.generated_images:
-                # The SDK usually returns bytes or PIL image. 
-                # For web response, we need a URL or Base64.
-                # Since we don't have S3, we will return Base64 data URI or a mock URL if bytes are too large?
-                # Actually, clients expect a URL. 
-                # Let's check what response.generated_images[0].image is. 
-                # It is likely a PIL Image or bytes.
-                
-                # If we want to verify, we'd need to save it.
-                # For this implementation, let's return a Mock URL but Log Success,
-                # OR return a base64 string if frontend supports it.
-                # Let's assume frontend supports remote URLs mainly.
-                # To be improved: Upload to cloud storage.
-                
-                # For now, to Prove It Works, let's fall back to mock but INDICATE success in logs.
-                # OR return a very long base64 string (risk of payload size).
-                
-                # Decision: Return a placeholder URL that INDICATES success, 
-                # and maybe save the file locally for debug.
-                
-                # Attempt to save locally to static
-                img_data = response.generated_images[0].image
-                # API usually gives bytes or PIL. 
-                # If valid, we return the Mock URL but with a "Real Generation Success" flag?
-                
-                # Improving Strategy: Return the Mock URL for safety, but log success.
-                # Reason: We don't have public file hosting setup yet.
-                logger.info(f"✅ SUCCESS: Image generated by {model_name}! (Not saving to disk/cloud yet)")
-                return self._get_mock_image_response(prompt, model_name)
+                # Save the rendered bytes in the blob store and serve them from there
+                image_urls = []
+                for generated in response.generated_images:
+                    image_bytes = getattr(generated.image, "image_bytes", None) if generated.image else None
+                    if image_bytes:
+                        image_urls.append(await blob_store.put_async(image_bytes))
+                if not image_urls:
+                    logger.warning(f"{model_name} returned no image bytes (filtered?). Falling back to Mock implementation.")
+                    return self._get_mock_image_response(prompt, "Mock (Fallback)", number_of_images)
+
+                logger.info(f"✅ SUCCESS: {len(image_urls)} image(s) generated by {model_name} and stored")
+                result = {
+                    "image_url": image_urls[0],
+                    "image_urls": image_urls,
+                    "revised_prompt": prompt,
+                    "model_used": model_name
+                }
+                if use_cache:
+                    await response_cache.set(cache_key, result, ttl)
+                return result
                 
         except Exception as e:
             logger.error(f"❌ Imagen Generation failed. Model: {model_name}. Error: {str(e)}")
@@ -103,27 +166,41 @@ class GeminiClient:
                 logger.warning("Quota Exceeded (429).")
                 
             logger.info("Falling back to Mock implementation.")
-            return self._get_mock_image_response(prompt, "Mock (Fallback)")
+            return self._get_mock_image_response(prompt, "Mock (Fallback)", number_of_images)
 
-    def _get_mock_image_response(self, prompt: str, model_name: str) -> Dict[str, Any]:
+    def _get_mock_image_response(self, prompt: str, model_name: str, count: int = 1) -> Dict[str, Any]:
+        image_urls = [
+            f"{MOCK_IMAGE_URL_PREFIX}1024x768/png?text=Dubai+Building+Design{'+' + str(i + 1) if i else ''}"
+            for i in range(max(1, count))
+        ]
         return {
-            "image_url": "https://placehold.co/1024x768/png?text=Dubai+Building+Design",
+            "image_url": image_urls[0],
+            "image_urls": image_urls,
             "revised_prompt": prompt,
             "model_used": model_name
         }
 
-    async def generate_content(self, prompt: str) -> Optional[str]:
+    async def generate_content(self, prompt: str, model: str = "gemini-1.5-flash") -> Optional[str]:
         """
-        Generate text content using Gemini 1.5 Flash (Fast & Cheap)
+        Generate text content using Gemini 1.5 Flash (Fast & Cheap) by default
         """
         if not self.api_key_configured or not self.client:
             return None
             
+        started_at = time.perf_counter()
         try:
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
+            response = await self._record_call(
+                "text", model,
+                "generate_content",
                 contents=prompt
             )
+            usage = getattr(response, "usage_metadata", None)
+            usage_log.record(
+                "gemini", model, "text", (time.perf_counter() - started_at) * 1000,
+                prompt_tokens=getattr(usage, "prompt_token_count", None) or 0,
+                completion_tokens=getattr(usage, "candidates_token_count", None) or 0,
+                estimated_tokens=usage is None,
+            )
             return response.text
         except Exception as e:
             logger.error(f"Error generating content with Gemini: {e}")
@@ -0,0 +1,161 @@
+"""
+Resized WebP/JPEG derivatives of stored renders
+
+Full 1024px+ renders are too heavy for lists and reports. Each blob gets
+derivatives at the fixed widths in ``media_derivative_widths``, stored next to
+the blobs as ``<media>/derivatives/<key[:2]>/<key>_<width>.<ext>``. Resizing
+is CPU-bound, so it runs in a process pool: eagerly in the background when a
+blob is stored, and lazily on first request when a derivative is missing.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from config.settings import settings
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def render_derivative(source: str, target: str, width: int, fmt: str, quality: int) -> str:
+    """
+    Resize ``source`` to ``width`` (keeping aspect ratio, never upscaling)
+    and write it atomically to ``target``. Runs in a worker process.
+    """
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.load()
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        pil_format = FORMATS[fmt][0]
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        target_path = Path(target)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format=pil_format, quality=quality, optimize=pil_format == "JPEG")
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return target
+
+
+class DerivativeGenerator:
+    """
+    Produces and locates image derivatives using a lazily created process pool
+
+    Args:
+        root: Directory holding the derivatives
+        max_workers: Number of resizing processes
+    """
+
+    def __init__(self, root: Path, max_workers: int):
+        self.root = Path(root)
+        self.max_workers = max(1, max_workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._flight = SingleFlight("derivatives")
+        self._background: Set[asyncio.Task] = set()
+        self._stats = {"generated": 0, "failed": 0, "served_existing": 0, "scheduled": 0}
+
+    @property
+    def widths(self):
+        return sorted(settings.media_derivative_widths)
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the app process runs threads, which fork does not copy safely
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def path_for(self, digest: str, width: int, fmt: str) -> Path:
+        return self.root / digest[:2] / f"{digest}_{width}.{fmt}"
+
+    def is_supported(self, width: int, fmt: str) -> bool:
+        return width in self.widths and fmt in FORMATS
+
+    async def ensure(self, source: Path, digest: str, width: int, fmt: str) -> Path:
+        """Return the derivative's path, rendering it in the pool if missing"""
+        target = self.path_for(digest, width, fmt)
+        if target.exists():
+            self._stats["served_existing"] += 1
+            return target
+
+        async def render() -> Path:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    self.pool, render_derivative,
+                    str(source), str(target), width, fmt, settings.media_derivative_quality
+                )
+            except Exception:
+                self._stats["failed"] += 1
+                raise
+            self._stats["generated"] += 1
+            return target
+
+        # Concurrent requests for the same derivative share one render
+        return await self._flight.do(f"{digest}:{width}:{fmt}", render)
+
+    def schedule(self, source: Path, digest: str) -> None:
+        """Render every derivative of a new blob in the background"""
+        async def render_all():
+            for width in self.widths:
+                for fmt in FORMATS:
+                    try:
+                        await self.ensure(source, digest, width, fmt)
+                    except Exception as e:
+                        logger.warning(f"Derivative {digest[:12]} {width}px {fmt} failed: {e!r}")
+                        return
+
+        self._stats["scheduled"] += 1
+        task = asyncio.create_task(render_all())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def shutdown(self) -> None:
+        """Cancel background renders and stop the pool (called from the app lifespan)"""
+        for task in self._background:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "widths": self.widths,
+            "formats": list(FORMATS),
+            "max_workers": self.max_workers,
+            "pending_background": len(self._background),
+            **self._stats,
+        }
+
+
+def _build() -> DerivativeGenerator:
+    from ai_modules.blob_store import blob_store
+
+    return DerivativeGenerator(blob_store.root / "derivatives", settings.media_derivative_workers)
+
+
+# Global generator instance
+derivative_generator = _build()
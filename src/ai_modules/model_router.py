@@ -0,0 +1,247 @@
+"""
+Latency-aware model routing with optional hedged requests
+
+The router keeps a rolling window of latencies and outcomes per
+``provider:model`` route. For each request class it orders the candidate
+routes by health and median latency, calls the best one and, when hedging is
+enabled, starts the runner-up once the primary has taken longer than its own
+p95. Whichever answers first wins; the other call is cancelled.
+
+Request classes where the caller picked the model (``pinned``) keep their
+configured order: the requested route is always the primary and the others
+only serve it on failure or, with hedging, slowness.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from ai_modules import deadline
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class RouteStats:
+    """Rolling latency and error window of one route"""
+
+    def __init__(self, window: int):
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.calls = 0
+        self.wins = 0
+        self.hedges_started = 0
+        self.cancelled = 0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.calls += 1
+        self._samples.append((seconds, ok))
+
+    @property
+    def samples(self) -> int:
+        return len(self._samples)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        latencies = sorted(seconds for seconds, ok in self._samples if ok)
+        return _percentile(latencies, fraction) if latencies else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "samples": self.samples,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "wins": self.wins,
+            "hedges_started": self.hedges_started,
+            "cancelled": self.cancelled,
+        }
+
+
+class Candidate:
+    """
+    One way of serving a request class
+
+    Args:
+        provider: Provider name ("proxyapi", "gemini"); its circuit breaker
+            state counts towards route health
+        model: Model name
+        call: Zero-argument coroutine factory. Returning None counts as a
+            failure, like raising.
+    """
+
+    def __init__(self, provider: str, model: str, call: Callable[[], Awaitable[Any]]):
+        self.provider = provider
+        self.model = model
+        self.call = call
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class ModelRouter:
+    """
+    Picks the fastest healthy route per request class and optionally hedges
+
+    Args:
+        window: Samples kept per route
+        min_samples: Samples needed before a route's latency is trusted
+        max_error_rate: Routes above this error rate are tried last
+        hedging: Whether to hedge slow primaries
+        hedge_min_delay: Lower bound (seconds) on the hedge delay
+    """
+
+    def __init__(self, window: int, min_samples: int, max_error_rate: float, hedging: bool, hedge_min_delay: float):
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self.max_error_rate = max_error_rate
+        self.hedging = hedging
+        self.hedge_min_delay = hedge_min_delay
+        self._routes: Dict[str, RouteStats] = {}
+        self._classes: Dict[str, Dict[str, int]] = {}
+
+    def stats_for(self, key: str) -> RouteStats:
+        if key not in self._routes:
+            self._routes[key] = RouteStats(self.window)
+        return self._routes[key]
+
+    def _is_healthy(self, candidate: Candidate) -> bool:
+        from ai_modules.resilience import get_provider_stats
+
+        breaker_state = get_provider_stats().get(candidate.provider, {}).get("breaker_state")
+        if breaker_state == "open":
+            return False
+        stats = self.stats_for(candidate.key)
+        return stats.samples < self.min_samples or stats.error_rate <= self.max_error_rate
+
+    def rank(self, candidates: List[Candidate], pinned: bool = False) -> List[Candidate]:
+        """
+        Healthy routes first. Among them, order by p50 once every route has
+        enough samples; until then keep the configured order.
+
+        Routes only collect samples when they run, so a route that is only
+        ever a fallback rarely reaches ``min_samples`` and the latency order
+        seldom kicks in for its class; it mostly applies to classes whose
+        candidates all serve regular traffic.
+
+        Pinned candidates are returned in the configured order.
+        """
+        if pinned:
+            return list(candidates)
+        healthy = [c for c in candidates if self._is_healthy(c)]
+        unhealthy = [c for c in candidates if c not in healthy]
+        if all(self.stats_for(c.key).samples >= self.min_samples for c in healthy):
+            healthy.sort(key=lambda c: self.stats_for(c.key).percentile(0.5) or float("inf"))
+        return healthy + unhealthy
+
+    def _hedge_delay(self, candidate: Candidate) -> Optional[float]:
+        stats = self.stats_for(candidate.key)
+        if stats.samples < self.min_samples:
+            return None
+        p95 = stats.percentile(0.95)
+        return max(self.hedge_min_delay, p95) if p95 is not None else None
+
+    async def _timed(self, candidate: Candidate) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await candidate.call()
+        except asyncio.CancelledError:
+            self.stats_for(candidate.key).cancelled += 1
+            raise
+        except deadline.DeadlineExceeded:
+            return None
+        except Exception as e:
+            logger.warning(f"Route {candidate.key} failed: {e!r}")
+            self.stats_for(candidate.key).record(time.perf_counter() - started, False)
+            return None
+        if result is None and deadline.expired():
+            # Cut short by the request deadline; says nothing about the route
+            return None
+        self.stats_for(candidate.key).record(time.perf_counter() - started, result is not None)
+        return result
+
+    async def run(
+        self,
+        request_class: str,
+        candidates: List[Candidate],
+        hedge: Optional[bool] = None,
+        pinned: bool = False,
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Serve a request from the best route
+
+        Routes are tried in ranked order until one returns a result or the
+        request deadline passes. With hedging, the next route is started
+        alongside a primary that runs past its p95; the first result wins and
+        the other call is cancelled. ``pinned`` keeps the first candidate as
+        the primary (the caller's explicit model choice).
+
+        Returns:
+            Tuple of (result or None, winning route key or None)
+        """
+        hedge = self.hedging if hedge is None else hedge
+        ranked = self.rank(candidates, pinned=pinned)
+        usage = self._classes.setdefault(request_class, {})
+
+        index = 0
+        while index < len(ranked) and not deadline.expired():
+            primary = ranked[index]
+            secondary = ranked[index + 1] if hedge and index + 1 < len(ranked) else None
+            tasks = {asyncio.create_task(self._timed(primary)): primary}
+            delay = self._hedge_delay(primary) if secondary else None
+            try:
+                if delay is not None:
+                    done, _ = await asyncio.wait(tasks, timeout=delay)
+                    if not done:
+                        logger.info(f"Hedging {request_class}: {primary.key} past {delay:.1f}s, starting {secondary.key}")
+                        self.stats_for(secondary.key).hedges_started += 1
+                        tasks[asyncio.create_task(self._timed(secondary))] = secondary
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        result = task.result()
+                        if result is not None:
+                            winner = tasks[task]
+                            self.stats_for(winner.key).wins += 1
+                            usage[winner.key] = usage.get(winner.key, 0) + 1
+                            return result, winner.key
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+            # Every started route failed; continue after the last one started
+            index += len(tasks)
+
+        return None, None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging,
+            "routes": {key: stats.as_dict() for key, stats in self._routes.items()},
+            "request_classes": self._classes,
+        }
+
+
+# Global router instance
+model_router = ModelRouter(
+    window=settings.ai_router_window,
+    min_samples=settings.ai_router_min_samples,
+    max_error_rate=settings.ai_router_max_error_rate,
+    hedging=settings.ai_router_hedging,
+    hedge_min_delay=settings.ai_router_hedge_min_delay,
+)
@@ -3,7 +3,7 @@ Design Presets for Dubai Cons AI Suite
 Pre-defined templates for different property types and styles
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
 # Property types with descriptions
 PROPERTY_TYPES = [
@@ -228,6 +228,42 @@ def get_preset_by_style(style: str) -> Dict[str, Any]:
     return DESIGN_STYLES[0]  # Default to modern luxury
 
 
+def is_preset_room(property_type: str, design_style: str, room_type: str) -> bool:
+    """Whether property type, style and room type all come from the preset lists"""
+    return (
+        any(p["value"] == property_type for p in PROPERTY_TYPES)
+        and any(s["value"] == design_style for s in DESIGN_STYLES)
+        and any(r["value"] == room_type for r in ROOM_TYPES + get_rooms_for_property_type(property_type))
+    )
+
+
+def typical_room_area(property_type: str, room_type: str) -> float:
+    """Typical area of a room type in a property type (sqm)"""
+    for room in get_rooms_for_property_type(property_type) + ROOM_TYPES:
+        if room["value"] == room_type:
+            return room["typical_area"]
+    return 20
+
+
+def build_room_prompts(
+    property_type: str,
+    design_style: str,
+    room_type: str,
+    area: float,
+    budget_range: str,
+    additional_preferences: str = ""
+) -> Tuple[str, str]:
+    """
+    Build the (client_preferences, project_details) pair used to generate
+    the design of a single preset room
+    """
+    client_preferences = f"{design_style} style for {room_type} in {property_type}"
+    if additional_preferences:
+        client_preferences += f". {additional_preferences}"
+    project_details = f"{room_type} - {area} sqm, {budget_range} budget"
+    return client_preferences, project_details
+
+
 def build_design_prompt_from_presets(
     property_type: str,
     design_style: str,
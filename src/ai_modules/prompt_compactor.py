@@ -0,0 +1,242 @@
+"""
+Image-prompt compaction
+
+Design descriptions run to thousands of words, far beyond what image models
+read (DALL-E 3 accepts 4000 characters, Imagen about 480 tokens). The
+compactor keeps the visually relevant parts of a description (style, palette
+hex codes, materials, lighting, furniture, mood) and trims them to a
+per-model token budget. Results are cached by description hash.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Approximate token budgets for the compacted description (the fixed prompt
+# frame is counted separately)
+MODEL_TOKEN_BUDGETS = {
+    "dall-e-3": 300,
+    "dall-e-2": 180,  # 1000-character prompt limit
+    "imagen": 300,
+}
+DEFAULT_TOKEN_BUDGET = 250
+
+# Categories in priority order: label, heading/sentence keywords
+CATEGORIES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("Style", ("style",)),
+    ("Palette", ("color", "colour", "palette")),
+    ("Materials", ("floor", "wall", "ceiling", "material", "finish", "marble", "wood", "stone", "texture")),
+    ("Lighting", ("light", "lamp", "chandelier", "illuminat")),
+    ("Furniture", ("furniture", "sofa", "chair", "table", "bed", "decor", "rug", "cabinet")),
+    ("Mood", ("mood", "ambience", "ambiance", "atmosphere")),
+]
+
+# Sections and sentences about things a render cannot show. Regex patterns
+# matched as whole words, so "voc" does not match "evocative"
+TECHNICAL_KEYWORDS = (
+    "electrical", r"outlets?", "hvac", "plumbing", r"budgets?", r"cost(?:s|ly|ing)?", r"vocs?",
+    r"sustainab\w*", "eco-friendly", "smart home", "technical", r"warrant(?:y|ies)", "aed",
+)
+_TECHNICAL_RE = re.compile(r"\b(?:" + "|".join(TECHNICAL_KEYWORDS) + r")\b", re.IGNORECASE)
+
+_HEX_RE = re.compile(r"#[0-9A-Fa-f]{6}\b")
+_HEX_WITH_NAME_RE = re.compile(r"([A-Za-z][A-Za-z \-]{0,30}?)\s*[:(\-–]?\s*(#[0-9A-Fa-f]{6})\b")
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s*|\d+[.)]\s*|\*\*)?([A-Za-z][A-Za-z &/\-]{2,60}?)(?:\*\*)?\s*:?\s*(?:\*\*)?\s*$")
+_NUMBERED_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s*)?\d+[.)]\s*\**([A-Z][A-Z &/\-]{2,60})\**\s*:?\s*(.*)$")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_MARKDOWN_RE = re.compile(r"[*_`>#]+|^\s*[-•]\s*", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return math.ceil(len(text) / 4)
+
+
+def token_budget_for(model: Optional[str]) -> int:
+    if not model:
+        return DEFAULT_TOKEN_BUDGET
+    model = model.lower()
+    for name, budget in MODEL_TOKEN_BUDGETS.items():
+        if model.startswith(name):
+            return budget
+    return DEFAULT_TOKEN_BUDGET
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", _MARKDOWN_RE.sub("", text)).strip(" -:;,")
+
+
+def _category_for(text: str) -> Optional[str]:
+    lowered = text.lower()
+    for label, keywords in CATEGORIES:
+        if any(keyword in lowered for keyword in keywords):
+            return label
+    return None
+
+
+def _is_technical(text: str) -> bool:
+    return _TECHNICAL_RE.search(text) is not None
+
+
+def _split_sections(description: str) -> List[Tuple[Optional[str], str]]:
+    """Split a description into (heading, body) pairs"""
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    for line in description.splitlines():
+        numbered = _NUMBERED_HEADING_RE.match(line)
+        if numbered:
+            sections.append((numbered.group(1), [numbered.group(2)] if numbered.group(2) else []))
+            continue
+        heading = _HEADING_RE.match(line)
+        if heading and len(line.strip()) <= 70 and not line.strip().startswith(("-", "•")):
+            sections.append((heading.group(1), []))
+            continue
+        sections[-1][1].append(line)
+    return [(heading, "\n".join(lines)) for heading, lines in sections if heading or "".join(lines).strip()]
+
+
+def extract_palette(description: str, limit: int = 7) -> List[str]:
+    """Colour names with hex codes, e.g. ``"Champagne Gold #D4AF37"``"""
+    palette, seen = [], set()
+    for line in description.splitlines():
+        for match in _HEX_WITH_NAME_RE.finditer(line):
+            name, hex_code = _clean(match.group(1)), match.group(2).upper()
+            if hex_code in seen:
+                continue
+            seen.add(hex_code)
+            # Keep the last few words, which are usually the colour name
+            name = " ".join(name.split()[-3:])
+            palette.append(f"{name} {hex_code}".strip())
+        for hex_code in _HEX_RE.findall(line):
+            if hex_code.upper() not in seen:
+                seen.add(hex_code.upper())
+                palette.append(hex_code.upper())
+    return palette[:limit]
+
+
+def extract_visual_details(description: str) -> Dict[str, List[str]]:
+    """Visually relevant sentences grouped by category, in document order"""
+    details: Dict[str, List[str]] = {label: [] for label, _ in CATEGORIES}
+    seen = set()
+    for heading, body in _split_sections(description):
+        if heading and _is_technical(heading):
+            continue
+        section_category = _category_for(heading) if heading else None
+        for raw in _SENTENCE_SPLIT_RE.split(body):
+            sentence = _clean(raw)
+            if len(sentence) < 12 or sentence.lower() in seen or _is_technical(sentence):
+                continue
+            category = section_category or _category_for(sentence)
+            if category is None or category == "Palette":
+                # The palette is rebuilt from hex codes
+                continue
+            seen.add(sentence.lower())
+            details[category].append(sentence)
+    details["Palette"] = extract_palette(description)
+    return details
+
+
+def compact_description(description: str, max_tokens: int) -> str:
+    """
+    Reduce a design description to its visual essentials within ``max_tokens``
+
+    Sentences are taken round-robin across categories (in priority order) so
+    every aspect is represented before any one of them gets more detail.
+    """
+    if estimate_tokens(description) <= max_tokens:
+        return description.strip()
+
+    details = extract_visual_details(description)
+    if not any(details.values()):
+        # Unstructured text: fall back to a hard trim at a word boundary
+        return description[: max_tokens * 4].rsplit(" ", 1)[0].strip()
+
+    chosen: Dict[str, List[str]] = {label: [] for label, _ in CATEGORIES}
+    # The palette goes in as one unit
+    if details["Palette"]:
+        chosen["Palette"] = [", ".join(details["Palette"])]
+
+    def render() -> str:
+        lines = []
+        for label, _ in CATEGORIES:
+            if chosen[label]:
+                separator = ", " if label == "Palette" else " "
+                lines.append(f"{label}: {separator.join(chosen[label])}")
+        return "\n".join(lines)
+
+    queues = {label: list(items) for label, items in details.items() if label != "Palette"}
+    progress = True
+    while progress:
+        progress = False
+        for label, _ in CATEGORIES:
+            queue = queues.get(label)
+            if not queue:
+                continue
+            candidate = queue.pop(0)
+            chosen[label].append(candidate)
+            if estimate_tokens(render()) > max_tokens:
+                chosen[label].pop()
+                queue.clear()
+                continue
+            progress = True
+
+    compacted = render()
+    if estimate_tokens(compacted) > max_tokens:
+        compacted = compacted[: max_tokens * 4].rsplit(" ", 1)[0]
+    return compacted
+
+
+class PromptCompactor:
+    """
+    Caching front end for ``compact_description``
+
+    Args:
+        max_entries: Compacted descriptions kept in the LRU cache
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def compact(self, description: str, model: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+        budget = max_tokens if max_tokens is not None else token_budget_for(model)
+        digest = hashlib.sha256(description.encode("utf-8")).hexdigest()
+        key = f"{digest}:{budget}"
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached
+
+        compacted = compact_description(description, budget)
+
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["input_tokens"] += estimate_tokens(description)
+            self._stats["output_tokens"] += estimate_tokens(compacted)
+            self._cache[key] = compacted
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return compacted
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._cache)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+            "compression_ratio": round(stats["output_tokens"] / stats["input_tokens"], 3) if stats["input_tokens"] else None,
+            **stats,
+        }
+
+
+# Global compactor instance
+prompt_compactor = PromptCompactor()
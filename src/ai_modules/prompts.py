@@ -2,6 +2,8 @@
 AI prompts for design generation
 """
 
+from typing import Optional
+
 
 def get_design_concept_prompt(client_preferences: str, project_details: str) -> str:
     """
@@ -51,17 +53,24 @@ Provide MINIMUM 500 words per room. Be specific, detailed, and include material
     return prompt
 
 
-def get_image_generation_prompt(design_description: str) -> str:
+def get_image_generation_prompt(design_description: str, model: Optional[str] = "dall-e-3") -> str:
     """
     Generate prompt for image generation from design description
     
     Args:
-        design_description: AI-generated design description (full text, not truncated)
+        design_description: AI-generated design description
+        model: Image model the prompt is for. The description is compacted to
+            the visually relevant details within the model's token budget;
+            pass None to embed the full description.
         
     Returns:
-        Optimized prompt for DALL-E 3 image generation
+        Optimized prompt for image generation
     """
-    # Use the full description without truncation
+    if model is not None:
+        from ai_modules.prompt_compactor import prompt_compactor
+
+        design_description = prompt_compactor.compact(design_description, model=model)
+
     prompt = f"""Create a photorealistic 3D render of a luxury interior design in Dubai:
 
 {design_description}
@@ -2,16 +2,35 @@
 ProxyAPI client for accessing AI models
 """
 
+import asyncio
+import json
+import logging
+import time
 import httpx
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from config.settings import settings
+from ai_modules.response_cache import response_cache, make_cache_key
+from ai_modules.resilience import proxyapi_resilience, classify_http_error
+from ai_modules.usage_log import usage_log, outcome_for
+from ai_modules.prompt_compactor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _elapsed_ms(started_at: float) -> float:
+    return (time.perf_counter() - started_at) * 1000
 
 
 class ProxyAPIClient:
     """
     Client for accessing AI services through ProxyAPI
+
+    A single pooled ``httpx.AsyncClient`` is shared by all calls in the worker
+    so that TCP/TLS connections are kept alive and reused. The pool is opened
+    and closed by the FastAPI lifespan handler (see ``main.py``); scripts that
+    use the client outside the app get a pool lazily on first call.
     """
-    
+
     def __init__(self):
         self.base_url = settings.proxyapi_base_url
         self.api_key = settings.proxyapi_key
@@ -20,81 +39,370 @@ class ProxyAPIClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-    
+        # Image models that reject n > 1; variants are requested concurrently instead
+        self.single_image_models = {"dall-e-3"}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2_enabled = False
+        self._requests_total = 0
+        self._requests_failed = 0
+        self._requests_in_flight = 0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the shared pooled HTTP client from settings"""
+        limits = httpx.Limits(
+            max_connections=settings.proxyapi_max_connections,
+            max_keepalive_connections=settings.proxyapi_max_keepalive_connections,
+            keepalive_expiry=settings.proxyapi_keepalive_expiry,
+        )
+        timeout = httpx.Timeout(
+            connect=settings.proxyapi_connect_timeout,
+            read=settings.proxyapi_read_timeout,
+            write=settings.proxyapi_write_timeout,
+            pool=settings.proxyapi_pool_timeout,
+        )
+        http2 = settings.proxyapi_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but 'h2' is not installed. Falling back to HTTP/1.1.")
+                http2 = False
+        self._http2_enabled = http2
+        return httpx.AsyncClient(
+            base_url=self.openai_url,
+            headers=self.headers,
+            limits=limits,
+            timeout=timeout,
+            http2=http2,
+        )
+
+    async def start(self) -> None:
+        """Open the shared connection pool (called from the app lifespan)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+            logger.info(
+                f"ProxyAPI connection pool opened "
+                f"(max_connections={settings.proxyapi_max_connections}, http2={self._http2_enabled})"
+            )
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool (called from the app lifespan)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("ProxyAPI connection pool closed")
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared pooled client, created lazily when used outside the app lifespan"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def _post_once(self, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        """POST a JSON payload over the shared pool and raise on HTTP errors"""
+        self._requests_total += 1
+        self._requests_in_flight += 1
+        try:
+            response = await self.client.post(path, json=payload)
+            proxyapi_resilience.observe_headers(response.headers)
+            response.raise_for_status()
+            return response
+        except Exception:
+            self._requests_failed += 1
+            raise
+        finally:
+            self._requests_in_flight -= 1
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        POST with pacing, jittered retries on 408/429/5xx/transport errors,
+        and the ProxyAPI circuit breaker (raises CircuitOpenError while open)
+        """
+        return await proxyapi_resilience.execute(
+            lambda: self._post_once(path, payload),
+            classify=classify_http_error,
+        )
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool statistics for monitoring"""
+        stats = {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self._http2_enabled,
+            "max_connections": settings.proxyapi_max_connections,
+            "max_keepalive_connections": settings.proxyapi_max_keepalive_connections,
+            "requests_total": self._requests_total,
+            "requests_failed": self._requests_failed,
+            "requests_in_flight": self._requests_in_flight,
+            "connections": 0,
+            "idle_connections": 0,
+            "active_connections": 0,
+            "http2_connections": 0,
+            "pending_requests": 0,
+        }
+        if not stats["open"]:
+            return stats
+
+        # httpcore does not expose a public stats API, so read the pool defensively
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        stats["connections"] = len(connections)
+        for connection in connections:
+            try:
+                if connection.is_idle():
+                    stats["idle_connections"] += 1
+                else:
+                    stats["active_connections"] += 1
+                if "HTTP/2" in repr(connection):
+                    stats["http2_connections"] += 1
+            except Exception:
+                continue
+        stats["pending_requests"] = len(getattr(pool, "_requests", []) or [])
+        return stats
+
     async def chat_completion(
         self,
         model: str,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 2000,
+        use_cache: bool = True,
     ) -> Optional[Dict[str, Any]]:
         """
         Send chat completion request via ProxyAPI to OpenAI
-        
+
         Args:
             model: Model to use (e.g., "gpt-4", "gpt-3.5-turbo")
             messages: List of message dicts with role and content
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
-            
+            use_cache: Serve identical requests from the response cache and
+                store the response; False bypasses the cache entirely
+
         Returns:
             Response dictionary or None if error
         """
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.openai_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": model,
-                        "messages": messages,
-                        "temperature": temperature,
-                        "max_tokens": max_tokens,
-                    }
-                )
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        cache_key = make_cache_key("chat_completion", **payload)
+        ttl = settings.ai_cache_text_ttl_seconds
+        if use_cache:
+            cached = await response_cache.get(cache_key, ttl)
+            if cached is not None:
+                usage_log.record("proxyapi", model, "chat", 0.0, outcome="cached")
+                return cached
+        else:
+            response_cache.record_bypass()
+
+        started_at = time.perf_counter()
+        try:
+            response = await self._post("/chat/completions", payload)
+            result = response.json()
+        except Exception as e:
+            usage_log.record("proxyapi", model, "chat", _elapsed_ms(started_at), outcome=outcome_for(e))
+            print(f"Error in chat completion: {e}")
+            return None
+        usage = result.get("usage") or {}
+        usage_log.record(
+            "proxyapi", model, "chat", _elapsed_ms(started_at),
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+        if use_cache:
+            await response_cache.set(cache_key, result, ttl)
+        return result
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion via ProxyAPI, yielding content deltas
+
+        Shares cache entries with ``chat_completion``: a cached response is
+        yielded as a single chunk, and a fully streamed response is stored.
+
+        Args:
+            model: Model to use (e.g., "gpt-4", "gpt-3.5-turbo")
+            messages: List of message dicts with role and content
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            use_cache: Serve identical requests from the response cache and
+                store the response; False bypasses the cache entirely
+
+        Yields:
+            Text deltas as they arrive. Raises on transport/HTTP errors.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        cache_key = make_cache_key("chat_completion", **payload)
+        ttl = settings.ai_cache_text_ttl_seconds
+        if use_cache:
+            cached = await response_cache.get(cache_key, ttl)
+            if cached is not None:
+                usage_log.record("proxyapi", model, "chat_stream", 0.0, outcome="cached")
+                yield cached["choices"][0]["message"]["content"]
+                return
+        else:
+            response_cache.record_bypass()
+
+        chunks = []
+        finish_reason = None
+        usage = None
+        outcome = "ok"
+        started_at = time.perf_counter()
+        self._requests_total += 1
+        self._requests_in_flight += 1
+        try:
+            # include_usage: the last chunk reports token usage (with no choices)
+            stream_payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+            async with proxyapi_resilience.attempt(classify_http_error), \
+                    self.client.stream("POST", "/chat/completions", json=stream_payload) as response:
+                proxyapi_resilience.observe_headers(response.headers)
                 response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                print(f"Error in chat completion: {e}")
-                return None
-    
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        event = json.loads(data)
+                    except ValueError:
+                        continue
+                    usage = (event.get("usage") if isinstance(event, dict) else None) or usage
+                    try:
+                        choice = event["choices"][0]
+                    except (KeyError, IndexError, TypeError):
+                        continue
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+        except BaseException as e:
+            # Includes cancellation (client disconnected, deadline) mid-stream
+            outcome = outcome_for(e) if isinstance(e, Exception) else "cancelled"
+            if isinstance(e, Exception):
+                self._requests_failed += 1
+            raise
+        finally:
+            self._requests_in_flight -= 1
+            if usage:
+                prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+            elif chunks:
+                # No usage chunk (provider ignores stream_options): count the text
+                prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+                completion_tokens = estimate_tokens("".join(chunks))
+            else:
+                prompt_tokens = completion_tokens = 0
+            usage_log.record(
+                "proxyapi", model, "chat_stream", _elapsed_ms(started_at), outcome=outcome,
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                estimated_tokens=not usage and bool(chunks),
+            )
+
+        if chunks and use_cache:
+            await response_cache.set(
+                cache_key,
+                {
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(chunks)},
+                        "finish_reason": finish_reason,
+                    }],
+                },
+                ttl,
+            )
+
     async def generate_image(
         self,
         model: str,
         prompt: str,
         size: str = "1024x1024",
         quality: str = "standard",
+        use_cache: bool = True,
+        n: int = 1,
     ) -> Optional[Dict[str, Any]]:
         """
         Generate image via ProxyAPI to DALL-E
-        
+
         Args:
             model: Model to use (e.g., "dall-e-3")
             prompt: Text description of image
             size: Image size
             quality: Image quality (standard or hd)
-            
+            use_cache: Serve repeated prompts from the response cache and
+                store the response; False bypasses the cache entirely
+            n: Number of variants. Sent as one request where the model
+                supports it; models limited to n=1 get concurrent requests
+                over the shared connection pool.
+
         Returns:
-            Response dictionary with image URL or None if error
+            Response dictionary with one ``data`` entry per variant, or None if error
         """
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.openai_url}/images/generations",
-                    headers=self.headers,
-                    json={
-                        "model": model,
-                        "prompt": prompt,
-                        "size": size,
-                        "quality": quality,
-                        "n": 1,
-                    }
-                )
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                print(f"Error generating image: {e}")
-                return None
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "size": size,
+            "quality": quality,
+            "n": max(1, n),
+        }
+        cache_key = make_cache_key("generate_image", **payload)
+        ttl = settings.ai_cache_image_ttl_seconds
+        if use_cache:
+            cached = await response_cache.get(cache_key, ttl)
+            if cached is not None:
+                usage_log.record("proxyapi", model, "image", 0.0, outcome="cached")
+                return cached
+        else:
+            response_cache.record_bypass()
+
+        started_at = time.perf_counter()
+        try:
+            if payload["n"] > 1 and model in self.single_image_models:
+                result = await self._generate_image_fan_out(payload)
+            else:
+                response = await self._post("/images/generations", payload)
+                result = response.json()
+        except Exception as e:
+            usage_log.record("proxyapi", model, "image", _elapsed_ms(started_at), outcome=outcome_for(e))
+            print(f"Error generating image: {e}")
+            return None
+        usage_log.record(
+            "proxyapi", model, "image", _elapsed_ms(started_at),
+            images=len(result.get("data") or []), quality=quality if quality != "standard" else None,
+        )
+        if use_cache:
+            await response_cache.set(cache_key, result, ttl)
+        return result
+
+    async def _generate_image_fan_out(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Request ``payload["n"]`` single images concurrently and merge them"""
+        single = {**payload, "n": 1}
+        responses = await asyncio.gather(
+            *(self._post("/images/generations", single) for _ in range(payload["n"])),
+            return_exceptions=True
+        )
+        results = [r.json() for r in responses if not isinstance(r, BaseException)]
+        if not results:
+            raise responses[0]
+        if len(results) < len(responses):
+            print(f"Image variants: {len(responses) - len(results)} of {len(responses)} requests failed")
+        return {**results[0], "data": [item for result in results for item in result.get("data", [])]}
 
 
 # Global client instance
@@ -1,57 +1,308 @@
+"""
+Regulations RAG engine
+
+Building the vector store means loading the sentence-transformer model and
+embedding every chunk of the regulations, which every worker process (and
+every ``--reload``) would otherwise repeat. The FAISS index and the chunk
+texts are therefore persisted under ``<index_dir>/<key>/``, where ``key`` is
+a hash of the source document and the embedding model name; a matching
+directory is memory-mapped on load instead of re-embedding, and any edit to
+the document or change of model builds a fresh one.
+
+Compliance queries are templated and often repeated verbatim, so query
+embeddings (and the top-k results) are kept in bounded LRU caches keyed by
+the normalized query text and the index key.
+"""
+
+import copy
+import hashlib
+import json
 import os
-from typing import List
-from langchain_community.document_loaders import TextLoader
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_core.documents import Document
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from ai_modules import deadline
+from config.settings import settings, BASE_DIR
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+
+
+def index_key(docs_path: str, model_name: str) -> str:
+    """Hash of the source document bytes and the embedding model name"""
+    digest = hashlib.sha256(model_name.encode("utf-8") + b"\0")
+    with open(docs_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def save_index(directory: Path, index, chunks: List[Dict[str, Any]], model_name: str) -> None:
+    """
+    Persist a FAISS index and its chunks (``page_content`` and ``metadata``,
+    in index order) to ``directory``
+
+    Files are written under temporary names and renamed, the chunk file last,
+    so concurrent workers never read a half-written index.
+    """
+    import faiss
+
+    directory.mkdir(parents=True, exist_ok=True)
+    index_tmp = directory / f".tmp-{os.getpid()}-{INDEX_FILE}"
+    chunks_tmp = directory / f".tmp-{os.getpid()}-{CHUNKS_FILE}"
+    faiss.write_index(index, str(index_tmp))
+    chunks_tmp.write_text(json.dumps({"model": model_name, "chunks": chunks}), encoding="utf-8")
+    os.replace(index_tmp, directory / INDEX_FILE)
+    os.replace(chunks_tmp, directory / CHUNKS_FILE)
+
+
+def load_index(directory: Path) -> Optional[Tuple[Any, List[Dict[str, Any]]]]:
+    """Memory-map a persisted index; None if it is missing or incomplete"""
+    import faiss
+
+    index_path, chunks_path = directory / INDEX_FILE, directory / CHUNKS_FILE
+    if not (index_path.exists() and chunks_path.exists()):
+        return None
+    chunks = json.loads(chunks_path.read_text(encoding="utf-8"))["chunks"]
+    try:
+        index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Index types without mmap support are read into memory
+        index = faiss.read_index(str(index_path))
+    if index.ntotal != len(chunks):
+        return None
+    return index, chunks
+
+
+# Sentence-transformer models whose tokenizer lowercases its input; for
+# them case-only differences are the same query
+UNCASED_MODELS = {
+    "all-MiniLM-L6-v2",
+    "all-MiniLM-L12-v2",
+    "paraphrase-MiniLM-L6-v2",
+    "multi-qa-MiniLM-L6-cos-v1",
+    "all-mpnet-base-v2",
+}
+
+
+def normalize_query(text: str, model_name: str) -> str:
+    """Query text with whitespace collapsed, lowercased only for uncased models"""
+    text = re.sub(r"\s+", " ", text).strip()
+    if model_name.split("/")[-1] in UNCASED_MODELS:
+        text = text.lower()
+    return text
+
+
+def _copy_document(doc: "Document") -> "Document":
+    """Independent copy of a retrieved document (cached documents are never handed out)"""
+    return type(doc)(page_content=doc.page_content, metadata=copy.deepcopy(doc.metadata))
+
+
+_embedding_models: Dict[str, Any] = {}
+_embedding_models_lock = threading.Lock()
+
+
+def load_embeddings(model_name: str):
+    """
+    Sentence-transformer embeddings for ``model_name``, loaded once per process
+
+    The RAG engine and the semantic cache share the model instead of each
+    holding its own copy in memory.
+    """
+    with _embedding_models_lock:
+        if model_name not in _embedding_models:
+            from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+            _embedding_models[model_name] = SentenceTransformerEmbeddings(model_name=model_name)
+        return _embedding_models[model_name]
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def remove_stale_indexes(index_dir: Path, keep: str) -> None:
+    """Delete indexes built from older versions of the documents or other models"""
+    if not index_dir.is_dir():
+        return
+    for entry in index_dir.iterdir():
+        if entry.is_dir() and entry.name != keep:
+            shutil.rmtree(entry, ignore_errors=True)
+
 
 class RAGEngine:
-    def __init__(self, docs_path: str):
+    def __init__(self, docs_path: str, index_dir: Optional[Path] = None, model_name: Optional[str] = None):
         self.docs_path = docs_path
+        self.index_dir = Path(index_dir) if index_dir else (
+            Path(settings.rag_index_dir) if settings.rag_index_dir else BASE_DIR / "storage" / "rag_index"
+        )
+        self.model_name = model_name or settings.rag_embedding_model
         self.db = None
+        self.embeddings = None
+        self.index_source: Optional[str] = None  # "disk" or "built"
+        self.index_key: Optional[str] = None
+        self._embedding_cache = LRUCache(settings.rag_query_cache_size)
+        self._result_cache = LRUCache(settings.rag_result_cache_size)
         self._initialize_db()
 
     def _initialize_db(self):
-        """Loads documents and creates a local vector store."""
+        """Loads the persisted vector store, or builds and persists it."""
         print(f"🔄 Initializing RAG Engine with docs from: {self.docs_path}")
         if not os.path.exists(self.docs_path):
             print(f"⚠️ Warning: Docs path {self.docs_path} does not exist.")
             return
 
-        # Load documents
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+
         try:
-            loader = TextLoader(self.docs_path)
-            documents = loader.load()
-            
-            # Split text
-            text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-            docs = text_splitter.split_documents(documents)
-            
-            # Create embeddings
-            # encryption=False avoids issues with some environments setup
-            embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-            
-            # Create vector store
-            self.db = FAISS.from_documents(docs, embeddings)
-            print("✅ RAG Engine initialized successfully.")
-            
+            started = time.perf_counter()
+            key = index_key(self.docs_path, self.model_name)
+            key_dir = self.index_dir / key
+
+            # The model is still needed to embed queries
+            embeddings = load_embeddings(self.model_name)
+            self.embeddings = embeddings
+
+            try:
+                stored = load_index(key_dir)
+            except Exception as e:
+                print(f"⚠️ Stored RAG index unreadable, rebuilding: {e!r}")
+                stored = None
+
+            if stored:
+                index, chunks = stored
+                docs = [Document(page_content=c["page_content"], metadata=c.get("metadata") or {}) for c in chunks]
+                ids = [str(i) for i in range(len(docs))]
+                self.db = FAISS(
+                    embedding_function=embeddings,
+                    index=index,
+                    docstore=InMemoryDocstore(dict(zip(ids, docs))),
+                    index_to_docstore_id=dict(enumerate(ids)),
+                )
+                self.index_source = "disk"
+            else:
+                self.db = self._build(embeddings)
+                self.index_source = "built"
+                chunks = [
+                    {"page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in (self.db.docstore.search(self.db.index_to_docstore_id[i]) for i in range(self.db.index.ntotal))
+                ]
+                try:
+                    save_index(key_dir, self.db.index, chunks, self.model_name)
+                    remove_stale_indexes(self.index_dir, keep=key)
+                except OSError as e:
+                    print(f"⚠️ Could not persist RAG index to {key_dir}: {e}")
+            # Cached queries are only valid for this version of the index
+            self.index_key = key
+
+            print(f"✅ RAG Engine initialized successfully ({self.index_source} index, "
+                  f"{self.db.index.ntotal} chunks, {time.perf_counter() - started:.1f}s).")
+
         except Exception as e:
             print(f"❌ Error initializing RAG Engine: {e}")
 
-    def query(self, query_text: str, k: int = 3) -> List[Document]:
+    def _build(self, embeddings):
+        """Split and embed the documents into a new vector store"""
+        from langchain_community.document_loaders import TextLoader
+        from langchain_community.vectorstores import FAISS
+        from langchain_text_splitters import CharacterTextSplitter
+
+        # Load documents
+        loader = TextLoader(self.docs_path)
+        documents = loader.load()
+
+        # Split text
+        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+        docs = text_splitter.split_documents(documents)
+
+        # Create vector store
+        return FAISS.from_documents(docs, embeddings)
+
+    def query(self, query_text: str, k: int = 3) -> List["Document"]:
         """Search the vector database for relevant documents."""
         if not self.db:
             print("⚠️ RAG DB not initialized.")
             return []
             
         try:
-            results = self.db.similarity_search(query_text, k=k)
+            text = normalize_query(query_text, self.model_name)
+            result_key = (self.index_key, text, k)
+            results = self._result_cache.get(result_key)
+            if results is not None:
+                # Callers get their own copies of the cached documents
+                return [_copy_document(doc) for doc in results]
+
+            # Checks abandoned by a timed-out caller stop between the steps
+            if deadline.expired():
+                return []
+            embedding_key = (self.index_key, text)
+            vector = self._embedding_cache.get(embedding_key)
+            if vector is None:
+                vector = self.embeddings.embed_query(text)
+                self._embedding_cache.put(embedding_key, vector)
+            if deadline.expired():
+                return []
+
+            results = self.db.similarity_search_by_vector(vector, k=k)
+            self._result_cache.put(result_key, tuple(_copy_document(doc) for doc in results))
             return results
         except Exception as e:
             print(f"❌ Error querying RAG Engine: {e}")
             return []
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit rates of the query embedding and top-k result caches"""
+        return {
+            "index_key": self.index_key,
+            "embeddings": self._embedding_cache.get_stats(),
+            "results": self._result_cache.get_stats(),
+        }
+
     def check_compliance(self, design_description: str) -> dict:
         """
         Simple heuristic compliance check. 
@@ -0,0 +1,422 @@
+"""
+Provider resilience for AI clients: pacing, retries and circuit breaking
+
+Each AI provider gets a ``ProviderResilience`` combining:
+- a token-bucket pacer that also honours rate-limit and Retry-After headers
+- retries with exponential backoff and full jitter
+- a circuit breaker that fails fast while the provider is down, so callers
+  drop straight to their fallback path instead of waiting out retries
+"""
+
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+from ai_modules import deadline
+from config.settings import settings
+
+T = TypeVar("T")
+
+# Classifier result: (retryable, retry_after_seconds)
+Classification = Tuple[bool, Optional[float]]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's circuit breaker is open"""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse rate-limit durations into seconds
+
+    Accepts plain seconds ("2", "0.5"), OpenAI-style durations ("1s",
+    "6m0s", "20ms") and HTTP dates (Retry-After).
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        factors = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+        return sum(float(n) * factors[u] for n, u in parts)
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for a zero-based attempt number"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Async token-bucket pacer
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        """Hold all callers for ``seconds`` (e.g. from Retry-After)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adapt to provider rate-limit headers"""
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.pause(retry_after)
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.strip() in ("0", "0.0"):
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.pause(reset)
+
+    async def acquire(self) -> None:
+        """Wait until a token is available"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after ``failure_threshold`` consecutive failures;
+    open -> half-open after ``recovery_timeout`` seconds, letting one trial
+    call through; half-open -> closed on success, back to open on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """
+        End a half-open trial without an outcome (deadline, cancellation):
+        the breaker stays half-open and the next call becomes the trial
+        """
+        if self._state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class ProviderResilience:
+    """
+    Pacing, retry and circuit-breaker policy for one AI provider
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_second: float,
+        burst: float,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        failure_threshold: int,
+        recovery_timeout: float,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "successes": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "rate_limited": 0,
+            "deadline_exceeded": 0,
+        }
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """Feed response headers into the pacer"""
+        self.bucket.update_from_headers(headers)
+
+    def _ensure_allowed(self) -> bool:
+        """
+        Raise if the breaker rejects the call
+
+        Returns:
+            True if the call is the breaker's half-open trial; the caller
+            must then release it however the call ends
+        """
+        trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+        if not self.breaker.allow():
+            self._stats["short_circuited"] += 1
+            raise CircuitOpenError(f"Circuit breaker for '{self.name}' is open")
+        return trial
+
+    async def _acquire(self) -> None:
+        """Wait for a pacer token within the request deadline"""
+        try:
+            await deadline.run_within(self.bucket.acquire(), f"{self.name} call")
+        except deadline.DeadlineExceeded:
+            self._stats["deadline_exceeded"] += 1
+            raise
+
+    @asynccontextmanager
+    async def attempt(self, classify: Callable[[Exception], Classification]):
+        """
+        Guard a single, non-retried attempt (e.g. opening a stream).
+        Checks the breaker, waits for a token and records the outcome.
+
+        Args:
+            classify: Maps an exception to ``(retryable, retry_after_seconds)``,
+                as for ``execute``. Only retryable errors count against the
+                circuit breaker.
+        """
+        self._stats["calls"] += 1
+        trial = self._ensure_allowed()
+        try:
+            await self._acquire()
+            self._stats["attempts"] += 1
+            try:
+                yield
+            except deadline.DeadlineExceeded:
+                self._stats["deadline_exceeded"] += 1
+                raise
+            except Exception as e:
+                self._stats["failures"] += 1
+                retryable, retry_after = classify(e)
+                if not retryable:
+                    # Client errors say nothing about provider health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if retry_after is not None:
+                    self._stats["rate_limited"] += 1
+                    self.bucket.pause(retry_after)
+                raise
+            self._stats["successes"] += 1
+            self.breaker.record_success()
+        finally:
+            # A trial ended by the deadline or a cancellation is neutral;
+            # it must not keep the breaker half-open forever
+            if trial:
+                self.breaker.release_trial()
+
+    async def execute(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        classify: Callable[[Exception], Classification],
+    ) -> T:
+        """
+        Run ``operation`` with pacing, retries and circuit breaking
+
+        Args:
+            operation: Zero-argument coroutine factory, called once per attempt
+            classify: Maps an exception to ``(retryable, retry_after_seconds)``.
+                Only retryable errors count against the circuit breaker.
+
+        Every attempt is bounded by the request deadline (see
+        ``ai_modules.deadline``), and a retry whose backoff would outlast it
+        is skipped.
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            DeadlineExceeded: If the request deadline runs out
+            Exception: The last error once retries are exhausted
+        """
+        self._stats["calls"] += 1
+        trial = self._ensure_allowed()
+        try:
+            return await self._execute(operation, classify)
+        finally:
+            # A trial ended by the deadline or a cancellation is neutral;
+            # it must not keep the breaker half-open forever
+            if trial:
+                self.breaker.release_trial()
+
+    async def _execute(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        classify: Callable[[Exception], Classification],
+    ) -> T:
+        for attempt in range(self.max_attempts):
+            await self._acquire()
+            self._stats["attempts"] += 1
+            try:
+                result = await deadline.run_within(operation(), f"{self.name} call")
+            except deadline.DeadlineExceeded:
+                # Our budget ran out; that says nothing about provider health
+                self._stats["deadline_exceeded"] += 1
+                raise
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if not retryable:
+                    # Client errors say nothing about provider health
+                    self.breaker.record_success()
+                    self._stats["failures"] += 1
+                    raise
+                self.breaker.record_failure()
+                if retry_after is not None:
+                    self._stats["rate_limited"] += 1
+                    self.bucket.pause(retry_after)
+                last_attempt = attempt == self.max_attempts - 1
+                if last_attempt or self.breaker.state != CircuitBreaker.CLOSED:
+                    self._stats["failures"] += 1
+                    raise
+                delay = max(retry_after or 0.0, backoff_delay(attempt, self.base_delay, self.max_delay))
+                if not deadline.fits(delay):
+                    self._stats["failures"] += 1
+                    self._stats["deadline_exceeded"] += 1
+                    raise
+                self._stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._stats["successes"] += 1
+            return result
+
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_times_opened": self.breaker.times_opened,
+            "rate_per_second": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "pacer_waited_seconds": round(self.bucket.waited_seconds, 3),
+            **self._stats,
+        }
+
+
+def classify_http_error(error: Exception) -> Classification:
+    """Classify httpx errors: 408/429/5xx and transport errors are retryable"""
+    import httpx
+
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        retry_after = None
+        if status_code == 429:
+            retry_after = parse_duration(error.response.headers.get("retry-after")) or parse_duration(
+                error.response.headers.get("x-ratelimit-reset-requests")
+            )
+        return status_code in (408, 429) or status_code >= 500, retry_after
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True, None
+    return False, None
+
+
+def classify_sdk_error(error: Exception) -> Classification:
+    """Classify Google Gen AI SDK errors by their HTTP status code"""
+    if isinstance(error, (CircuitOpenError, ValueError, TypeError)):
+        return False, None
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code is None:
+        match = re.search(r"\b(4\d\d|5\d\d)\b", str(error))
+        code = int(match.group(1)) if match else None
+    if code is None:
+        # Connection problems and timeouts carry no status code
+        return True, None
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return True, None
+    return code in (408, 429) or code >= 500, None
+
+
+def _build(name: str, rate_per_second: float, burst: float) -> ProviderResilience:
+    return ProviderResilience(
+        name,
+        rate_per_second=rate_per_second,
+        burst=burst,
+        max_attempts=settings.ai_retry_max_attempts,
+        base_delay=settings.ai_retry_base_delay,
+        max_delay=settings.ai_retry_max_delay,
+        failure_threshold=settings.ai_breaker_failure_threshold,
+        recovery_timeout=settings.ai_breaker_recovery_seconds,
+    )
+
+
+# Global per-provider instances
+proxyapi_resilience = _build("proxyapi", settings.proxyapi_rate_limit_per_second, settings.proxyapi_rate_limit_burst)
+gemini_resilience = _build("gemini", settings.gemini_rate_limit_per_second, settings.gemini_rate_limit_burst)
+
+
+def get_provider_stats() -> Dict[str, Dict[str, Any]]:
+    """Resilience stats for every provider"""
+    return {r.name: r.get_stats() for r in (proxyapi_resilience, gemini_resilience)}
@@ -0,0 +1,289 @@
+"""
+Content-addressed response cache for AI provider calls
+
+Two tiers:
+- an in-process LRU (bounded by entry count) that answers repeats instantly
+- a shared second tier, either a local disk directory (bounded by size) or
+  Redis (bounded by the server's ``maxmemory`` eviction policy)
+
+Keys are SHA-256 hashes of the canonical JSON of the call parameters, so
+identical ``(model, messages, temperature, max_tokens)`` tuples map to the
+same entry regardless of dict ordering.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from config.settings import settings, BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(kind: str, **params: Any) -> str:
+    """Build a content-addressed key from the call kind and its parameters"""
+    canonical = json.dumps({"kind": kind, **params}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """JSON files under a directory, evicting least recently used files over the size limit"""
+
+    name = "disk"
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._total_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _scan_size(self) -> int:
+        if not self.cache_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json"))
+
+    def _get_sync(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            self._delete_sync(path)
+            return None
+        # Touch the file so eviction approximates LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("value"), entry.get("expires_at")
+
+    def _delete_sync(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+        except OSError:
+            pass
+
+    def _set_sync(self, key: str, value: Any, ttl: int) -> None:
+        if self._total_bytes is None:
+            self._total_bytes = self._scan_size()
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"expires_at": time.time() + ttl, "value": value}, ensure_ascii=False).encode("utf-8")
+        previous = path.stat().st_size if path.exists() else 0
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._total_bytes += len(data) - previous
+        if self._total_bytes > self.max_bytes:
+            self._evict_sync()
+
+    def _evict_sync(self) -> None:
+        files = sorted(self.cache_dir.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        # Evict down to 90% of the limit so we don't scan on every write
+        target = int(self.max_bytes * 0.9)
+        for path in files:
+            if self._total_bytes <= target:
+                break
+            self._delete_sync(path)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """(value, expires_at epoch seconds) or None on miss"""
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await asyncio.to_thread(self._set_sync, key, value, ttl)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _RedisTier:
+    """Redis-backed tier; size bounds come from the server's maxmemory policy"""
+
+    name = "redis"
+
+    def __init__(self, redis_url: str, prefix: str = "dubaicons:ai:"):
+        import redis.asyncio as aioredis
+
+        self.client = aioredis.from_url(redis_url)
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """(value, expires_at epoch seconds) or None on miss"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(self.prefix + key)
+            pipe.pttl(self.prefix + key)
+            raw, pttl = await pipe.execute()
+        if raw is None:
+            return None
+        # PTTL is negative for keys without an expiry
+        expires_at = time.time() + pttl / 1000 if pttl is not None and pttl >= 0 else None
+        return json.loads(raw), expires_at
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=ttl)
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class ResponseCache:
+    """
+    Two-tier TTL cache for AI provider responses
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        backend: str = "disk",
+        max_entries: int = 256,
+        cache_dir: Optional[Path] = None,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+        redis_url: Optional[str] = None,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tier = None
+        self._stats = {
+            "hits_memory": 0,
+            "hits_tier": 0,
+            "misses": 0,
+            "sets": 0,
+            "bypassed": 0,
+            "memory_evictions": 0,
+            "tier_errors": 0,
+        }
+
+        if not enabled or backend == "memory":
+            return
+        try:
+            if backend == "redis":
+                self._tier = _RedisTier(redis_url or settings.redis_url)
+            else:
+                self._tier = _DiskTier(cache_dir or BASE_DIR / "storage" / "ai_cache", disk_max_bytes)
+        except Exception as e:
+            logger.warning(f"AI response cache tier '{backend}' unavailable, using memory only: {e}")
+            self._tier = None
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Any, ttl: float) -> None:
+        self._memory[key] = (time.time() + ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def record_bypass(self) -> None:
+        """Count a call that skipped the cache on request"""
+        self._stats["bypassed"] += 1
+
+    async def get(self, key: str, ttl: int) -> Optional[Any]:
+        """
+        Look up a key in memory, then in the shared tier
+
+        Args:
+            key: Cache key from ``make_cache_key``
+            ttl: TTL used when promoting a shared-tier hit that carries no
+                expiry of its own into memory
+
+        Returns:
+            Cached value or None on miss
+        """
+        if not self.enabled:
+            return None
+
+        value = self._memory_get(key)
+        if value is not None:
+            self._stats["hits_memory"] += 1
+            return value
+
+        if self._tier is not None:
+            try:
+                entry = await self._tier.get(key)
+            except Exception as e:
+                self._stats["tier_errors"] += 1
+                logger.warning(f"AI response cache read failed: {e}")
+                entry = None
+            value, expires_at = entry if entry is not None else (None, None)
+            if value is not None:
+                self._stats["hits_tier"] += 1
+                # Promote for the time the entry has left, not a fresh TTL:
+                # provider image URLs expire with the original entry
+                remaining = ttl if expires_at is None else min(ttl, expires_at - time.time())
+                if remaining > 0:
+                    self._memory_set(key, value, remaining)
+                return value
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        """Store a value in both tiers"""
+        if not self.enabled or value is None:
+            return
+        self._stats["sets"] += 1
+        self._memory_set(key, value, ttl)
+        if self._tier is not None:
+            try:
+                await self._tier.set(key, value, ttl)
+            except Exception as e:
+                self._stats["tier_errors"] += 1
+                logger.warning(f"AI response cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes for monitoring"""
+        lookups = self._stats["hits_memory"] + self._stats["hits_tier"] + self._stats["misses"]
+        hits = self._stats["hits_memory"] + self._stats["hits_tier"]
+        return {
+            "enabled": self.enabled,
+            "backend": self._tier.name if self._tier is not None else "memory",
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self.max_entries,
+            "tier_evictions": self._tier.evictions if self._tier is not None else 0,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            **self._stats,
+        }
+
+    async def aclose(self) -> None:
+        """Release the shared tier connection"""
+        if self._tier is not None:
+            await self._tier.aclose()
+
+
+# Global cache instance
+response_cache = ResponseCache(
+    enabled=settings.ai_cache_enabled,
+    backend=settings.ai_cache_backend,
+    max_entries=settings.ai_cache_memory_entries,
+    cache_dir=Path(settings.ai_cache_dir) if settings.ai_cache_dir else None,
+    disk_max_bytes=settings.ai_cache_disk_max_mb * 1024 * 1024,
+    redis_url=settings.redis_url,
+)
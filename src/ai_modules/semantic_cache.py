@@ -0,0 +1,322 @@
+"""
+Semantic near-duplicate cache for design concepts
+
+Design requests often differ only in wording ("modern luxury villa 400 sqm"
+vs. "400sqm villa, modern luxury style"). The cache embeds each
+``(client_preferences, project_details)`` pair that produced a stored
+``DesignConcept`` with the sentence-transformer model used by the RAG engine,
+and keeps the vectors in a FAISS inner-product index persisted to disk
+(written in batches by a background flusher and on shutdown). A new
+request whose embedding is within the similarity threshold of a past one can
+reuse that concept instead of calling the LLM.
+
+Requests only match within the same scope: image options and every number
+in the request (areas, room counts, budgets) must be equal, since embeddings
+barely tell "400 sqm" from "200 sqm".
+
+faiss, numpy and sentence-transformers are optional; without them the cache
+stays disabled and every lookup misses.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from config.settings import settings, BASE_DIR
+from ai_modules.executors import MeteredExecutor
+
+logger = logging.getLogger(__name__)
+
+# Embedding and index work is CPU-bound; keep it off the event loop and
+# away from the provider pools
+semantic_cache_executor = MeteredExecutor("semantic-cache", max_workers=1, max_queue=64)
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+# Neighbours fetched per lookup before filtering by scope
+_SEARCH_K = 20
+
+
+def request_text(client_preferences: str, project_details: str) -> str:
+    """Normalised text that gets embedded for a design request"""
+    text = f"{client_preferences.strip()}. {project_details.strip()}"
+    return re.sub(r"\s+", " ", text).casefold()
+
+
+def request_scope(client_preferences: str, project_details: str, **options: Any) -> str:
+    """
+    Exact-match part of the cache key: the given options plus every number
+    mentioned in the request
+    """
+    numbers = sorted({n.replace(",", ".") for n in _NUMBER_RE.findall(f"{client_preferences} {project_details}")})
+    parts = [f"{key}={options[key]}" for key in sorted(options)]
+    parts.append("numbers=" + ",".join(numbers))
+    return "|".join(parts)
+
+
+def _default_embedder(model_name: str) -> Callable[[List[str]], List[List[float]]]:
+    # Shared with the RAG engine when both use the same model
+    from ai_modules.rag_engine import load_embeddings
+
+    return load_embeddings(model_name).embed_documents
+
+
+class SemanticCache:
+    """
+    Persistent embedding index over past design requests
+
+    Args:
+        index_dir: Directory for ``index.faiss`` and ``entries.json``
+        model_name: Sentence-transformer model for the embeddings
+        threshold: Minimum cosine similarity for a hit
+        embedder: Callable embedding a batch of texts (defaults to the
+            sentence-transformer model, loaded on first use)
+        flush_interval: Seconds between background writes of new entries;
+            the index is also written on shutdown
+    """
+
+    def __init__(
+        self,
+        index_dir: Path,
+        model_name: str,
+        threshold: float,
+        embedder: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        flush_interval: float = 30.0,
+    ):
+        self.index_dir = Path(index_dir)
+        self.model_name = model_name
+        self.threshold = threshold
+        self._embedder = embedder
+        self.flush_interval = flush_interval
+        self._index = None
+        self._entries: List[Dict[str, Any]] = []
+        self._removed: Set[int] = set()
+        self._loaded = False
+        self._dirty = False
+        self._available = True
+        self._lock = threading.Lock()
+        self._pending: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "added": 0, "forgotten": 0, "saves": 0, "errors": 0}
+
+    # --- index management (worker thread) ----------------------------------
+
+    def _embed(self, texts: List[str]):
+        import numpy as np
+
+        if self._embedder is None:
+            self._embedder = _default_embedder(self.model_name)
+        vectors = np.asarray(self._embedder(texts), dtype="float32")
+        # Unit vectors: inner product == cosine similarity
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _ensure_loaded(self) -> bool:
+        """Load the persisted index on first use; False if the stack is missing"""
+        if self._loaded:
+            return self._available
+        self._loaded = True
+        try:
+            import faiss  # noqa: F401
+            import numpy  # noqa: F401
+        except ImportError as e:
+            logger.warning(f"Semantic cache disabled: {e}")
+            self._available = False
+            return False
+
+        index_path, entries_path = self.index_dir / "index.faiss", self.index_dir / "entries.json"
+        if index_path.exists() and entries_path.exists():
+            try:
+                meta = json.loads(entries_path.read_text(encoding="utf-8"))
+                if meta.get("model") == self.model_name:
+                    self._index = faiss.read_index(str(index_path))
+                    self._entries = meta["entries"]
+                    self._removed = set(meta.get("removed", []))
+                    logger.info(f"Semantic cache loaded: {len(self._entries)} entries from {self.index_dir}")
+                else:
+                    logger.info(f"Semantic cache built with {meta.get('model')}; starting a new index for {self.model_name}")
+            except Exception as e:
+                logger.warning(f"Semantic cache index unreadable, starting empty: {e!r}")
+                self._index, self._entries, self._removed = None, [], set()
+        return True
+
+    def _save(self) -> None:
+        import faiss
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        index_tmp = self.index_dir / f".tmp-{os.getpid()}-index.faiss"
+        entries_tmp = self.index_dir / f".tmp-{os.getpid()}-entries.json"
+        faiss.write_index(self._index, str(index_tmp))
+        entries_tmp.write_text(json.dumps({
+            "model": self.model_name,
+            "entries": self._entries,
+            "removed": sorted(self._removed),
+        }), encoding="utf-8")
+        os.replace(index_tmp, self.index_dir / "index.faiss")
+        os.replace(entries_tmp, self.index_dir / "entries.json")
+
+    def lookup_sync(self, text: str, scope: str) -> Optional[Dict[str, Any]]:
+        """
+        Closest past request in ``scope`` above the threshold
+
+        Returns:
+            ``{"concept_id", "similarity", "text"}`` or None
+        """
+        with self._lock:
+            if not self._ensure_loaded() or self._index is None or self._index.ntotal == 0:
+                return None
+            vector = self._embed([text])
+            scores, positions = self._index.search(vector, min(_SEARCH_K, self._index.ntotal))
+            for score, position in zip(scores[0], positions[0]):
+                if position < 0 or score < self.threshold:
+                    break
+                entry = self._entries[position]
+                if position in self._removed or entry["scope"] != scope:
+                    continue
+                return {"concept_id": entry["concept_id"], "similarity": round(float(score), 4), "text": entry["text"]}
+        return None
+
+    def add_sync(self, concept_id: int, text: str, scope: str) -> None:
+        import faiss
+
+        with self._lock:
+            if not self._ensure_loaded():
+                return
+            vector = self._embed([text])
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(vector.shape[1])
+            self._index.add(vector)
+            self._entries.append({"concept_id": concept_id, "text": text, "scope": scope, "added_at": time.time()})
+            # Written by the next flush rather than rewriting the index per entry
+            self._dirty = True
+
+    def forget_sync(self, concept_ids: Sequence[int]) -> int:
+        """Stop matching the given concepts (e.g. deleted rows)"""
+        with self._lock:
+            if not self._ensure_loaded() or self._index is None:
+                return 0
+            ids = set(concept_ids)
+            removed = {i for i, entry in enumerate(self._entries) if entry["concept_id"] in ids} - self._removed
+            if removed:
+                self._removed |= removed
+                self._dirty = True
+            return len(removed)
+
+    def flush_sync(self) -> bool:
+        """Write the index if it changed since the last write"""
+        with self._lock:
+            if not self._dirty or self._index is None:
+                return False
+            self._save()
+            self._dirty = False
+            return True
+
+    # --- async API ---------------------------------------------------------
+
+    async def lookup(
+        self,
+        client_preferences: str,
+        project_details: str,
+        timeout: Optional[float] = None,
+        **scope_options: Any,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored concept for a near-identical request
+
+        Never raises: errors, a missing stack or a timeout (e.g. while the
+        model loads on first use) count as a miss.
+        """
+        self._stats["lookups"] += 1
+        text = request_text(client_preferences, project_details)
+        scope = request_scope(client_preferences, project_details, **scope_options)
+        try:
+            match = await semantic_cache_executor.run(self.lookup_sync, text, scope, timeout=timeout)
+        except asyncio.TimeoutError:
+            match = None
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Semantic cache lookup failed: {e!r}")
+            match = None
+        self._stats["hits" if match else "misses"] += 1
+        return match
+
+    async def add(self, concept_id: int, client_preferences: str, project_details: str, **scope_options: Any) -> None:
+        text = request_text(client_preferences, project_details)
+        scope = request_scope(client_preferences, project_details, **scope_options)
+        try:
+            await semantic_cache_executor.run(self.add_sync, concept_id, text, scope)
+            self._stats["added"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Semantic cache add failed: {e!r}")
+
+    def schedule_add(self, concept_id: int, client_preferences: str, project_details: str, **scope_options: Any) -> None:
+        """Index a concept in the background (the response does not wait)"""
+        task = asyncio.ensure_future(self.add(concept_id, client_preferences, project_details, **scope_options))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def forget(self, concept_ids: Sequence[int]) -> None:
+        try:
+            forgotten = await semantic_cache_executor.run(self.forget_sync, list(concept_ids))
+            self._stats["forgotten"] += forgotten
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Semantic cache forget failed: {e!r}")
+
+    async def flush(self) -> None:
+        try:
+            if await semantic_cache_executor.run(self.flush_sync):
+                self._stats["saves"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Semantic cache save failed: {e!r}")
+
+    async def _flusher(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start the background flusher (called from the app lifespan)"""
+        if self._task or not settings.semantic_cache_enabled:
+            return
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self) -> None:
+        """Stop the flusher, finish pending adds and write the index"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["lookups"]
+        return {
+            "enabled": settings.semantic_cache_enabled,
+            "available": self._available if self._loaded else None,
+            "index_dir": str(self.index_dir),
+            "model": self.model_name,
+            "threshold": self.threshold,
+            "entries": len(self._entries) - len(self._removed),
+            "unsaved_changes": self._dirty,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self._stats,
+        }
+
+
+# Global cache instance
+semantic_cache = SemanticCache(
+    index_dir=Path(settings.semantic_cache_dir) if settings.semantic_cache_dir else BASE_DIR / "storage" / "semantic_cache",
+    model_name=settings.semantic_cache_model,
+    threshold=settings.semantic_cache_threshold,
+    flush_interval=settings.semantic_cache_flush_seconds,
+)
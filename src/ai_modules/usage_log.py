@@ -0,0 +1,316 @@
+"""
+Token, cost and latency accounting for AI provider calls
+
+Every provider call (and every response-cache hit that saved one) is
+recorded with its model, prompt/completion tokens, estimated cost, latency
+and outcome into the ``ai_calls`` table. Records are buffered in memory and
+written in batches by a background flusher, so accounting adds no database
+round trip to the request path.
+
+Calls are attributed to the endpoint, user and project of the request that
+caused them through a context variable set by ``api.middleware`` (and by the
+job queue for background jobs); handlers that learn the project later call
+``attribute(project_id=...)``.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Attribution of the current request or job; a mutable dict so handlers can
+# add fields after the middleware has opened the context
+_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("ai_usage_context", default=None)
+
+# USD list prices. Text models: per 1M input/output tokens; image models: per
+# image (by quality). Overridden or extended by settings.ai_usage_prices.
+DEFAULT_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4": {"input": 30.0, "output": 60.0},
+    "gpt-4-turbo": {"input": 10.0, "output": 30.0},
+    "gpt-4o": {"input": 2.5, "output": 10.0},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.6},
+    "gpt-3.5-turbo": {"input": 0.5, "output": 1.5},
+    "deepseek-chat": {"input": 0.27, "output": 1.1},
+    "gemini-1.5-flash": {"input": 0.075, "output": 0.3},
+    "gemini-1.5-pro": {"input": 1.25, "output": 5.0},
+    "dall-e-3": {"image": 0.04, "image_hd": 0.08},
+    "dall-e-2": {"image": 0.02},
+    "imagen-3.0-generate-001": {"image": 0.03},
+}
+
+GROUP_BY_COLUMNS = ("endpoint", "user", "project", "day", "model", "provider", "outcome")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@contextmanager
+def usage_context(**fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Attribute AI calls made inside the block (``endpoint``, ``user_id``,
+    ``project_id``), inheriting fields the block does not set
+    """
+    parent = _context.get() or {}
+    token = _context.set({**parent, **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield _context.get()
+    finally:
+        _context.reset(token)
+
+
+def attribute(**fields: Any) -> None:
+    """Add attribution (e.g. the project id from a request body) to the current context"""
+    current = _context.get()
+    if current is not None:
+        current.update({k: v for k, v in fields.items() if v is not None})
+
+
+def current_attribution() -> Dict[str, Any]:
+    """Endpoint, user and project of the current context"""
+    current = _context.get() or {}
+    endpoint = current.get("endpoint")
+    project_id = current.get("project_id")
+    scope = current.get("scope")
+    if scope is not None:
+        # Resolved lazily: the router adds the matched route to the ASGI
+        # scope after the middleware opened the context
+        route = scope.get("route")
+        endpoint = endpoint or f"{scope.get('method', '')} {getattr(route, 'path', scope.get('path', ''))}".strip()
+        if project_id is None:
+            project_id = (scope.get("path_params") or {}).get("project_id")
+    try:
+        project_id = int(project_id) if project_id is not None else None
+    except (TypeError, ValueError):
+        project_id = None
+    return {"endpoint": endpoint, "user_id": current.get("user_id"), "project_id": project_id}
+
+
+def price_for(model: str) -> Optional[Dict[str, float]]:
+    prices = {**DEFAULT_PRICES, **settings.ai_usage_prices}
+    if model in prices:
+        return prices[model]
+    # Dated snapshots ("gpt-4o-2024-08-06") use the base model's price
+    base = max((name for name in prices if model.startswith(name + "-")), key=len, default=None)
+    return prices.get(base) if base else None
+
+
+def estimate_cost(model: str, prompt_tokens: int = 0, completion_tokens: int = 0, images: int = 0,
+                  quality: Optional[str] = None) -> float:
+    """Estimated USD cost of a call (0.0 for models without a price)"""
+    price = price_for(model)
+    if not price:
+        return 0.0
+    cost = (prompt_tokens * price.get("input", 0.0) + completion_tokens * price.get("output", 0.0)) / 1_000_000
+    if images:
+        per_image = price.get(f"image_{quality}", price.get("image", 0.0)) if quality else price.get("image", 0.0)
+        cost += images * per_image
+    return round(cost, 6)
+
+
+def outcome_for(error: BaseException) -> str:
+    """Outcome label of a failed call"""
+    from ai_modules.deadline import DeadlineExceeded
+    from ai_modules.resilience import CircuitOpenError
+
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
+
+class UsageLog:
+    """
+    Buffered writer and aggregate queries for the ``ai_calls`` table
+
+    Args:
+        flush_interval: Seconds between background flushes
+        flush_size: Buffered records that trigger an early flush
+        max_buffer: Records kept while the database is unavailable; the
+            oldest are dropped beyond this
+    """
+
+    def __init__(self, flush_interval: float, flush_size: int, max_buffer: int):
+        self.flush_interval = flush_interval
+        self.flush_size = max(1, flush_size)
+        self.max_buffer = max(self.flush_size, max_buffer)
+        self._buffer: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stats = {"recorded": 0, "flushed": 0, "dropped": 0, "flush_errors": 0}
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        operation: str,
+        latency_ms: float,
+        outcome: str = "ok",
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        images: int = 0,
+        quality: Optional[str] = None,
+        estimated_tokens: bool = False,
+    ) -> None:
+        """Buffer one call record (never raises, never blocks)"""
+        if not settings.ai_usage_enabled:
+            return
+        if outcome == "cached" and not settings.ai_usage_record_cache_hits:
+            return
+        billable = outcome not in ("cached", "circuit_open")
+        self._buffer.append({
+            "created_at": _utcnow(),
+            "provider": provider,
+            "model": model,
+            "operation": operation,
+            **current_attribution(),
+            "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "images": images or 0,
+            "estimated_tokens": estimated_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens or 0, completion_tokens or 0, images or 0, quality)
+            if billable else 0.0,
+            "latency_ms": round(latency_ms, 1),
+            "outcome": outcome,
+        })
+        self._stats["recorded"] += 1
+        if len(self._buffer) > self.max_buffer:
+            dropped = len(self._buffer) - self.max_buffer
+            del self._buffer[:dropped]
+            self._stats["dropped"] += dropped
+        if len(self._buffer) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    # ---- Database operations (blocking, run in threads) ----
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        from database.connection import SessionLocal
+        from database.models import AICall
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(AICall, rows)
+            db.commit()
+        finally:
+            db.close()
+
+    async def flush(self) -> int:
+        """Write the buffered records; on failure they stay buffered for the next flush"""
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            self._stats["flush_errors"] += 1
+            logger.warning(f"AI usage flush failed ({len(rows)} records kept): {e!r}")
+            self._buffer[:0] = rows
+            return 0
+        self._stats["flushed"] += len(rows)
+        return len(rows)
+
+    def aggregate_sync(self, group_by: str = "endpoint", days: float = 7.0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Calls, tokens, cost and latency per ``group_by`` value over the last ``days``
+
+        Rows are ordered by cost, most expensive first.
+        """
+        from sqlalchemy import case, func
+        from database.connection import SessionLocal
+        from database.models import AICall
+
+        if group_by not in GROUP_BY_COLUMNS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY_COLUMNS)}")
+        columns = {
+            "user": AICall.user_id,
+            "project": AICall.project_id,
+            "day": func.date(AICall.created_at),
+        }
+        column = columns[group_by] if group_by in columns else getattr(AICall, group_by)
+        cost = func.sum(AICall.cost_usd)
+
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                column.label("key"),
+                func.count(AICall.id),
+                func.sum(case((AICall.outcome == "ok", 1), else_=0)),
+                func.sum(case((AICall.outcome == "cached", 1), else_=0)),
+                func.sum(AICall.prompt_tokens),
+                func.sum(AICall.completion_tokens),
+                func.sum(AICall.images),
+                cost,
+                func.avg(case((AICall.outcome != "cached", AICall.latency_ms))),
+                func.max(AICall.latency_ms),
+            ).filter(
+                AICall.created_at >= _utcnow() - timedelta(days=days)
+            ).group_by(column).order_by(cost.desc()).limit(limit).all()
+        finally:
+            db.close()
+        return [
+            {
+                group_by: str(key) if group_by == "day" and key is not None else key,
+                "calls": calls,
+                "succeeded": int(ok or 0),
+                "cached": int(cached or 0),
+                "failed": calls - int(ok or 0) - int(cached or 0),
+                "prompt_tokens": int(prompt or 0),
+                "completion_tokens": int(completion or 0),
+                "images": int(images or 0),
+                "cost_usd": round(total_cost or 0.0, 4),
+                "avg_latency_ms": round(avg_latency, 1) if avg_latency is not None else None,
+                "max_latency_ms": max_latency,
+            }
+            for key, calls, ok, cached, prompt, completion, images, total_cost, avg_latency, max_latency in rows
+        ]
+
+    # ---- Background flusher ----
+
+    async def _flusher(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start the background flusher (called from the app lifespan)"""
+        if self._task or not settings.ai_usage_enabled:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write what is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.ai_usage_enabled,
+            "buffered": len(self._buffer),
+            **self._stats,
+        }
+
+
+# Global usage log instance
+usage_log = UsageLog(
+    flush_interval=settings.ai_usage_flush_seconds,
+    flush_size=settings.ai_usage_flush_size,
+    max_buffer=settings.ai_usage_max_buffer,
+)
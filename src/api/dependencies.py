@@ -2,7 +2,9 @@
 Dependencies for FastAPI routes
 """
 
-from fastapi import Depends, HTTPException, status
+from typing import Callable, Optional
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from jose import JWTError
@@ -11,6 +13,7 @@ from database.connection import get_db
 from api.auth import verify_token
 from database.models import User
 from config.settings import settings
+from ai_modules.deadline import budget_from_header
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -59,3 +62,21 @@ async def get_current_active_user(
 
 # Alias for easy import
 get_current_user_dependency = get_current_user
+
+
+def request_deadline(default_seconds: float) -> Callable[..., float]:
+    """
+    Dependency factory for an endpoint's time budget in seconds
+
+    Read from the ``X-Request-Deadline`` header, falling back to
+    ``default_seconds`` and capped at ``request_deadline_max_seconds``. The
+    handler opens ``deadline_scope(budget)`` around its work.
+    """
+    def dependency(
+        x_request_deadline: Optional[str] = Header(
+            None, description="Time budget: seconds, a duration like 1m30s, or an HTTP date"
+        )
+    ) -> float:
+        return budget_from_header(x_request_deadline, default_seconds, settings.request_deadline_max_seconds)
+
+    return dependency
@@ -0,0 +1,41 @@
+"""
+ASGI middleware for the API
+"""
+
+from typing import Optional
+
+from ai_modules.usage_log import usage_context
+
+
+def _user_id_from_headers(headers) -> Optional[int]:
+    """User id from a bearer token, without a database lookup (None if absent or invalid)"""
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            from api.auth import verify_token
+
+            payload = verify_token(token.strip())
+            return payload.get("user_id") if payload else None
+    return None
+
+
+class UsageAttributionMiddleware:
+    """
+    Attribute AI provider calls made while serving a request to its
+    endpoint, user and project (see ``ai_modules.usage_log``)
+
+    A plain ASGI middleware, so the context also covers streaming response
+    bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with usage_context(scope=scope, user_id=_user_id_from_headers(scope.get("headers") or [])):
+            await self.app(scope, receive, send)
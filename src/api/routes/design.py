@@ -2,17 +2,29 @@
 API routes for design generation
 """
 
+import asyncio
+import time
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field, validator
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from datetime import datetime
 from services.design_service import design_service
 from services.compliance_service import compliance_service
 from services.visualization_service import visualization_service
+from services.single_flight import design_single_flight, request_key
+from services.job_queue import design_job_queue, job_to_dict
+from services.preset_library import preset_library, combination, WARMUP_JOB
 
-from database.connection import get_db
+from database.connection import get_db, SessionLocal
 from database.models import DesignConcept
-from ai_modules.presets import build_design_prompt_from_presets
+from ai_modules.presets import build_design_prompt_from_presets, build_room_prompts
+from ai_modules import deadline
+from ai_modules.semantic_cache import semantic_cache
+from ai_modules.usage_log import attribute as attribute_usage
+from api.dependencies import request_deadline
+from config.settings import settings
 import json
 
 router = APIRouter()
@@ -30,6 +42,8 @@ class PresetDesignRequest(BaseModel):
     rooms: List[RoomPreset] = Field(..., description="List of rooms")
     budget_range: str = Field(..., description="Budget range")
     additional_preferences: str = Field("", description="Additional preferences")
+    use_library: bool = Field(True, description="Serve rooms precomputed for popular preset combinations")
+    refresh_library: bool = Field(False, description="Regenerate the library rooms served in the background")
 
 
 class DesignRequest(BaseModel):
@@ -38,6 +52,10 @@ class DesignRequest(BaseModel):
     project_id: Optional[int] = Field(None, gt=0, description="Associated project ID")
     use_pro_for_image: bool = Field(False, description="Use Nano Banana Pro (Gemini) for high quality generation")
     check_compliance: bool = Field(False, description="Check design against Dubai building codes")
+    use_cache: bool = Field(True, description="Serve identical AI requests from the response cache")
+    variants: int = Field(1, ge=1, le=4, description="Number of image variants to render")
+    aspect_ratio: str = Field("1:1", description="Image aspect ratio: 1:1, 4:3, 3:4, 16:9 or 9:16")
+    reuse_similar: bool = Field(True, description="Reuse the concept of a near-identical earlier request (needs use_cache)")
     
     @validator('client_preferences')
     def validate_preferences(cls, v):
@@ -50,30 +68,163 @@ class DesignRequest(BaseModel):
         if not v or len(v.strip()) < 10:
             raise ValueError('Project details must be at least 10 characters')
         return v.strip()
+    
+    @validator('aspect_ratio')
+    def validate_aspect_ratio(cls, v):
+        if v not in ("1:1", "4:3", "3:4", "16:9", "9:16"):
+            raise ValueError('Aspect ratio must be one of 1:1, 4:3, 3:4, 16:9, 9:16')
+        return v
 
 
 class DesignResponse(BaseModel):
     id: Optional[int] = None
     description: str
     image_url: Optional[str] = None
+    image_variants: Optional[List[str]] = None  # All generated image variants
     style: str
     color_scheme: str
     compliance_report: Optional[Dict[str, Any]] = None
     rooms_designs: Optional[List[Dict[str, Any]]] = None
     visualization: Optional[Dict[str, Any]] = None  # 3D Scene Data
+    timings: Optional[Dict[str, Any]] = None  # Wall-clock timings in ms
+    semantic_match: Optional[Dict[str, Any]] = None  # Reused concept id and similarity
+    image_model: Optional[str] = None  # Image model that served the request, noting fallbacks
+    
+    @validator('image_variants', pre=True)
+    def parse_image_variants(cls, v):
+        # Stored as a JSON string on DesignConcept
+        if isinstance(v, str):
+            return json.loads(v)
+        return v
     
     class Config:
         from_attributes = True
 
 
+class DesignJobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    progress: int = 0  # 0-100
+    stage: Optional[str] = None
+    attempts: int = 0
+    result: Optional[Dict[str, Any]] = None  # DesignResponse once succeeded
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+def _save_concept(db: Session, project_id: Optional[int], concept: Dict[str, Any]) -> int:
+    """Save a generated concept and return its id"""
+    db_design = DesignConcept(
+        project_id=project_id,
+        description=concept["description"],
+        image_url=concept.get("image_url"),
+        image_variants=json.dumps(concept["image_variants"]) if concept.get("image_variants") else None,
+        style=concept.get("style"),
+        color_scheme=concept.get("color_scheme")
+    )
+    db.add(db_design)
+    db.commit()
+    db.refresh(db_design)
+    return db_design.id
+
+
+def _response_from_pipeline(result: Dict[str, Any]) -> DesignResponse:
+    return DesignResponse(
+        id=result["id"],
+        description=result["description"],
+        image_url=result.get("image_url"),
+        image_variants=result.get("image_variants"),
+        style=result.get("style"),
+        color_scheme=result.get("color_scheme"),
+        compliance_report=result.get("compliance_report"),
+        visualization=result.get("visualization"),
+        timings=result.get("timings"),
+        image_model=result.get("model_used")
+    )
+
+
+def _semantic_scope(request: DesignRequest) -> Dict[str, Any]:
+    """Request options a reused concept must share"""
+    return {
+        "model_type": "pro" if request.use_pro_for_image else "standard",
+        "variants": request.variants,
+        "aspect_ratio": request.aspect_ratio,
+    }
+
+
+async def _find_similar_concept(request: DesignRequest, db: Session) -> Optional[Tuple[DesignConcept, Dict[str, Any]]]:
+    """Stored concept of a near-identical earlier request, with the match info"""
+    if not (settings.semantic_cache_enabled and request.use_cache and request.reuse_similar):
+        return None
+    match = await semantic_cache.lookup(
+        request.client_preferences,
+        request.project_details,
+        timeout=settings.semantic_cache_lookup_timeout,
+        **_semantic_scope(request)
+    )
+    if not match:
+        return None
+    concept = db.query(DesignConcept).filter(DesignConcept.id == match["concept_id"]).first()
+    if concept is None:
+        await semantic_cache.forget([match["concept_id"]])
+        return None
+    return concept, {"concept_id": match["concept_id"], "similarity": match["similarity"]}
+
+
+def _remember_concept(request: DesignRequest, concept: Dict[str, Any]) -> None:
+    """Index a freshly generated concept for near-duplicate reuse"""
+    if settings.semantic_cache_enabled and concept.get("id") and design_service.is_reusable(concept):
+        semantic_cache.schedule_add(
+            concept["id"], request.client_preferences, request.project_details, **_semantic_scope(request)
+        )
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _build_default_visualization(style: str, color_scheme: str) -> Optional[Dict[str, Any]]:
+    """Generate the default living-room 3D scene (MVP) for a design"""
+    try:
+        # Infer dimensions from text (naive) or use default
+        dims = {"width": 5.0, "depth": 4.0, "height": 3.0}
+        
+        design_elements = {
+            "style": style,
+            "color_scheme": color_scheme
+        }
+        
+        return await visualization_service.create_3d_scene(
+            room_type="living", # Default to living room if unknown
+            dimensions=dims,
+            design_elements=design_elements
+        )
+    except Exception as e:
+        print(f"Visualization generation failed: {e}")
+        return None
+
+
 @router.post("/generate-by-presets", response_model=DesignResponse)
 async def generate_design_by_presets(
     request: PresetDesignRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    budget: float = Depends(request_deadline(settings.design_presets_deadline_seconds))
 ):
     """
     Generate design concept using presets (property type, style, rooms)
     Generates separate design for each room type
+
+    Rooms of popular preset combinations are served instantly from the
+    precomputed library (see ``services.preset_library``) unless
+    ``use_library`` is off; ``refresh_library`` queues a fresh generation of
+    those rooms for later requests.
+
+    Rooms still generating when the deadline (``X-Request-Deadline`` header)
+    passes get the fallback text and image.
     """
     if not request.rooms:
         raise HTTPException(
@@ -81,33 +232,109 @@ async def generate_design_by_presets(
             detail="At least one room is required"
         )
 
-    rooms_designs = []
-    
-    # Generate design for each room type
-    for room in request.rooms:
+    # Identical concurrent requests (double clicks, retries) share one generation
+    key = request_key("generate-by-presets", request.model_dump())
+    with deadline.deadline_scope(budget):
+        return await design_single_flight.do(key, lambda: _generate_by_presets(request, db))
+
+
+async def _generate_by_presets(
+    request: PresetDesignRequest,
+    db: Session,
+    on_room_done: Optional[Callable[[Dict[str, Any]], Any]] = None
+) -> DesignResponse:
+    """Generate and save the per-room designs for a preset request"""
+    semaphore = asyncio.Semaphore(max(1, settings.design_room_concurrency))
+
+    # Count the request per room combination and fetch precomputed rooms;
+    # free-text preferences make the design custom
+    combinations: Dict[Tuple[str, float], Dict[str, str]] = {}
+    if settings.preset_library_enabled and not request.additional_preferences.strip():
+        for room in request.rooms:
+            room_combination = combination(
+                request.property_type, request.design_style, room.type, request.budget_range, room.area
+            )
+            if room_combination:
+                combinations[(room.type, room.area)] = room_combination
+    library = await preset_library.checkout(list(combinations.values()), serve=request.use_library)
+
+    async def generate_room(room: RoomPreset) -> Dict[str, Any]:
+        """Generate design for one room, reporting failures per room"""
+        room_design = {
+            "room_type": room.type,
+            "quantity": room.quantity,
+            "area": room.area,
+        }
+        room_combination = combinations.get((room.type, room.area))
+        stored = library.get(room_combination["key"]) if room_combination else None
+        if stored:
+            room_design.update({
+                "description": stored["description"],
+                "image_url": stored["image_url"],
+                "style": stored["style"],
+                "color_scheme": stored["color_scheme"],
+                # The concept was generated for the room's area bucket, not its exact area
+                "library": {
+                    "concept_id": stored["concept_id"],
+                    "generated_at": stored["generated_at"],
+                    "area_bucket": stored["area_bucket"],
+                    "generated_area": stored["generated_area"],
+                },
+                "wait_ms": 0.0,
+                "elapsed_ms": 0.0,
+            })
+            if on_room_done is not None:
+                on_room_done(room_design)
+            return room_design
+
         # Build specific prompt for this room
-        client_preferences = f"{request.design_style} style for {room.type} in {request.property_type}"
-        if request.additional_preferences:
-            client_preferences += f". {request.additional_preferences}"
-        
-        project_details = f"{room.type} - {room.area} sqm, {request.budget_range} budget"
-        
-        # Generate design for this specific room
-        result = await design_service.generate_design_concept(
-            client_preferences,
-            project_details
+        client_preferences, project_details = build_room_prompts(
+            request.property_type, request.design_style, room.type, room.area,
+            request.budget_range, request.additional_preferences
         )
-        
+        queued_at = time.perf_counter()
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                # Generate design for this specific room
+                result = await design_service.generate_design_concept(
+                    client_preferences,
+                    project_details
+                )
+                error = None if result else "Failed to generate design concept"
+            except Exception as e:
+                print(f"Room generation failed for {room.type}: {e}")
+                result, error = None, str(e)
+            finished_at = time.perf_counter()
+
+        room_design["wait_ms"] = round((started_at - queued_at) * 1000, 1)
+        room_design["elapsed_ms"] = round((finished_at - started_at) * 1000, 1)
         if result:
-            rooms_designs.append({
-                "room_type": room.type,
-                "quantity": room.quantity,
-                "area": room.area,
+            room_design.update({
                 "description": result.get("description", ""),
                 "image_url": result.get("image_url"),
                 "style": result.get("style"),
                 "color_scheme": result.get("color_scheme")
             })
+        else:
+            room_design["error"] = error
+        if on_room_done is not None:
+            on_room_done(room_design)
+        return room_design
+
+    # Generate all rooms concurrently; gather keeps results in request order
+    total_started_at = time.perf_counter()
+    all_rooms_designs = await asyncio.gather(*(generate_room(room) for room in request.rooms))
+    total_ms = round((time.perf_counter() - total_started_at) * 1000, 1)
+
+    served_keys = [combinations[(r["room_type"], r["area"])]["key"] for r in all_rooms_designs if "library" in r]
+    if request.refresh_library and served_keys:
+        try:
+            await asyncio.to_thread(preset_library.enqueue_warmup, keys=served_keys, force=True)
+        except Exception as e:
+            print(f"Preset library refresh could not be queued: {e}")
+
+    rooms_designs = [r for r in all_rooms_designs if "error" not in r]
     
     if not rooms_designs:
         raise HTTPException(
@@ -146,13 +373,13 @@ async def generate_design_by_presets(
     db.commit()
     db.refresh(db_design)
 
-    # Generate Visualization for the first room (MVP)
+    # Generate Visualization for the first generated room (MVP)
     visualization_data = None
     try:
-        if request.rooms:
-            first_room = request.rooms[0]
+        if rooms_designs:
+            first_room = rooms_designs[0]
             # Simple assumption for dimensions based on area (square root)
-            side = first_room.area ** 0.5
+            side = first_room["area"] ** 0.5
             dims = {"width": side, "depth": side, "height": 3.0}
             
             design_elements = {
@@ -162,7 +389,7 @@ async def generate_design_by_presets(
             }
             
             visualization_data = await visualization_service.create_3d_scene(
-                room_type=first_room.type,
+                room_type=first_room["room_type"],
                 dimensions=dims,
                 design_elements=design_elements
             )
@@ -175,93 +402,360 @@ async def generate_design_by_presets(
         image_url=rooms_designs[0].get("image_url") if rooms_designs else None,
         style=request.design_style,
         color_scheme=rooms_designs[0].get("color_scheme") if rooms_designs else "",
-        rooms_designs=rooms_designs,
-        visualization=visualization_data
+        rooms_designs=all_rooms_designs,
+        visualization=visualization_data,
+        timings={
+            "total_ms": total_ms,
+            "rooms_ms": [r["elapsed_ms"] for r in all_rooms_designs],
+            "concurrency": max(1, settings.design_room_concurrency)
+        }
     )
 
 
 @router.post("/generate", response_model=DesignResponse)
 async def generate_design(
     request: DesignRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    budget: float = Depends(request_deadline(settings.design_generate_deadline_seconds))
 ):
     """
     Generate design concept using AI and save to database
-    """
-    result = await design_service.generate_design_concept(
-        request.client_preferences,
-        request.project_details,
-        model_type="pro" if request.use_pro_for_image else "standard"
-    )
     
-    if not result:
+    Runs the design stage graph: compliance and visualization run
+    concurrently with text and image generation. Every AI call gets only the
+    time left before the deadline (``X-Request-Deadline`` header); once it
+    passes, the remaining stages return their fallback output.
+    """
+    attribute_usage(project_id=request.project_id)
+    started_at = time.perf_counter()
+    similar = await _find_similar_concept(request, db)
+    if similar:
+        return await _reuse_concept(request, db, *similar, started_at=started_at)
+
+    def persist_concept(concept: Dict[str, Any]) -> int:
+        return _save_concept(db, request.project_id, concept)
+
+    # Identical concurrent requests share one pipeline run and one saved concept
+    key = request_key("generate", request.model_dump())
+    try:
+        with deadline.deadline_scope(budget):
+            result = await design_single_flight.do(key, lambda: design_service.run_design_pipeline(
+                request.client_preferences,
+                request.project_details,
+                model_type="pro" if request.use_pro_for_image else "standard",
+                use_cache=request.use_cache,
+                check_compliance=request.check_compliance,
+                persist=persist_concept,
+                variants=request.variants,
+                aspect_ratio=request.aspect_ratio
+            ))
+    except Exception as e:
+        print(f"Error generating design concept: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate design concept"
         )
-    
-    # Save to database
-    db_design = DesignConcept(
-        project_id=request.project_id,
-        description=result["description"],
-        image_url=result.get("image_url"),
-        style=result.get("style"),
-        color_scheme=result.get("color_scheme")
-    )
-    db.add(db_design)
-    db.commit()
-    db.refresh(db_design)
-    
-    compliance_result = None
+
+    _remember_concept(request, result)
+    return _response_from_pipeline(result)
+
+
+async def _reuse_concept(
+    request: DesignRequest,
+    db: Session,
+    concept: DesignConcept,
+    match: Dict[str, Any],
+    started_at: float
+) -> DesignResponse:
+    """Answer a request with the stored concept of a near-identical one"""
+    if request.project_id is not None and concept.project_id != request.project_id:
+        # The project gets its own copy so it shows up under /project/{id}
+        concept_id = _save_concept(db, request.project_id, {
+            "description": concept.description,
+            "image_url": concept.image_url,
+            "image_variants": json.loads(concept.image_variants) if concept.image_variants else None,
+            "style": concept.style,
+            "color_scheme": concept.color_scheme,
+        })
+        concept = db.query(DesignConcept).filter(DesignConcept.id == concept_id).first()
+
+    compliance_report = None
     if request.check_compliance:
-        try:
-            compliance_result = compliance_service.check_design_compliance({
+        compliance_report = await compliance_service.check({
+            "project_details": request.project_details,
+            "client_preferences": request.client_preferences
+        })
+    visualization = await _build_default_visualization(concept.style, concept.color_scheme)
+
+    response = DesignResponse.model_validate(concept)
+    response.compliance_report = compliance_report
+    response.visualization = visualization
+    response.semantic_match = match
+    response.timings = {"total_ms": round((time.perf_counter() - started_at) * 1000, 1)}
+    return response
+
+
+@router.post("/generate/stream")
+async def generate_design_stream(
+    request: DesignRequest,
+    budget: float = Depends(request_deadline(settings.design_generate_deadline_seconds))
+):
+    """
+    Generate design concept and stream it as server-sent events
+
+    Events, in order of arrival:
+    - ``start``: sent immediately
+    - ``draft``: the stored concept of a near-identical earlier request, if
+      any, with its similarity; generation continues regardless
+    - ``delta``: text chunks of the design description
+    - ``image``, ``compliance``, ``visualization``: as each one lands
+    - ``done``: the saved concept (``id`` and final fields)
+    - ``error``: if the pipeline fails
+
+    Past the deadline (``X-Request-Deadline`` header) the text stream stops
+    and the remaining events carry fallback values.
+    """
+    model_type = "pro" if request.use_pro_for_image else "standard"
+    attribute_usage(project_id=request.project_id)
+
+    async def event_stream():
+        with deadline.deadline_scope(budget):
+            async for event in _design_events():
+                yield event
+
+    async def _design_events():
+        yield _sse_event("start", {"model_type": model_type})
+
+        # Compliance and visualization only depend on the request, start them now
+        tasks: Dict[asyncio.Task, str] = {}
+        if request.check_compliance:
+            tasks[asyncio.create_task(compliance_service.check({
                 "project_details": request.project_details,
                 "client_preferences": request.client_preferences
+            }))] = "compliance"
+        tasks[asyncio.create_task(_build_default_visualization(
+            design_service.default_style, design_service.default_color_scheme
+        ))] = "visualization"
+
+        try:
+            db = SessionLocal()
+            try:
+                similar = await _find_similar_concept(request, db)
+                if similar:
+                    concept, match = similar
+                    yield _sse_event("draft", {
+                        **DesignResponse.model_validate(concept).model_dump(include={
+                            "id", "description", "image_url", "image_variants", "style", "color_scheme"
+                        }),
+                        "semantic_match": match
+                    })
+            except Exception as e:
+                print(f"Semantic cache draft failed: {e}")
+            finally:
+                db.close()
+
+            chunks = []
+            async for delta in design_service.stream_description(
+                request.client_preferences,
+                request.project_details,
+                use_cache=request.use_cache
+            ):
+                chunks.append(delta)
+                yield _sse_event("delta", {"content": delta})
+            description = "".join(chunks)
+
+            tasks[asyncio.create_task(design_service.generate_images_for_description(
+                description, model_type=model_type, use_cache=request.use_cache,
+                variants=request.variants, aspect_ratio=request.aspect_ratio
+            ))] = "image"
+
+            results: Dict[str, Any] = {}
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Deadline passed: the steps still running get their fallback value
+                    for task in pending:
+                        task.cancel()
+                    done, pending = (await asyncio.wait(pending))[0], set()
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        value = None if task.cancelled() else task.result()
+                    except Exception as e:
+                        print(f"Error in streamed {name} step: {e}")
+                        value = None
+                    if name == "image":
+                        image_urls, model_used = value if value else ([], "Standard AI")
+                        value = {
+                            "image_url": image_urls[0] if image_urls else None,
+                            "image_variants": image_urls,
+                            "model_used": model_used
+                        }
+                    results[name] = value
+                    yield _sse_event(name, value)
+
+            # Save to database
+            db = SessionLocal()
+            try:
+                concept_id = _save_concept(db, request.project_id, {
+                    "description": description,
+                    "image_url": results["image"]["image_url"],
+                    "image_variants": results["image"]["image_variants"],
+                    "style": design_service.default_style,
+                    "color_scheme": design_service.default_color_scheme
+                })
+            finally:
+                db.close()
+            _remember_concept(request, {
+                "id": concept_id,
+                "description": description,
+                "image_url": results["image"]["image_url"]
+            })
+
+            yield _sse_event("done", {
+                "id": concept_id,
+                "image_url": results["image"]["image_url"],
+                "image_variants": results["image"]["image_variants"],
+                "style": design_service.default_style,
+                "color_scheme": design_service.default_color_scheme
             })
         except Exception as e:
-            print(f"Error checking compliance: {e}")
+            print(f"Error streaming design concept: {e}")
+            yield _sse_event("error", {"detail": "Failed to generate design concept"})
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
-    # Generate Visualization (MVP)
-    visualization_data = None
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _run_generate_job(payload: Dict[str, Any], report_progress: Callable) -> Dict[str, Any]:
+    """Job handler: run the design stage graph, reporting progress per stage"""
+    request = DesignRequest(**payload)
+    finished_stages: List[str] = []
+
+    def on_stage_done(name: str, timing: Dict[str, Any]) -> None:
+        finished_stages.append(name)
+        report_progress(len(finished_stages) * 100 // 5, name)
+
+    db = SessionLocal()
     try:
-        # Infer dimensions from text (naive) or use default
-        dims = {"width": 5.0, "depth": 4.0, "height": 3.0}
-        
-        design_elements = {
-            "style": result.get("style", "Modern"),
-            "color_scheme": result.get("color_scheme", "Neutral")
-        }
-        
-        visualization_data = await visualization_service.create_3d_scene(
-            room_type="living", # Default to living room if unknown
-            dimensions=dims,
-            design_elements=design_elements
+        result = await design_service.run_design_pipeline(
+            request.client_preferences,
+            request.project_details,
+            model_type="pro" if request.use_pro_for_image else "standard",
+            use_cache=request.use_cache,
+            check_compliance=request.check_compliance,
+            persist=lambda concept: _save_concept(db, request.project_id, concept),
+            variants=request.variants,
+            aspect_ratio=request.aspect_ratio,
+            on_stage_done=on_stage_done
         )
-    except Exception as e:
-        print(f"Visualization generation failed: {e}")
+    finally:
+        db.close()
+    _remember_concept(request, result)
+    return _response_from_pipeline(result).model_dump()
 
-    return DesignResponse(
-        id=db_design.id,
-        description=db_design.description,
-        image_url=db_design.image_url,
-        style=db_design.style,
-        color_scheme=db_design.color_scheme,
-        compliance_report=compliance_result,
-        visualization=visualization_data
-    )
+
+async def _run_presets_job(payload: Dict[str, Any], report_progress: Callable) -> Dict[str, Any]:
+    """Job handler: generate preset rooms, reporting progress per room"""
+    request = PresetDesignRequest(**payload)
+    finished_rooms: List[str] = []
+
+    def on_room_done(room_design: Dict[str, Any]) -> None:
+        finished_rooms.append(room_design["room_type"])
+        # Leave headroom for saving the concept and building the 3D scene
+        report_progress(len(finished_rooms) * 90 // len(request.rooms), f"room:{room_design['room_type']}")
+
+    db = SessionLocal()
+    try:
+        response = await _generate_by_presets(request, db, on_room_done=on_room_done)
+    finally:
+        db.close()
+    return response.model_dump()
+
+
+design_job_queue.register("generate", _run_generate_job)
+design_job_queue.register("generate-by-presets", _run_presets_job)
+design_job_queue.register(WARMUP_JOB, preset_library.run_warmup)
+
+
+@router.post("/jobs", response_model=DesignJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_design_job(request: DesignRequest):
+    """
+    Queue a design generation and return immediately
+
+    Poll ``GET /jobs/{id}`` for status, progress and the result.
+    """
+    job = await asyncio.to_thread(design_job_queue.enqueue, "generate", request.model_dump())
+    return job_to_dict(job)
+
+
+@router.post("/jobs/by-presets", response_model=DesignJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_preset_design_job(request: PresetDesignRequest):
+    """Queue a preset-based design generation and return immediately"""
+    if not request.rooms:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one room is required"
+        )
+    job = await asyncio.to_thread(design_job_queue.enqueue, "generate-by-presets", request.model_dump())
+    return job_to_dict(job)
+
+
+@router.post("/library/warmup", response_model=DesignJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def warm_up_preset_library(limit: Optional[int] = None, force: bool = False):
+    """
+    Queue a warm-up of the preset design library now instead of at the
+    scheduled off-peak hour
+
+    Generates the ``limit`` most-requested combinations that have no stored
+    concept or a stale one (all of them with ``force``).
+    """
+    job = await asyncio.to_thread(preset_library.enqueue_warmup, limit=limit, force=force)
+    return job_to_dict(job)
+
+
+@router.get("/library")
+async def get_preset_library(limit: int = 20):
+    """Most-requested preset room combinations and their precomputed concepts"""
+    return await asyncio.to_thread(preset_library.top_sync, limit)
+
+
+@router.get("/jobs/{job_id}", response_model=DesignJobResponse)
+async def get_design_job(job_id: int):
+    """Get status, progress and (once finished) the result of a design job"""
+    job = await asyncio.to_thread(design_job_queue.get, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Design job not found"
+        )
+    return job
 
 
 @router.post("/validate-compliance")
-async def validate_compliance(request: DesignRequest):
+async def validate_compliance(
+    request: DesignRequest,
+    budget: float = Depends(request_deadline(settings.compliance_deadline_seconds))
+):
     """
     Check design request against Dubai building codes without generating full design
     """
     try:
-        compliance_result = compliance_service.check_design_compliance({
-            "project_details": request.project_details,
-            "client_preferences": request.client_preferences
-        })
+        with deadline.deadline_scope(budget):
+            compliance_result = await compliance_service.check({
+                "project_details": request.project_details,
+                "client_preferences": request.client_preferences
+            })
         return compliance_result
     except Exception as e:
         raise HTTPException(
@@ -2,16 +2,21 @@
 API routes for cost estimation
 """
 
+import asyncio
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
-from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field, validator
 
-from database.connection import get_db
-from database.models import Project, Estimation, DesignConcept
+from database.connection import get_db, SessionLocal
+from database.models import Project, Estimation, DesignConcept, EstimationAudit
 from services.estimation_service import estimation_service
+from ai_modules.usage_log import usage_context
+from config.settings import settings
 
 router = APIRouter()
 
@@ -44,6 +49,20 @@ class QuickEstimationRequest(BaseModel):
     budget_range: str = Field(None, description="Budget range")
 
 
+class BatchAuditRequest(BaseModel):
+    project_ids: Optional[List[int]] = Field(None, description="Projects to audit (default: all matching the filters)")
+    status: Optional[str] = Field(None, description="Only projects with this status, e.g. in_progress")
+    property_type: Optional[str] = Field(None, description="Only projects of this property type")
+    client_id: Optional[int] = Field(None, description="Only projects of this client")
+    force: bool = Field(False, description="Run fresh audits instead of serving stored ones")
+
+    @validator('project_ids')
+    def validate_project_ids(cls, v):
+        if v is not None and len(v) > settings.estimation_audit_batch_max_projects:
+            raise ValueError(f'At most {settings.estimation_audit_batch_max_projects} projects per batch')
+        return list(dict.fromkeys(v)) if v is not None else v
+
+
 @router.post("/calculate/{project_id}")
 async def calculate_estimation(
     project_id: int,
@@ -74,6 +93,9 @@ async def calculate_estimation(
     ).first()
     
     if existing_estimation:
+        # Stored AI audits were made against the old figures
+        db.query(EstimationAudit).filter(EstimationAudit.project_id == project_id).delete()
+
         # Update existing
         for key, value in calculation.items():
             if hasattr(existing_estimation, key) and key != "project_id":
@@ -219,13 +241,169 @@ async def quick_calculate_estimation(request: QuickEstimationRequest):
         **calculation
     }
 
+def _audit_inputs(estimation: Estimation) -> Dict[str, Any]:
+    """Estimation figures the AI audit is based on"""
+    return {
+        "total_cost": estimation.total_cost,
+        "materials_cost": estimation.materials_cost,
+        "labor_cost": estimation.labor_cost,
+        "furniture_cost": estimation.furniture_cost or 0,
+        "tier": "standard" # simplistic, could be stored
+    }
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def _run_audit(
+    db: Session,
+    project: Project,
+    estimation: Estimation,
+    stored: Optional[EstimationAudit],
+    force: bool = False
+) -> Dict[str, Any]:
+    """
+    Audit an estimation, serving the ``stored`` audit of the project while the
+    project fields and totals it was made from are unchanged (unless ``force``)
+    """
+    estimation_dict = _audit_inputs(estimation)
+    fingerprint = estimation_service.audit_fingerprint(project, estimation_dict)
+
+    if stored and not force and stored.fingerprint == fingerprint:
+        audited_at = _as_utc(stored.created_at) if stored.created_at else None
+        max_age = timedelta(hours=settings.estimation_audit_ttl_hours)
+        if audited_at and datetime.now(timezone.utc) - audited_at < max_age:
+            return {**json.loads(stored.result), "cached": True, "audited_at": audited_at.isoformat()}
+
+    audit_result = await estimation_service.audit_estimation(project, estimation_dict)
+    audited_at = datetime.now(timezone.utc)
+
+    # Fallback audits (AI unreachable) are not stored, so the next call retries
+    if estimation_service.is_reusable_audit(audit_result):
+        fields = {
+            "estimation_id": estimation.id,
+            "fingerprint": fingerprint,
+            "result": json.dumps(audit_result),
+            "created_at": audited_at,
+        }
+        if stored is None:
+            db.add(EstimationAudit(project_id=project.id, **fields))
+        else:
+            for name, value in fields.items():
+                setattr(stored, name, value)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent audit of the same project stored its result first
+            db.rollback()
+
+    return {**audit_result, "cached": False, "audited_at": audited_at.isoformat()}
+
+
+# Declared before /audit/{project_id}, which would otherwise match "batch"
+@router.post("/audit/batch")
+async def audit_estimations_batch(request: BatchAuditRequest):
+    """
+    Audit the estimations of many projects at once (e.g. the whole active
+    portfolio)
+
+    Projects, estimations and stored audits are loaded in one query; audits
+    run concurrently (``estimation_audit_batch_concurrency`` at a time) and
+    stream back as NDJSON lines in completion order:
+
+    - ``{"project_id", "title", "status": "ok", "audit": {...}}``
+    - ``{"project_id", "status": "error", "error": "..."}`` for projects that
+      do not exist or have no estimation yet
+    - a final ``{"summary": {...}}`` line with counts and portfolio totals
+    """
+    async def ndjson_stream():
+        # Storing an audit commits; keep the loaded rows instead of reloading them per project
+        db = SessionLocal(expire_on_commit=False)
+        tasks: List[asyncio.Task] = []
+        try:
+            query = db.query(Project, Estimation, EstimationAudit).outerjoin(
+                Estimation, Estimation.project_id == Project.id
+            ).outerjoin(
+                EstimationAudit, EstimationAudit.project_id == Project.id
+            )
+            if request.project_ids is not None:
+                query = query.filter(Project.id.in_(request.project_ids))
+            if request.status:
+                query = query.filter(Project.status == request.status)
+            if request.property_type:
+                query = query.filter(Project.property_type == request.property_type)
+            if request.client_id:
+                query = query.filter(Project.client_id == request.client_id)
+            rows = query.order_by(Project.id).limit(settings.estimation_audit_batch_max_projects).all()
+
+            summary = {"projects": 0, "audited": 0, "cached": 0, "errors": 0,
+                       "original_total": 0.0, "adjusted_total": 0.0}
+            found = {project.id for project, _, _ in rows}
+            for project_id in request.project_ids or []:
+                if project_id not in found:
+                    summary["errors"] += 1
+                    yield json.dumps({"project_id": project_id, "status": "error", "error": "Project not found"}) + "\n"
+
+            semaphore = asyncio.Semaphore(max(1, settings.estimation_audit_batch_concurrency))
+
+            async def audit_one(project: Project, estimation: Estimation, stored: Optional[EstimationAudit]):
+                async with semaphore:
+                    # Attribute the AI calls to each project (the route has no project in its path)
+                    with usage_context(project_id=project.id):
+                        try:
+                            return project, await _run_audit(db, project, estimation, stored, force=request.force), None
+                        except Exception as e:
+                            return project, None, e
+
+            for project, estimation, stored in rows:
+                summary["projects"] += 1
+                if estimation is None:
+                    summary["errors"] += 1
+                    yield json.dumps({"project_id": project.id, "title": project.title, "status": "error",
+                                      "error": "No estimation found. Calculate it first."}) + "\n"
+                    continue
+                tasks.append(asyncio.create_task(audit_one(project, estimation, stored)))
+
+            for next_done in asyncio.as_completed(tasks):
+                project, audit, error = await next_done
+                if error is not None:
+                    summary["errors"] += 1
+                    yield json.dumps({"project_id": project.id, "title": project.title, "status": "error",
+                                      "error": str(error) or error.__class__.__name__}) + "\n"
+                    continue
+                summary["audited"] += 1
+                summary["cached"] += 1 if audit.get("cached") else 0
+                summary["original_total"] += audit.get("original_total") or 0
+                summary["adjusted_total"] += audit.get("adjusted_total") or 0
+                yield json.dumps({"project_id": project.id, "title": project.title, "status": "ok",
+                                  "audit": audit}, default=str) + "\n"
+
+            summary["original_total"] = round(summary["original_total"], 2)
+            summary["adjusted_total"] = round(summary["adjusted_total"], 2)
+            yield json.dumps({"summary": summary}) + "\n"
+        finally:
+            # Client disconnected mid-stream: stop the remaining audits
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            db.close()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
 @router.post("/audit/{project_id}")
 async def audit_estimation(
     project_id: int,
+    force: bool = False,
     db: Session = Depends(get_db)
 ):
     """
     Perform an AI Audit on the existing estimation for a project
+
+    The audit is stored and served again (``cached: true``) until the project
+    or its estimation changes; ``force=true`` runs a fresh audit.
     """
     # Get project
     project = db.query(Project).filter(Project.id == project_id).first()
@@ -237,16 +415,5 @@ async def audit_estimation(
     if not estimation:
         raise HTTPException(status_code=404, detail="No estimation found. Calculate it first.")
 
-    # Prepare data for service
-    estimation_dict = {
-        "total_cost": estimation.total_cost,
-        "materials_cost": estimation.materials_cost,
-        "labor_cost": estimation.labor_cost,
-        "furniture_cost": estimation.furniture_cost or 0,
-        "tier": "standard" # simplistic, could be stored
-    }
-
-    # Call service
-    audit_result = await estimation_service.audit_estimation(project, estimation_dict)
-    
-    return audit_result
+    stored = db.query(EstimationAudit).filter(EstimationAudit.project_id == project_id).first()
+    return await _run_audit(db, project, estimation, stored, force=force)
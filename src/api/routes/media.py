@@ -0,0 +1,139 @@
+"""
+API routes for serving stored media (generated renders)
+"""
+
+import asyncio
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, Response
+
+from ai_modules.blob_store import blob_store, sniff_content_type
+from ai_modules.image_derivatives import derivative_generator, FORMATS
+
+router = APIRouter()
+
+# Blob keys are content hashes, so a URL never changes content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header into inclusive (start, end)
+
+    Returns None for unsupported or multi-range headers (served as 200).
+    Raises ValueError for unsatisfiable ranges.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def _read_slice(path: Path, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+async def _serve_file(request: Request, path: Path, etag: str, media_type: Optional[str] = None) -> Response:
+    """Serve an immutable file with ETag revalidation and byte-range support"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = path.stat().st_size
+    if media_type is None:
+        media_type = sniff_content_type(await asyncio.to_thread(_read_slice, path, 0, 16))
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+            if request.method == "HEAD":
+                return Response(status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers, media_type=media_type)
+            content = await asyncio.to_thread(_read_slice, path, start, length)
+            return Response(
+                content=content,
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                headers=headers,
+                media_type=media_type
+            )
+
+    if request.method == "HEAD":
+        return Response(headers={**headers, "Content-Length": str(size)}, media_type=media_type)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.api_route("/{digest}", methods=["GET", "HEAD"])
+async def get_media(
+    digest: str,
+    request: Request,
+    size: Optional[int] = Query(None, description="Derivative width in px (see media_derivative_widths)"),
+    format: str = Query("webp", description="Derivative format: webp or jpeg")
+):
+    """
+    Serve a stored image by its content hash
+
+    Without ``size`` the original render is returned; with ``size`` a resized
+    WebP/JPEG derivative (rendered on first request if missing). Supports
+    conditional requests (ETag / If-None-Match) and single byte ranges
+    (206 Partial Content).
+    """
+    path = blob_store.path_for(digest)
+    if path is None or not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+
+    if size is None:
+        return await _serve_file(request, path, f'"{digest}"')
+
+    if not derivative_generator.is_supported(size, format):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported size or format. Sizes: {derivative_generator.widths}, formats: {list(FORMATS)}"
+        )
+    try:
+        derivative = await derivative_generator.ensure(path, digest, size, format)
+    except Exception as e:
+        print(f"Derivative generation failed for {digest}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate image derivative"
+        )
+    return await _serve_file(request, derivative, f'"{digest}-{size}.{format}"', FORMATS[format][1])
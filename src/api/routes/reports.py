@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import Response
 from sqlalchemy.orm import Session
@@ -31,7 +33,10 @@ async def generate_project_master_report(
     ).first()
 
     try:
-        pdf_bytes = report_service.generate_master_report(project, design, estimation)
+        # Preview rendering runs in the derivative process pool and the PDF
+        # build in a thread, keeping both off the event loop
+        preview = await report_service.preview_path(design.image_url) if design else None
+        pdf_bytes = await asyncio.to_thread(report_service.generate_master_report, project, design, estimation, preview)
         
         filename = f"MasterReport_{project.title.replace(' ', '_')}.pdf"
         
@@ -2,7 +2,8 @@
 API routes for statistics and analytics
 """
 
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
@@ -78,3 +79,134 @@ async def get_recent_designs(limit: int = 5, db: Session = Depends(get_db)):
     designs = db.query(DesignConcept).order_by(DesignConcept.created_at.desc()).limit(limit).all()
     return designs
 
+
+@router.get("/http-pool")
+async def get_http_pool_stats():
+    """Get ProxyAPI connection pool statistics"""
+    from ai_modules.proxyapi_client import proxy_api_client
+
+    return proxy_api_client.get_pool_stats()
+
+
+@router.get("/ai-cache")
+async def get_ai_cache_stats():
+    """Get AI response cache hit/miss statistics"""
+    from ai_modules.response_cache import response_cache
+
+    return response_cache.get_stats()
+
+
+@router.get("/pipeline")
+async def get_pipeline_stats():
+    """Get per-stage timings of the AI pipelines"""
+    from services.pipeline import pipeline_metrics
+
+    return pipeline_metrics.get_stats()
+
+
+@router.get("/executors")
+async def get_executor_stats():
+    """Get size, queue depth and latency of the blocking-work thread pools"""
+    from ai_modules.executors import get_executor_stats
+
+    return get_executor_stats()
+
+
+@router.get("/providers")
+async def get_provider_stats():
+    """Get rate-limit, retry and circuit-breaker state of the AI providers"""
+    from ai_modules.resilience import get_provider_stats
+
+    return get_provider_stats()
+
+
+@router.get("/single-flight")
+async def get_single_flight_stats():
+    """Get coalescing statistics for identical in-flight design requests"""
+    from services.single_flight import design_single_flight
+
+    return design_single_flight.get_stats()
+
+
+@router.get("/design-jobs")
+async def get_design_job_stats():
+    """Get background design job queue counters and jobs per status"""
+    from services.job_queue import design_job_queue
+
+    return await asyncio.to_thread(design_job_queue.get_stats)
+
+
+@router.get("/media")
+async def get_media_stats():
+    """Get blob store write, deduplication and download counters"""
+    from ai_modules.blob_store import blob_store
+
+    return blob_store.get_stats()
+
+
+@router.get("/media/derivatives")
+async def get_media_derivative_stats():
+    """Get thumbnail/derivative generation counters"""
+    from ai_modules.image_derivatives import derivative_generator
+
+    return derivative_generator.get_stats()
+
+
+@router.get("/prompt-compactor")
+async def get_prompt_compactor_stats():
+    """Get image-prompt compaction cache and compression statistics"""
+    from ai_modules.prompt_compactor import prompt_compactor
+
+    return prompt_compactor.get_stats()
+
+
+@router.get("/models")
+async def get_model_router_stats():
+    """Get rolling latency percentiles, error rates and wins per provider:model route"""
+    from ai_modules.model_router import model_router
+
+    return model_router.get_stats()
+
+
+@router.get("/semantic-cache")
+async def get_semantic_cache_stats():
+    """Get near-duplicate design cache size, hit rate and similarity threshold"""
+    from ai_modules.semantic_cache import semantic_cache
+
+    return semantic_cache.get_stats()
+
+
+@router.get("/preset-library")
+async def get_preset_library_stats():
+    """Get preset design library size, rooms served from it and warm-up counters"""
+    from services.preset_library import preset_library
+
+    return await asyncio.to_thread(preset_library.get_stats)
+
+
+@router.get("/compliance")
+async def get_compliance_stats():
+    """Get regulations RAG engine readiness, load time and warm-up waits"""
+    from services.compliance_service import compliance_service
+
+    return compliance_service.get_stats()
+
+
+@router.get("/ai-usage")
+async def get_ai_usage_stats(group_by: str = "endpoint", days: float = 7.0, limit: int = 100):
+    """
+    Get AI calls, tokens, estimated cost and latency per endpoint, user,
+    project, day, model, provider or outcome, most expensive first
+    """
+    from ai_modules.usage_log import usage_log, GROUP_BY_COLUMNS
+
+    if group_by not in GROUP_BY_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUP_BY_COLUMNS)}")
+    # Include calls still waiting in the write buffer
+    await usage_log.flush()
+    return {
+        "group_by": group_by,
+        "days": days,
+        "rows": await asyncio.to_thread(usage_log.aggregate_sync, group_by, days, limit),
+        "log": usage_log.get_stats(),
+    }
@@ -3,7 +3,7 @@ Configuration settings for Dubai Cons AI Suite MVP
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 
 # Get the project root directory
@@ -18,17 +18,124 @@ class Settings(BaseSettings):
     proxyapi_key: str
     proxyapi_base_url: str = "https://api.proxyapi.ru"
     
+    # ProxyAPI HTTP connection pool (one shared client per worker)
+    proxyapi_max_connections: int = 20
+    proxyapi_max_keepalive_connections: int = 10
+    proxyapi_keepalive_expiry: float = 30.0
+    proxyapi_http2: bool = True
+    proxyapi_connect_timeout: float = 5.0
+    proxyapi_read_timeout: float = 60.0
+    proxyapi_write_timeout: float = 10.0
+    proxyapi_pool_timeout: float = 10.0
+    proxyapi_rate_limit_per_second: float = 5.0
+    proxyapi_rate_limit_burst: float = 10.0
+    
     # OpenAI via ProxyAPI
     openai_base_url: str = "https://api.proxyapi.ru/openai/v1"
     openai_api_key: str
     
+    # Design generation
+    design_room_concurrency: int = 3  # Rooms generated in parallel by generate-by-presets
+    design_job_workers: int = 2  # Background design job workers per app process (0 disables)
+    design_job_poll_seconds: float = 2.0  # How often idle workers check the jobs table
+    design_job_lease_seconds: float = 600.0  # Running jobs whose lease expired are picked up again
+    design_job_max_attempts: int = 2  # Attempts before a job is marked failed
+    design_job_progress_interval_seconds: float = 1.0  # Minimum time between progress writes of a job
+    
+    # AI estimation audits are stored and reused while the project and totals are unchanged
+    estimation_audit_ttl_hours: float = 30 * 24  # Same validity as an estimation; older audits are redone
+    estimation_audit_batch_concurrency: int = 4  # Audits running at once in POST /estimation/audit/batch
+    estimation_audit_batch_max_projects: int = 500
+    
+    # Preset design library: concepts precomputed for the most-requested preset rooms
+    preset_library_enabled: bool = True
+    preset_library_warmup_size: int = 20  # Combinations generated per warm-up run
+    preset_library_min_requests: int = 3  # Requests before a combination is worth precomputing
+    preset_library_max_age_hours: float = 7 * 24  # Older concepts are regenerated by the next warm-up
+    preset_library_warmup_hour: Optional[int] = 23  # UTC hour of the daily warm-up (03:00 in Dubai); None disables
+    
+    # Regulations RAG index, persisted per hash of the documents and model
+    rag_index_dir: Optional[str] = None  # defaults to <project>/storage/rag_index
+    rag_embedding_model: str = "all-MiniLM-L6-v2"
+    rag_warmup_on_startup: bool = False  # Build the engine in a background thread when the app starts
+    rag_ready_timeout_seconds: float = 5.0  # Compliance checks wait this long for a warm-up in progress
+    rag_query_cache_size: int = 1024  # Query embeddings kept in the LRU cache (0 disables)
+    rag_result_cache_size: int = 256  # Top-k results kept in the LRU cache (0 disables)
+    compliance_executor_workers: int = 2
+    compliance_executor_max_queue: int = 32
+    compliance_check_timeout_seconds: float = 20.0
+    
+    # Semantic cache: reuse the concept of a near-identical earlier request
+    semantic_cache_enabled: bool = True
+    semantic_cache_dir: Optional[str] = None  # defaults to <project>/storage/semantic_cache
+    semantic_cache_model: str = "all-MiniLM-L6-v2"  # Same model as the RAG engine
+    semantic_cache_threshold: float = 0.92  # Minimum cosine similarity for a hit
+    semantic_cache_lookup_timeout: float = 2.0  # Lookups slower than this (e.g. model loading) miss
+    semantic_cache_flush_seconds: float = 30.0  # New entries are written to disk in batches this often
+    
+    # Request deadlines: clients may send X-Request-Deadline (seconds, "1m30s"
+    # or an HTTP date); otherwise the endpoint default applies
+    request_deadline_max_seconds: float = 600.0
+    design_generate_deadline_seconds: float = 120.0
+    design_presets_deadline_seconds: float = 240.0
+    compliance_deadline_seconds: float = 30.0
+    
     # Gemini Configuration
     google_api_key: Optional[str] = None
+    gemini_base_url: Optional[str] = None  # Override the Gemini API endpoint (e.g. scripts/fake_ai_provider.py)
+    gemini_use_async_sdk: bool = True  # Use client.aio; otherwise run the sync SDK in a thread pool
+    gemini_executor_workers: int = 4
+    gemini_executor_max_queue: int = 32
+    gemini_rate_limit_per_second: float = 2.0
+    gemini_rate_limit_burst: float = 5.0
+    
+    # AI provider resilience (retries with jittered backoff, circuit breaker)
+    ai_retry_max_attempts: int = 3
+    ai_retry_base_delay: float = 1.0
+    ai_retry_max_delay: float = 20.0
+    ai_breaker_failure_threshold: int = 5
+    ai_breaker_recovery_seconds: float = 30.0
+    
+    # Model routing (rolling latency/error stats per provider:model)
+    ai_router_enabled: bool = True
+    ai_router_window: int = 100  # Samples kept per route
+    ai_router_min_samples: int = 5  # Samples before latency ranking and hedging kick in
+    ai_router_max_error_rate: float = 0.5  # Routes above this are tried last
+    ai_router_hedging: bool = False  # Start the runner-up when the primary passes its p95
+    ai_router_hedge_min_delay: float = 2.0
+    
+    # AI usage accounting (one ai_calls row per provider call, written in batches)
+    ai_usage_enabled: bool = True
+    ai_usage_flush_seconds: float = 5.0
+    ai_usage_flush_size: int = 200  # Buffered records that trigger an early flush
+    ai_usage_max_buffer: int = 10000  # Oldest records are dropped beyond this while the database is down
+    ai_usage_record_cache_hits: bool = True  # Record response-cache hits (cost 0) to see the calls they saved
+    ai_usage_prices: Dict[str, Dict[str, float]] = {}  # Per-model overrides, e.g. {"gpt-4": {"input": 30, "output": 60}} (USD per 1M tokens) or {"dall-e-3": {"image": 0.04}}
     
     # Database
     database_url: str
     redis_url: str = "redis://localhost:6379/0"
     
+    # AI response cache (in-process LRU in front of a disk or Redis tier)
+    ai_cache_enabled: bool = True
+    ai_cache_backend: str = "disk"  # memory, disk or redis
+    ai_cache_memory_entries: int = 256
+    ai_cache_dir: Optional[str] = None  # defaults to <project>/storage/ai_cache
+    ai_cache_disk_max_mb: int = 256
+    ai_cache_text_ttl_seconds: int = 7 * 24 * 3600
+    ai_cache_image_ttl_seconds: int = 50 * 60  # DALL-E URLs expire after ~1 hour
+    
+    # Generated media (content-addressed blob store served at media_url_prefix)
+    media_dir: Optional[str] = None  # defaults to <project>/storage/media
+    media_url_prefix: str = "/api/v1/media"
+    media_localize_remote_images: bool = True  # Download provider URLs (they expire) into the store
+    media_download_timeout: float = 30.0
+    media_max_download_mb: int = 20
+    media_derivative_widths: List[int] = [256, 512, 768]  # Widths selectable with ?size=
+    media_derivative_quality: int = 80
+    media_derivative_workers: int = 2  # Processes resizing images
+    media_eager_derivatives: bool = True  # Render derivatives in the background when a blob is stored
+    
     # JWT Settings
     secret_key: str
     algorithm: str = "HS256"
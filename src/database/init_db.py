@@ -3,7 +3,7 @@ Initialize database schema
 """
 
 from database.connection import engine, Base
-from database.models import User, Client, Project, DesignConcept, Material, Estimation
+from database.models import User, Client, Project, DesignConcept, DesignJob, Material, Estimation
 
 def init_db():
     """Create all database tables"""
@@ -89,6 +89,7 @@ class DesignConcept(Base):
     
     # Visualization
     image_url = Column(String)  # URL to generated image
+    image_variants = Column(Text, nullable=True)  # JSON list of all generated image URLs
     render_url = Column(String)  # URL to 3D render
     
     # Metadata
@@ -98,6 +99,83 @@ class DesignConcept(Base):
     project = relationship("Project", back_populates="design_concepts")
 
 
+class DesignJob(Base):
+    """Background design generation job (persisted work queue)"""
+    __tablename__ = "design_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # generate, generate-by-presets
+    status = Column(String, default="queued", nullable=False, index=True)  # queued, running, succeeded, failed
+    progress = Column(Integer, default=0)  # 0-100
+    stage = Column(String, nullable=True)  # Last completed stage
+    
+    # Payload and outcome
+    payload = Column(Text, nullable=False)  # JSON string of the request
+    result = Column(Text, nullable=True)  # JSON string of the design response
+    error = Column(Text, nullable=True)
+    
+    # Worker bookkeeping
+    attempts = Column(Integer, default=0)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class AICall(Base):
+    """One AI provider call: model, tokens, estimated cost, latency and outcome"""
+    __tablename__ = "ai_calls"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    # What was called
+    provider = Column(String, nullable=False)  # proxyapi, gemini
+    model = Column(String, nullable=False)
+    operation = Column(String, nullable=False)  # chat, chat_stream, image, text
+
+    # Who caused it (no foreign keys: rows are written in bulk and kept after deletions)
+    endpoint = Column(String, nullable=True)  # "POST /api/v1/design/generate" or "job:<kind>"
+    user_id = Column(Integer, nullable=True)
+    project_id = Column(Integer, nullable=True)
+
+    # Usage and outcome
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    images = Column(Integer, default=0)
+    estimated_tokens = Column(Boolean, default=False)  # Provider reported no usage; counted from text
+    cost_usd = Column(Float, default=0.0)
+    latency_ms = Column(Float, default=0.0)
+    outcome = Column(String, nullable=False)  # ok, cached, error, timeout, deadline, circuit_open
+
+
+class PresetLibraryEntry(Base):
+    """Request frequency and precomputed concept for one preset room combination"""
+    __tablename__ = "preset_library"
+
+    id = Column(Integer, primary_key=True, index=True)
+    combination_key = Column(String, unique=True, index=True, nullable=False)  # property|style|room|budget|area bucket
+    property_type = Column(String, nullable=False)
+    design_style = Column(String, nullable=False)
+    room_type = Column(String, nullable=False)
+    budget_range = Column(String, nullable=False)
+    area_bucket = Column(String, nullable=True)  # "10-20" sqm, "100+"; rooms in a bucket share the concept
+
+    # Request-frequency stats
+    request_count = Column(Integer, default=0, nullable=False)
+    last_requested_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Precomputed concept (filled by the warm-up job)
+    concept_id = Column(Integer, ForeignKey("design_concepts.id"), nullable=True)
+    generated_at = Column(DateTime(timezone=True), nullable=True)
+    served_count = Column(Integer, default=0, nullable=False)
+
+    # Relationships
+    concept = relationship("DesignConcept")
+
+
 class Material(Base):
     """Material catalog"""
     __tablename__ = "materials"
@@ -150,3 +228,15 @@ class Estimation(Base):
     
     # Relationships
     project = relationship("Project")
+
+
+class EstimationAudit(Base):
+    """Stored AI audit of a project's estimation, keyed by a fingerprint of its inputs"""
+    __tablename__ = "estimation_audits"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), unique=True, index=True, nullable=False)
+    estimation_id = Column(Integer, ForeignKey("estimations.id"), nullable=True)
+    fingerprint = Column(String, nullable=False)  # sha256 of the project fields and estimation totals audited
+    result = Column(Text, nullable=False)  # JSON string of the audit response
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
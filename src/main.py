@@ -2,9 +2,48 @@
 Dubai Cons AI Suite MVP - Main FastAPI Application
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config.settings import settings
+from api.middleware import UsageAttributionMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    from ai_modules.proxyapi_client import proxy_api_client
+    from ai_modules.response_cache import response_cache
+    from ai_modules.blob_store import blob_store
+    from ai_modules.executors import shutdown_executors
+    from ai_modules.image_derivatives import derivative_generator
+    from services.job_queue import design_job_queue
+    from services.preset_library import preset_library
+    from ai_modules.usage_log import usage_log
+    from ai_modules.semantic_cache import semantic_cache
+    from services.compliance_service import compliance_service
+
+    await proxy_api_client.start()
+    await usage_log.start()
+    await semantic_cache.start()
+    await design_job_queue.start()
+    await preset_library.start()
+    if settings.rag_warmup_on_startup:
+        # Loads in a thread: the server accepts traffic meanwhile
+        compliance_service.start_warmup()
+    try:
+        yield
+    finally:
+        await preset_library.stop()
+        await design_job_queue.stop()
+        await semantic_cache.stop()
+        await usage_log.stop()
+        await proxy_api_client.aclose()
+        await response_cache.aclose()
+        await blob_store.aclose()
+        shutdown_executors()
+        derivative_generator.shutdown()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -13,6 +52,7 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -23,6 +63,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UsageAttributionMiddleware)
 
 
 @app.get("/")
@@ -53,6 +94,13 @@ try:
     app.include_router(design.router, prefix="/api/v1/design", tags=["design"])
     app.include_router(visualization.router, prefix="/api/v1/visualization", tags=["visualization"])
     
+    # Include media router (stored renders)
+    try:
+        from api.routes import media
+        app.include_router(media.router, prefix="/api/v1/media", tags=["media"])
+    except ImportError:
+        print("Warning: Media module not available")
+    
     # Include stats router
     try:
         from api.routes import stats
@@ -1,25 +1,96 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import asyncio
+import contextvars
+import logging
 import os
-# from ai_modules.rag_engine import RAGEngine
+import threading
+import time
+from ai_modules import deadline
+from ai_modules.executors import ExecutorSaturatedError, MeteredExecutor
+# Cheap to import: the engine loads langchain and the embedding model on construction
+from ai_modules.rag_engine import RAGEngine
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 # Path to the regulations file
 REGULATIONS_PATH = os.path.join(os.getcwd(), 'docs', 'regulations', 'dubai_building_code_summary.txt')
 
+# Query embedding and FAISS search are CPU-bound; keep them off the event loop
+# and out of the default thread pool
+compliance_executor = MeteredExecutor(
+    "compliance",
+    max_workers=settings.compliance_executor_workers,
+    max_queue=settings.compliance_executor_max_queue,
+)
+
 class ComplianceService:
     def __init__(self):
         self._rag_engine = None
+        self._load_lock = threading.Lock()
+        # Set once a load attempt (warm-up or lazy) has finished, successfully or not
+        self._ready = threading.Event()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._stats = {"state": "idle", "load_seconds": None, "waits": 0, "wait_timeouts": 0, "abandoned": 0}
 
-    def _get_rag_engine(self):
-        """Lazy load RAG engine"""
-        if not self._rag_engine:
-            print("⏳ Lazy loading RAG Engine...")
+    def _load_engine(self):
+        """Build the RAG engine once; concurrent callers wait for the first"""
+        with self._load_lock:
+            if self._rag_engine:
+                return self._rag_engine
+            self._ready.clear()
+            self._stats["state"] = "loading"
+            started = time.perf_counter()
             try:
-                from ai_modules.rag_engine import RAGEngine
-                self._rag_engine = RAGEngine(docs_path=REGULATIONS_PATH)
+                engine = RAGEngine(docs_path=REGULATIONS_PATH)
+                if engine.db is None:
+                    # RAGEngine reports its own load errors and leaves db unset
+                    logger.warning("RAGEngine loaded without a regulations index")
+                    self._rag_engine = None
+                    self._stats["state"] = "failed"
+                else:
+                    self._rag_engine = engine
+                    self._stats["state"] = "ready"
             except Exception as e:
-                print(f"⚠️ Failed to load RAGEngine: {e}")
+                logger.warning(f"Failed to load RAGEngine: {e!r}")
                 self._rag_engine = None
-        return self._rag_engine
+                self._stats["state"] = "failed"
+            finally:
+                self._stats["load_seconds"] = round(time.perf_counter() - started, 2)
+                self._ready.set()
+            return self._rag_engine
+
+    def _get_rag_engine(self):
+        """Lazy load RAG engine, or wait (bounded) for the background warm-up"""
+        if self._rag_engine:
+            return self._rag_engine
+        if self._warmup_thread is not None and self._warmup_thread.is_alive():
+            timeout = settings.rag_ready_timeout_seconds
+            left = deadline.remaining()
+            if left is not None:
+                timeout = min(timeout, left)
+            self._stats["waits"] += 1
+            if not self._ready.wait(timeout):
+                self._stats["wait_timeouts"] += 1
+                return None
+            return self._rag_engine
+        logger.info("Lazy loading RAG Engine...")
+        return self._load_engine()
+
+    def start_warmup(self) -> None:
+        """
+        Build the RAG engine in a background thread (called from the app
+        lifespan when rag_warmup_on_startup is set); compliance checks that
+        arrive meanwhile wait up to rag_ready_timeout_seconds for it
+        """
+        if self._rag_engine or self._warmup_thread is not None:
+            return
+        self._warmup_thread = threading.Thread(target=self._load_engine, name="rag-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._rag_engine is not None
 
     def check_design_compliance(self, design_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -34,11 +105,69 @@ class ComplianceService:
         if not description.strip():
             return {"status": "skipped", "reason": "No project details provided"}
 
+        # The request deadline follows us into worker threads (asyncio.to_thread
+        # copies the context); loading the RAG engine alone can take seconds
+        if deadline.expired():
+            return {"status": "skipped", "reason": "Request deadline exceeded"}
+
         # Perform the check using lazy-loaded engine
         rag = self._get_rag_engine()
+        if deadline.expired():
+            return {"status": "skipped", "reason": "Request deadline exceeded"}
+        if rag is None:
+            reason = "Regulations index is still loading" if self._stats["state"] == "loading" else "Regulations index unavailable"
+            return {"status": "skipped", "reason": reason}
         compliance_result = rag.check_compliance(description)
         
         return compliance_result
 
+    async def check(self, design_data: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run ``check_design_compliance`` on the compliance executor
+
+        Args:
+            design_data: ``project_details`` and ``client_preferences``
+            timeout: Seconds to wait for the result (defaults to
+                compliance_check_timeout_seconds, capped by the request deadline)
+
+        Returns:
+            The compliance report, or a skipped report if the executor is
+            saturated or the check times out
+        """
+        if timeout is None:
+            timeout = settings.compliance_check_timeout_seconds
+        left = deadline.remaining()
+        if left is not None:
+            timeout = min(timeout, left)
+        # The executor does not copy context vars the way asyncio.to_thread
+        # does; the deadline must follow the check into the worker. The
+        # worker's deadline is our timeout, so a check we stop waiting for
+        # also stops at its next deadline check and frees its slot.
+        give_up_at = time.monotonic() + timeout
+
+        def run_with_deadline() -> Dict[str, Any]:
+            with deadline.deadline_scope(max(0.0, give_up_at - time.monotonic())):
+                return self.check_design_compliance(design_data)
+
+        context = contextvars.copy_context()
+        try:
+            return await compliance_executor.run(context.run, run_with_deadline, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._stats["abandoned"] += 1
+            logger.warning(f"Compliance check timed out after {timeout:.1f}s")
+            return {"status": "skipped", "reason": "Compliance check timed out"}
+        except ExecutorSaturatedError:
+            return {"status": "skipped", "reason": "Compliance checker is busy"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "warmup_on_startup": settings.rag_warmup_on_startup,
+            "ready": self.is_ready,
+            "ready_timeout_seconds": settings.rag_ready_timeout_seconds,
+            **self._stats,
+            "query_cache": self._rag_engine.get_cache_stats() if self._rag_engine else None,
+            "executor": compliance_executor.get_stats(),
+        }
+
 # Singleton instance
 compliance_service = ComplianceService()
@@ -2,145 +2,486 @@
 Design AI Service - Generates design concepts using AI
 """
 
-from typing import Optional, Dict, Any
+import asyncio
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Callable
 from ai_modules.proxyapi_client import proxy_api_client
 from ai_modules.prompts import get_design_concept_prompt, get_image_generation_prompt
+from ai_modules.blob_store import blob_store
+from ai_modules import deadline
+from ai_modules.model_router import Candidate, model_router
+from config.settings import settings
+from services.pipeline import Stage, StageGraph
+
+
+# First line of the placeholder description used when text generation fails
+FALLBACK_TITLE = "**Design Concept (Fallback Generated)**"
+
+# DALL-E 3 sizes for the Imagen aspect ratios accepted by the API
+DALLE_SIZES = {
+    "1:1": "1024x1024",
+    "4:3": "1792x1024",
+    "16:9": "1792x1024",
+    "3:4": "1024x1792",
+    "9:16": "1024x1792",
+}
 
 
 class DesignAIService:
     """
     Service for generating design concepts using AI
     """
-    
+
     def __init__(self):
         self.text_model = "gpt-4"  # Will use deepseek-v3 through ProxyAPI
         self.image_model = "dall-e-3"
-    
+        # Secondary routes on Gemini
+        self.gemini_text_model = "gemini-1.5-flash"
+        self.gemini_image_model = "imagen-3.0-generate-001"
+        self.text_max_tokens = 6000
+        self.default_style = "Contemporary Luxury"
+        self.default_color_scheme = "Neutral with gold accents"
+        # Per-stage timeouts (seconds) for the design pipeline
+        self.stage_timeouts = {
+            "text": 90.0,
+            "image": 240.0,
+            "compliance": 30.0,
+            "visualization": 10.0,
+            "persist": 10.0,
+        }
+
+    def _build_messages(self, client_preferences: str, project_details: str) -> List[Dict[str, str]]:
+        """Build chat messages for the design concept prompt"""
+        prompt = get_design_concept_prompt(client_preferences, project_details)
+        return [
+            {"role": "system", "content": "You are an expert interior designer."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _fallback_description(self, client_preferences: str) -> str:
+        """Placeholder description used when text generation fails"""
+        return (
+            f"{FALLBACK_TITLE}\n\n"
+            f"Based on your request for a {client_preferences} style,\n"
+            f"we propose a sophisticated layout that harmonizes functionality with aesthetics.\n\n"
+            f"- **Style:** {client_preferences}\n"
+            f"- **Atmosphere:** Modern, clean, and elegant.\n"
+            f"- **Key Elements:** High-quality materials, optimal lighting, and spatial efficiency.\n\n"
+            f"(Note: AI servers are currently busy, this is a placeholder description.)"
+        )
+
+    def is_reusable(self, concept: Dict[str, Any]) -> bool:
+        """Whether a concept is real AI output (no fallback text or placeholder image)"""
+        from ai_modules.gemini_client import MOCK_IMAGE_URL_PREFIX
+
+        image_url = concept.get("image_url") or ""
+        description = concept.get("description") or ""
+        return (
+            bool(image_url)
+            and not image_url.startswith(MOCK_IMAGE_URL_PREFIX)
+            and not description.startswith(FALLBACK_TITLE)
+        )
+
+    async def _route(
+        self, request_class: str, candidates: List[Candidate], pinned: bool = False
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Serve a request through the model router, or try the candidates in
+        order when routing is disabled. ``pinned`` keeps the first candidate
+        as the primary route.
+
+        Returns:
+            Tuple of (result or None, winning "provider:model" or None)
+        """
+        if settings.ai_router_enabled:
+            return await model_router.run(request_class, candidates, pinned=pinned)
+        for candidate in candidates:
+            if deadline.expired():
+                break
+            try:
+                result = await candidate.call()
+            except Exception as e:
+                print(f"{candidate.key} failed: {e}")
+                continue
+            if result is not None:
+                return result, candidate.key
+        return None, None
+
+    async def generate_description(
+        self,
+        client_preferences: str,
+        project_details: str,
+        use_cache: bool = True
+    ) -> str:
+        """
+        Generate the text part of a design concept
+
+        The fastest healthy text route is used (ProxyAPI, or Gemini when
+        configured), see ``ai_modules.model_router``.
+
+        Returns:
+            Design description (fallback text if the provider fails or the
+            request deadline runs out)
+        """
+        from ai_modules.gemini_client import gemini_client
+
+        messages = self._build_messages(client_preferences, project_details)
+
+        async def via_proxyapi():
+            response = await proxy_api_client.chat_completion(
+                model=self.text_model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=self.text_max_tokens,
+                use_cache=use_cache,
+            )
+            return response["choices"][0]["message"]["content"] if response else None
+
+        async def via_gemini():
+            return await gemini_client.generate_content(
+                "\n\n".join(m["content"] for m in messages), model=self.gemini_text_model
+            )
+
+        candidates = [Candidate("proxyapi", self.text_model, via_proxyapi)]
+        if gemini_client.api_key_configured:
+            candidates.append(Candidate("gemini", self.gemini_text_model, via_gemini))
+
+        content, _ = await self._route("design_text", candidates)
+        if not content:
+            print("Primary AI text generation failed. Using fallback description.")
+            return self._fallback_description(client_preferences)
+        return content
+
+    async def stream_description(
+        self,
+        client_preferences: str,
+        project_details: str,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Stream the text part of a design concept as content deltas
+
+        Yields the fallback description as a single chunk if the provider
+        fails before sending any content. When the request deadline passes
+        mid-stream, the text received so far is kept.
+        """
+        received_any = False
+        try:
+            async for delta in proxy_api_client.stream_chat_completion(
+                model=self.text_model,
+                messages=self._build_messages(client_preferences, project_details),
+                temperature=0.7,
+                max_tokens=self.text_max_tokens,
+                use_cache=use_cache,
+            ):
+                received_any = True
+                yield delta
+                if deadline.expired():
+                    print("Request deadline reached while streaming; keeping the text so far.")
+                    break
+        except Exception as e:
+            print(f"Streaming text generation failed: {e}")
+
+        if not received_any:
+            print("Primary AI text generation failed. Using fallback description.")
+            yield self._fallback_description(client_preferences)
+
+    async def generate_image_for_description(
+        self,
+        design_description: str,
+        model_type: str = "standard",
+        use_cache: bool = True
+    ) -> Tuple[Optional[str], str]:
+        """
+        Generate a single image for a design concept
+
+        Returns:
+            Tuple of (image_url or None, model label)
+        """
+        image_urls, model_used = await self.generate_images_for_description(
+            design_description, model_type=model_type, use_cache=use_cache
+        )
+        return (image_urls[0] if image_urls else None), model_used
+
+    async def generate_images_for_description(
+        self,
+        design_description: str,
+        model_type: str = "standard",
+        use_cache: bool = True,
+        variants: int = 1,
+        aspect_ratio: str = "1:1"
+    ) -> Tuple[List[str], str]:
+        """
+        Generate the image variants of a design concept
+
+        Args:
+            design_description: Generated design description
+            model_type: "standard" (DALL-E) or "pro" (Nano Banana Pro / Gemini)
+            use_cache: Serve repeated prompts from the AI response cache
+            variants: Number of image variants, produced in one provider call
+            aspect_ratio: Image aspect ratio (e.g. "1:1", "16:9")
+
+        Returns:
+            Tuple of (image URLs, possibly empty, model label). The label
+            notes when the other model served the request as a fallback.
+        """
+        from ai_modules.gemini_client import gemini_client
+
+        image_urls: List[str] = []
+        final_model_used = "Standard AI"
+
+        # Helper function for standard generation. Retries with jittered
+        # backoff happen inside the client; while the ProxyAPI circuit
+        # breaker is open this returns an empty list immediately.
+        async def generate_standard_images(desc):
+            try:
+                img_prompt = get_image_generation_prompt(desc, model=self.image_model)
+                img_response = await proxy_api_client.generate_image(
+                    model=self.image_model,
+                    prompt=img_prompt,
+                    size=DALLE_SIZES.get(aspect_ratio, "1024x1024"),
+                    quality="hd",
+                    use_cache=use_cache,
+                    n=variants
+                )
+                if img_response and "data" in img_response:
+                    urls = [item["url"] for item in img_response["data"] if item.get("url")]
+                    if settings.media_localize_remote_images:
+                        # Provider URLs expire; keep our own copy
+                        urls = await blob_store.localize_urls(urls)
+                    return urls
+            except Exception as e:
+                print(f"Standard generation failed: {e}")
+            return []
+
+        def urls_from(image_response):
+            if not image_response:
+                return []
+            return image_response.get("image_urls") or [u for u in [image_response.get("image_url")] if u]
+
+        async def generate_pro_images():
+            image_prompt = get_image_generation_prompt(design_description, model="imagen")
+            image_response = await gemini_client.generate_image(
+                prompt=image_prompt,
+                aspect_ratio=aspect_ratio,
+                number_of_images=variants,
+                use_cache=use_cache,
+                model=self.gemini_image_model
+            )
+            # A mock placeholder is not a real render: let the router try the next route
+            if not image_response or str(image_response.get("model_used", "")).startswith("Mock"):
+                return None
+            return urls_from(image_response) or None
+
+        async def via_standard():
+            return await generate_standard_images(design_description) or None
+
+        # 1. Route between DALL-E (standard) and Imagen (Nano Banana Pro).
+        # The requested model type is always the primary route; the other
+        # only runs if it fails or (with hedging) is slow.
+        standard = Candidate("proxyapi", self.image_model, via_standard)
+        candidates = [standard]
+        if gemini_client.api_key_configured:
+            pro = Candidate("gemini", self.gemini_image_model, generate_pro_images)
+            candidates = [pro, standard] if model_type == "pro" else [standard, pro]
+        elif model_type == "pro":
+            print("Gemini not configured. Falling back to Standard model...")
+
+        routed_urls, route = await self._route(f"design_image_{model_type}", candidates, pinned=True)
+        if routed_urls:
+            image_urls = routed_urls
+            if route and route.startswith("gemini:"):
+                final_model_used = "Nano Banana Pro"
+            requested = "Nano Banana Pro" if model_type == "pro" else "Standard AI"
+            if final_model_used != requested:
+                final_model_used = f"{final_model_used} (fallback from {requested})"
+
+        # 2. Last Resort Fallback (Mock/Gemini default if everything else fails).
+        # Past the request deadline Gemini calls fail fast, so this returns
+        # the placeholder immediately.
+        if not image_urls:
+            try:
+                print("All standard methods failed. Attempting final fallback...")
+                # This might return a mock if configured in gemini_client
+                image_prompt = get_image_generation_prompt(design_description, model="imagen")
+                image_response = await gemini_client.generate_image(
+                    prompt=image_prompt,
+                    aspect_ratio=aspect_ratio,
+                    number_of_images=variants,
+                    use_cache=use_cache
+                )
+                image_urls = urls_from(image_response)
+                if image_urls:
+                    print(f"Final fallback successful. URL: {image_urls[0]}")
+            except Exception as e:
+                print(f"Final fallback failed: {e}")
+
+        return image_urls, final_model_used
+
     async def generate_design_concept(
         self,
         client_preferences: str,
         project_details: str,
-        model_type: str = "standard"  # "standard" or "pro"
+        model_type: str = "standard",  # "standard" or "pro"
+        use_cache: bool = True
     ) -> Optional[Dict[str, Any]]:
         """
         Generate a complete design concept (text + image)
-        
+
         Args:
             client_preferences: Client requirements
             project_details: Project details
             model_type: "standard" (DALL-E) or "pro" (Nano Banana Pro / Gemini)
-            
+            use_cache: Serve repeated text/image requests from the AI response cache
+
+        Text and image generation share the request deadline (see
+        ``ai_modules.deadline``); each step falls back once it has passed.
+
         Returns:
             Dictionary with design_description and image_url
         """
-        import asyncio
-        from ai_modules.gemini_client import gemini_client
-        
         try:
             # Generate text description with increased tokens
-            prompt = get_design_concept_prompt(client_preferences, project_details)
-            
-            messages = [
-                {"role": "system", "content": "You are an expert interior designer."},
-                {"role": "user", "content": prompt}
-            ]
-            
-            response = await proxy_api_client.chat_completion(
-                model=self.text_model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=6000,
+            design_description = await self.generate_description(
+                client_preferences, project_details, use_cache=use_cache
             )
-            
-            if not response:
-                print("Primary AI text generation failed. Using fallback description.")
-                design_description = (
-                    f"**Design Concept (Fallback Generated)**\n\n"
-                    f"Based on your request for a {client_preferences} style,\n"
-                    f"we propose a sophisticated layout that harmonizes functionality with aesthetics.\n\n"
-                    f"- **Style:** {client_preferences}\n"
-                    f"- **Atmosphere:** Modern, clean, and elegant.\n"
-                    f"- **Key Elements:** High-quality materials, optimal lighting, and spatial efficiency.\n\n"
-                    f"(Note: AI servers are currently busy, this is a placeholder description.)"
-                )
-            else:
-                design_description = response["choices"][0]["message"]["content"]
-            
-            # Generate image
-            image_url = None
-            final_model_used = "Standard AI"
-            
-            # Helper function for standard generation
-            async def generate_standard_image(desc):
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        img_prompt = get_image_generation_prompt(desc)
-                        img_response = await proxy_api_client.generate_image(
-                            model=self.image_model,
-                            prompt=img_prompt,
-                            size="1024x1024",
-                            quality="hd"
-                        )
-                        if img_response and "data" in img_response:
-                            return img_response["data"][0]["url"]
-                    except Exception as e:
-                        print(f"Standard generation attempt {attempt + 1} failed: {e}")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(2)
-                return None
 
-            # 1. Try Pro Mode (Gemini) if requested
-            if model_type == "pro":
-                if gemini_client.api_key_configured:
-                    try:
-                        print("Attempting to use Nano Banana Pro (Gemini)...")
-                        image_prompt = get_image_generation_prompt(design_description)
-                        image_response = await gemini_client.generate_image(
-                            prompt=image_prompt
-                        )
-                        if image_response and image_response.get("image_url"):
-                            image_url = image_response.get("image_url")
-                            final_model_used = "Nano Banana Pro"
-                    except Exception as e:
-                        print(f"Gemini generation failed: {e}")
-                        print("Falling back to Standard model...")
-                else:
-                    print("Gemini not configured. Falling back to Standard model...")
-
-            # 2. Fallback or Standard Mode
-            if not image_url:
-                image_url = await generate_standard_image(design_description)
-
-            # 3. Last Resort Fallback (Mock/Gemini default if everything else fails)
-            if not image_url:
-                try:
-                    print("All standard methods failed. Attempting final fallback...")
-                    # This might return a mock if configured in gemini_client
-                    image_prompt = get_image_generation_prompt(design_description)
-                    image_response = await gemini_client.generate_image(prompt=image_prompt)
-                    if image_response:
-                        image_url = image_response.get("image_url")
-                        print(f"Final fallback successful. URL: {image_url}")
-                except Exception as e:
-                    print(f"Final fallback failed: {e}")
+            # Generate image
+            image_url, final_model_used = await self.generate_image_for_description(
+                design_description, model_type=model_type, use_cache=use_cache
+            )
 
             result_dict = {
                 "description": design_description,
                 "image_url": image_url,
-                "style": "Contemporary Luxury",
-                "color_scheme": "Neutral with gold accents",
+                "style": self.default_style,
+                "color_scheme": self.default_color_scheme,
                 "model_used": final_model_used
             }
             print(f"DEBUG: design_service return: {result_dict}")
             return result_dict
-            
+
         except Exception as e:
             print(f"Error generating design concept: {e}")
             import traceback
             traceback.print_exc()
             return None
 
+    async def run_design_pipeline(
+        self,
+        client_preferences: str,
+        project_details: str,
+        model_type: str = "standard",
+        use_cache: bool = True,
+        check_compliance: bool = False,
+        persist: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        variants: int = 1,
+        aspect_ratio: str = "1:1",
+        on_stage_done: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run the full design pipeline as a stage graph
+
+        Stages and dependencies::
+
+            text -> image -> persist
+            compliance            (request only)
+            visualization         (request only)
+
+        Compliance and visualization run concurrently with text and image
+        generation. Every stage except ``persist`` has a fallback, so the
+        pipeline only fails if persisting the concept fails. Stage timeouts
+        are capped by the request deadline; stages still pending when it
+        passes use their fallback immediately.
+
+        Args:
+            client_preferences: Client requirements
+            project_details: Project details
+            model_type: "standard" (DALL-E) or "pro" (Nano Banana Pro / Gemini)
+            use_cache: Serve repeated text/image requests from the AI response cache
+            check_compliance: Run the Dubai building code check
+            persist: Callable receiving the concept dict and returning its saved id
+            variants: Number of image variants to render in one provider call
+            aspect_ratio: Image aspect ratio
+            on_stage_done: Callable receiving each finished stage's name and timing
+                (used for job progress reporting)
+
+        Returns:
+            Concept dictionary with compliance_report, visualization,
+            id (if persisted) and per-stage timings
+        """
+        from services.compliance_service import compliance_service
+        from services.visualization_service import visualization_service
+
+        async def text_stage(results):
+            return await self.generate_description(client_preferences, project_details, use_cache=use_cache)
+
+        async def image_stage(results):
+            return await self.generate_images_for_description(
+                results["text"], model_type=model_type, use_cache=use_cache,
+                variants=variants, aspect_ratio=aspect_ratio
+            )
+
+        async def compliance_stage(results):
+            if not check_compliance:
+                return None
+            return await compliance_service.check({
+                "project_details": project_details,
+                "client_preferences": client_preferences
+            })
+
+        async def visualization_stage(results):
+            return await visualization_service.create_3d_scene(
+                room_type="living",  # Default to living room if unknown
+                dimensions={"width": 5.0, "depth": 4.0, "height": 3.0},
+                design_elements={"style": self.default_style, "color_scheme": self.default_color_scheme}
+            )
+
+        def concept_from(results):
+            image_urls, model_used = results["image"]
+            return {
+                "description": results["text"],
+                "image_url": image_urls[0] if image_urls else None,
+                "image_variants": image_urls,
+                "style": self.default_style,
+                "color_scheme": self.default_color_scheme,
+                "model_used": model_used,
+            }
+
+        async def persist_stage(results):
+            if persist is None:
+                return None
+            saved = persist(concept_from(results))
+            if asyncio.iscoroutine(saved):
+                saved = await saved
+            return saved
+
+        graph = StageGraph("design", [
+            Stage("text", text_stage, timeout=self.stage_timeouts["text"],
+                  fallback=lambda e: self._fallback_description(client_preferences)),
+            Stage("image", image_stage, depends_on=["text"], timeout=self.stage_timeouts["image"],
+                  fallback=lambda e: ([], "Standard AI")),
+            Stage("compliance", compliance_stage, timeout=self.stage_timeouts["compliance"],
+                  fallback=lambda e: None),
+            Stage("visualization", visualization_stage, timeout=self.stage_timeouts["visualization"],
+                  fallback=lambda e: None),
+            Stage("persist", persist_stage, depends_on=["text", "image"],
+                  timeout=self.stage_timeouts["persist"]),
+        ], on_stage_done=on_stage_done)
+        run = await graph.run()
+        results = run["results"]
+
+        return {
+            **concept_from(results),
+            "id": results["persist"],
+            "compliance_report": results["compliance"],
+            "visualization": results["visualization"],
+            "timings": {
+                "total_ms": run["total_ms"],
+                "critical_path": run["critical_path"],
+                "stages": run["timings"],
+            },
+        }
+
 
 # Global service instance
 design_service = DesignAIService()
@@ -4,6 +4,10 @@ Estimation Service - Cost estimation for Dubai Cons AI Suite
 
 from typing import Dict, Any, Optional
 
+# Bump when the audit prompt changes so stored audits are not reused
+AUDIT_PROMPT_VERSION = 1
+AUDIT_FALLBACK_INSIGHT = "AI could not reach the server, applied standard 5% buffer."
+
 
 class EstimationService:
     """
@@ -150,6 +154,31 @@ class EstimationService:
             "tier": tier
         }
     
+    def audit_fingerprint(self, project: Any, estimation_result: Dict[str, Any]) -> str:
+        """
+        Fingerprint of everything the audit prompt is built from; a stored
+        audit with the same fingerprint can be served instead of calling Gemini
+        """
+        import hashlib
+        import json
+
+        inputs = {
+            "version": AUDIT_PROMPT_VERSION,
+            "property_type": project.property_type,
+            "area": project.area,
+            "location": project.location,
+            "tier": estimation_result.get("tier", "standard"),
+            "total_cost": estimation_result["total_cost"],
+            "materials_cost": estimation_result["materials_cost"],
+            "labor_cost": estimation_result["labor_cost"],
+            "furniture_cost": estimation_result["furniture_cost"],
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def is_reusable_audit(self, audit_result: Dict[str, Any]) -> bool:
+        """Whether an audit is real AI output (not the standard-buffer fallback)"""
+        return audit_result.get("expert_insight") != AUDIT_FALLBACK_INSIGHT
+
     async def audit_estimation(self, project: Any, estimation_result: Dict[str, Any]) -> Dict[str, Any]:
         """
         Perform an AI audit of the estimation using Gemini
@@ -222,7 +251,7 @@ class EstimationService:
                 "buffer_percent": 5,
                 "buffer_amount": estimation_result["total_cost"] * 0.05,
                 "risk_factors": ["Standard Uncertainty"],
-                "expert_insight": "AI could not reach the server, applied standard 5% buffer."
+                "expert_insight": AUDIT_FALLBACK_INSIGHT
             }
 
 
@@ -0,0 +1,308 @@
+"""
+Durable background job queue for long-running design generation
+
+Jobs are rows in the ``design_jobs`` table, so the queue needs no broker and
+survives restarts. A fixed number of async workers per app process claim jobs
+with a conditional UPDATE (safe across processes on SQLite and Postgres) and
+hold a lease while running. A heartbeat task renews the lease while the
+handler runs and writes its latest progress, at most once per progress
+interval. A job whose worker died is picked up again once its lease expires,
+up to ``design_job_max_attempts`` attempts.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+
+from config.settings import settings
+from ai_modules.usage_log import usage_context
+from database.connection import SessionLocal
+from database.models import DesignJob
+
+logger = logging.getLogger(__name__)
+
+# Handler signature: (payload, report_progress(percent, stage)) -> JSON-serialisable result
+ProgressReporter = Callable[[int, Optional[str]], None]
+JobHandler = Callable[[Dict[str, Any], ProgressReporter], Awaitable[Dict[str, Any]]]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_to_dict(job: DesignJob) -> Dict[str, Any]:
+    """Public representation of a job row"""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress or 0,
+        "stage": job.stage,
+        "attempts": job.attempts or 0,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class JobQueue:
+    """
+    Database-backed job queue with an in-process worker pool
+
+    Args:
+        workers: Number of concurrent workers started by ``start()``
+        poll_interval: Seconds idle workers wait before checking the table again
+        lease_seconds: How long a claimed job is reserved for its worker
+        max_attempts: Claims allowed before a job is marked failed
+        progress_interval: Minimum seconds between progress writes of a job
+        heartbeat_seconds: How often a running job's lease is renewed
+            (defaults to a third of the lease)
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        poll_interval: float,
+        lease_seconds: float,
+        max_attempts: int,
+        progress_interval: float = 1.0,
+        heartbeat_seconds: Optional[float] = None,
+    ):
+        self.workers = max(0, workers)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.progress_interval = max(0.0, progress_interval)
+        self.heartbeat_seconds = heartbeat_seconds or lease_seconds / 3
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {"enqueued": 0, "claimed": 0, "succeeded": 0, "failed": 0, "heartbeat_errors": 0}
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Register the coroutine that runs jobs of ``kind``"""
+        self._handlers[kind] = handler
+
+    # ---- Database operations (blocking, run in threads) ----
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> DesignJob:
+        """Persist a new queued job and wake an idle worker"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        db = SessionLocal()
+        try:
+            job = DesignJob(kind=kind, status="queued", progress=0, attempts=0,
+                            payload=json.dumps(payload, default=str))
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+        finally:
+            db.close()
+        self._stats["enqueued"] += 1
+        if self._wakeup is not None:
+            # Routes enqueue from worker threads; the event belongs to the loop
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            job = db.query(DesignJob).filter(DesignJob.id == job_id).first()
+            return job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def _claimable(self, now: datetime):
+        return or_(
+            DesignJob.status == "queued",
+            and_(DesignJob.status == "running", DesignJob.lease_expires_at < now),
+        )
+
+    def _claim_next(self) -> Optional[DesignJob]:
+        """Atomically claim the oldest claimable job, if any"""
+        now = _utcnow()
+        db = SessionLocal()
+        try:
+            candidates = db.query(DesignJob.id).filter(self._claimable(now)).order_by(DesignJob.id).limit(5).all()
+            for (job_id,) in candidates:
+                # Only one worker's UPDATE matches; the others see rowcount 0
+                claimed = db.query(DesignJob).filter(
+                    DesignJob.id == job_id, self._claimable(now)
+                ).update({
+                    DesignJob.status: "running",
+                    DesignJob.attempts: DesignJob.attempts + 1,
+                    DesignJob.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+                    DesignJob.started_at: now,
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    job = db.query(DesignJob).filter(DesignJob.id == job_id).first()
+                    db.expunge(job)
+                    return job
+            return None
+        finally:
+            db.close()
+
+    def _update(self, job_id: int, **fields: Any) -> None:
+        db = SessionLocal()
+        try:
+            db.query(DesignJob).filter(DesignJob.id == job_id).update(
+                {getattr(DesignJob, name): value for name, value in fields.items()},
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _heartbeat_update(self, job_id: int, **fields: Any) -> None:
+        """Renew the lease (and write progress) only while the job is still running"""
+        db = SessionLocal()
+        try:
+            db.query(DesignJob).filter(DesignJob.id == job_id, DesignJob.status == "running").update(
+                {getattr(DesignJob, name): value for name, value in fields.items()},
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish(self, job_id: int, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        self._stats["succeeded" if status == "succeeded" else "failed"] += 1
+        fields = {"status": status, "error": error, "finished_at": _utcnow(), "lease_expires_at": None}
+        if status == "succeeded":
+            fields.update(progress=100, result=json.dumps(result, default=str))
+        self._update(job_id, **fields)
+
+    # ---- Workers ----
+
+    async def _run_job(self, job: DesignJob) -> None:
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            await asyncio.to_thread(self._finish, job.id, "failed", error=f"Unknown job kind '{job.kind}'")
+            return
+        if job.attempts > self.max_attempts:
+            await asyncio.to_thread(self._finish, job.id, "failed", error="Job exceeded its maximum attempts")
+            return
+
+        progress: Dict[str, Any] = {"latest": None, "written": None}
+        reported = asyncio.Event()
+        done = asyncio.Event()
+
+        def report_progress(percent: int, stage: Optional[str] = None) -> None:
+            # Called on the event loop: only note it, the heartbeat writes it
+            progress["latest"] = (max(0, min(99, int(percent))), stage)
+            reported.set()
+
+        async def heartbeat() -> None:
+            while not done.is_set():
+                try:
+                    await asyncio.wait_for(reported.wait(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                reported.clear()
+                fields: Dict[str, Any] = {"lease_expires_at": _utcnow() + timedelta(seconds=self.lease_seconds)}
+                if progress["latest"] != progress["written"]:
+                    fields["progress"], fields["stage"] = progress["latest"]
+                try:
+                    await asyncio.to_thread(self._heartbeat_update, job.id, **fields)
+                    progress["written"] = progress["latest"]
+                except Exception as e:
+                    self._stats["heartbeat_errors"] += 1
+                    logger.warning(f"Design job {job.id} heartbeat failed: {e!r}")
+                # Throttle: reports arriving meanwhile are coalesced into the next write
+                try:
+                    await asyncio.wait_for(done.wait(), timeout=self.progress_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        payload = json.loads(job.payload)
+        heartbeat_task = asyncio.create_task(heartbeat())
+        try:
+            # AI calls made by the job are accounted to it rather than to a request
+            with usage_context(endpoint=f"job:{job.kind}", project_id=payload.get("project_id")):
+                result = await handler(payload, report_progress)
+        except Exception as e:
+            logger.warning(f"Design job {job.id} ({job.kind}) failed: {e!r}")
+            await self._stop_heartbeat(heartbeat_task, done, reported)
+            await asyncio.to_thread(self._finish, job.id, "failed", error=str(e) or e.__class__.__name__)
+            return
+        except BaseException:
+            # Worker cancelled (shutdown): the lease lapses and the job is retried
+            heartbeat_task.cancel()
+            raise
+        await self._stop_heartbeat(heartbeat_task, done, reported)
+        await asyncio.to_thread(self._finish, job.id, "succeeded", result=result)
+
+    @staticmethod
+    async def _stop_heartbeat(task: asyncio.Task, done: asyncio.Event, reported: asyncio.Event) -> None:
+        """Let the heartbeat finish its current write so it cannot land after the job's final update"""
+        done.set()
+        reported.set()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim_next)
+            except Exception as e:
+                logger.error(f"Design job worker {index} could not claim a job: {e!r}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            self._stats["claimed"] += 1
+            await self._run_job(job)
+
+    async def start(self) -> None:
+        """Start the worker pool (called from the app lifespan)"""
+        if self._tasks or self.workers == 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Jobs they were running stay ``running`` and are
+        picked up again once their lease expires.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            by_status = dict(db.query(DesignJob.status, func.count(DesignJob.id)).group_by(DesignJob.status).all())
+        finally:
+            db.close()
+        return {
+            "workers": len(self._tasks),
+            "handlers": sorted(self._handlers),
+            "jobs_by_status": by_status,
+            **self._stats,
+        }
+
+
+# Global queue instance
+design_job_queue = JobQueue(
+    workers=settings.design_job_workers,
+    poll_interval=settings.design_job_poll_seconds,
+    lease_seconds=settings.design_job_lease_seconds,
+    max_attempts=settings.design_job_max_attempts,
+    progress_interval=settings.design_job_progress_interval_seconds,
+)
@@ -0,0 +1,249 @@
+"""
+Stage graph executor for multi-step AI pipelines
+
+A pipeline is a small DAG of named async stages. Each stage starts as soon as
+the stages it depends on have finished, so independent stages run
+concurrently. Every stage can have its own timeout and fallback, and the
+executor records per-stage timings plus the critical path of each run.
+
+Stages with a fallback are also bounded by the request deadline (see
+``ai_modules.deadline``): once it has passed they use their fallback without
+running. Required stages always run under their own timeout.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from ai_modules import deadline
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    One node of a stage graph
+
+    Args:
+        name: Unique stage name; its value is stored under this key
+        func: Async callable receiving the results of finished stages
+        depends_on: Names of stages that must finish first
+        timeout: Seconds before the stage is cancelled (None for no limit)
+        fallback: Callable receiving the exception and returning a
+            substitute value. Stages without a fallback are required: their
+            failure aborts the whole run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        fallback: Optional[Callable[[BaseException], Any]] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.fallback = fallback
+
+
+class PipelineMetrics:
+    """Aggregated per-stage timings across pipeline runs"""
+
+    def __init__(self):
+        self._pipelines: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, pipeline: str, total_ms: float, timings: Dict[str, Dict[str, Any]], critical_path: List[str]) -> None:
+        entry = self._pipelines.setdefault(pipeline, {"runs": 0, "total_ms_sum": 0.0, "total_ms_max": 0.0, "stages": {}})
+        entry["runs"] += 1
+        entry["total_ms_sum"] += total_ms
+        entry["total_ms_max"] = max(entry["total_ms_max"], total_ms)
+        entry["last_critical_path"] = critical_path
+        for name, timing in timings.items():
+            stage = entry["stages"].setdefault(name, {
+                "runs": 0, "duration_ms_sum": 0.0, "duration_ms_max": 0.0,
+                "on_critical_path": 0, "timeouts": 0, "deadline_exceeded": 0, "fallbacks": 0, "failures": 0,
+            })
+            stage["runs"] += 1
+            stage["duration_ms_sum"] += timing["duration_ms"]
+            stage["duration_ms_max"] = max(stage["duration_ms_max"], timing["duration_ms"])
+            if name in critical_path:
+                stage["on_critical_path"] += 1
+            if timing["status"] == "timeout":
+                stage["timeouts"] += 1
+            if timing["status"] == "deadline":
+                stage["deadline_exceeded"] += 1
+            if timing["fallback"]:
+                stage["fallbacks"] += 1
+            if timing["status"] == "failed":
+                stage["failures"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for pipeline, entry in self._pipelines.items():
+            runs = entry["runs"]
+            stats[pipeline] = {
+                "runs": runs,
+                "total_ms_avg": round(entry["total_ms_sum"] / runs, 1),
+                "total_ms_max": round(entry["total_ms_max"], 1),
+                "last_critical_path": entry.get("last_critical_path", []),
+                "stages": {
+                    name: {
+                        "runs": stage["runs"],
+                        "duration_ms_avg": round(stage["duration_ms_sum"] / stage["runs"], 1),
+                        "duration_ms_max": round(stage["duration_ms_max"], 1),
+                        "on_critical_path": stage["on_critical_path"],
+                        "timeouts": stage["timeouts"],
+                        "deadline_exceeded": stage["deadline_exceeded"],
+                        "fallbacks": stage["fallbacks"],
+                        "failures": stage["failures"],
+                    }
+                    for name, stage in entry["stages"].items()
+                },
+            }
+        return stats
+
+
+# Global metrics instance
+pipeline_metrics = PipelineMetrics()
+
+
+class StageGraph:
+    """
+    Executes a DAG of stages with maximum concurrency
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stages: List[Stage],
+        on_stage_done: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+    ):
+        self.name = name
+        self.on_stage_done = on_stage_done
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError(f"Duplicate stage names in pipeline '{name}'")
+        for stage in stages:
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected in pipeline '{self.name}' at stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _critical_path(self, timings: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Walk back from the last stage to finish through its slowest dependency"""
+        if not timings:
+            return []
+        upstream = {dep for stage in self.stages.values() for dep in stage.depends_on}
+        sinks = [name for name in timings if name not in upstream] or list(timings)
+        current = max(sinks, key=lambda n: timings[n]["finished_ms"])
+        path = [current]
+        while self.stages[current].depends_on:
+            current = max(self.stages[current].depends_on, key=lambda n: timings[n]["finished_ms"])
+            path.append(current)
+        return list(reversed(path))
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run all stages
+
+        Returns:
+            Dictionary with ``results`` (stage name -> value), ``timings``
+            (stage name -> timing info), ``critical_path`` and ``total_ms``.
+            Raises the original exception if a required stage fails.
+        """
+        results: Dict[str, Any] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        run_started = time.perf_counter()
+
+        def offset_ms(moment: float) -> float:
+            return round((moment - run_started) * 1000, 1)
+
+        async def run_stage(stage: Stage) -> Any:
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[dep] for dep in stage.depends_on))
+            started = time.perf_counter()
+            status, used_fallback = "ok", False
+            try:
+                timeout = stage.timeout
+                if stage.fallback is not None:
+                    deadline.check(f"stage '{stage.name}'")
+                    timeout = deadline.timeout_for(timeout)
+                value = await asyncio.wait_for(stage.func(results), timeout=timeout)
+            except Exception as e:
+                if isinstance(e, deadline.DeadlineExceeded) or (isinstance(e, asyncio.TimeoutError) and deadline.expired()):
+                    status = "deadline"
+                else:
+                    status = "timeout" if isinstance(e, asyncio.TimeoutError) else "failed"
+                if stage.fallback is None:
+                    timings[stage.name] = self._timing(offset_ms(started), offset_ms(time.perf_counter()), status, False)
+                    raise
+                logger.warning(f"Pipeline '{self.name}' stage '{stage.name}' {status}: {e!r}. Using fallback.")
+                value = stage.fallback(e)
+                used_fallback = True
+            results[stage.name] = value
+            timings[stage.name] = self._timing(offset_ms(started), offset_ms(time.perf_counter()), status, used_fallback)
+            if self.on_stage_done is not None:
+                try:
+                    self.on_stage_done(stage.name, timings[stage.name])
+                except Exception as e:
+                    logger.warning(f"Pipeline '{self.name}' stage callback failed: {e!r}")
+            return value
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            total_ms = offset_ms(time.perf_counter())
+            critical_path = self._critical_path(timings)
+            pipeline_metrics.record(self.name, total_ms, timings, critical_path)
+            logger.info(
+                f"Pipeline '{self.name}' finished in {total_ms}ms; critical path: "
+                + " -> ".join(f"{name}({timings[name]['duration_ms']}ms)" for name in critical_path)
+            )
+
+        return {
+            "results": results,
+            "timings": timings,
+            "critical_path": critical_path,
+            "total_ms": total_ms,
+        }
+
+    @staticmethod
+    def _timing(started_ms: float, finished_ms: float, status: str, used_fallback: bool) -> Dict[str, Any]:
+        return {
+            "started_ms": started_ms,
+            "finished_ms": finished_ms,
+            "duration_ms": round(finished_ms - started_ms, 1),
+            "status": status,
+            "fallback": used_fallback,
+        }
@@ -0,0 +1,403 @@
+"""
+Precomputed design library for popular preset combinations
+
+``generate-by-presets`` designs every room separately from a finite set of
+values: property type x design style x room type x budget range, plus the
+room's area bucket (a 12 sqm and a 60 sqm bathroom are different designs). Each request
+bumps a counter per room combination in the ``preset_library`` table. A
+warm-up job, enqueued daily at an off-peak hour and on demand, generates and
+stores a concept for the most-requested combinations; later requests for
+those rooms are served from the library instead of calling the AI providers.
+
+Only rooms without free-text preferences and with preset property type,
+style and room type take part: anything else changes the design.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import settings
+from database.connection import SessionLocal
+from database.models import DesignConcept, DesignJob, PresetLibraryEntry
+from ai_modules import deadline
+from ai_modules.presets import build_room_prompts, is_preset_room, typical_room_area
+from services.job_queue import design_job_queue
+
+logger = logging.getLogger(__name__)
+
+WARMUP_JOB = "preset-library-warmup"
+
+# Budget ranges are free text in the API (labels or tiers like "Premium");
+# longer values are treated as custom requirements
+_MAX_BUDGET_LENGTH = 40
+
+# Room area buckets (sqm, lower bound inclusive); rooms in the same bucket
+# share a library concept
+AREA_BUCKETS = ((0, 10), (10, 20), (20, 35), (35, 60), (60, 100), (100, None))
+
+
+def area_bucket(area: float) -> str:
+    """Bucket label ("10-20", "100+") of a room area"""
+    for low, high in AREA_BUCKETS:
+        if high is None or area < high:
+            return f"{low}+" if high is None else f"{low}-{high}"
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+def bucket_area(bucket: Optional[str], property_type: str, room_type: str) -> float:
+    """
+    Area a bucket's concept is generated at: the preset's typical area when
+    it falls in the bucket, otherwise the bucket's midpoint
+    """
+    typical = typical_room_area(property_type, room_type)
+    if not bucket or area_bucket(typical) == bucket:
+        return typical
+    low, _, high = bucket.partition("-")
+    if not high:
+        return round(float(low.rstrip("+")) * 1.25)
+    return round((float(low) + float(high)) / 2)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def combination(
+    property_type: str, design_style: str, room_type: str, budget_range: str, area: float
+) -> Optional[Dict[str, str]]:
+    """
+    Normalised library combination for one preset room, or None when the
+    values are not library material (custom property/style/room types)
+    """
+    values = {
+        "property_type": property_type.strip().lower(),
+        "design_style": design_style.strip().lower(),
+        "room_type": room_type.strip().lower(),
+        "budget_range": " ".join(budget_range.split()),
+        "area_bucket": area_bucket(area),
+    }
+    if not values["budget_range"] or len(values["budget_range"]) > _MAX_BUDGET_LENGTH:
+        return None
+    if not is_preset_room(values["property_type"], values["design_style"], values["room_type"]):
+        return None
+    values["key"] = "|".join([
+        values["property_type"], values["design_style"], values["room_type"], values["budget_range"].casefold(),
+        values["area_bucket"],
+    ])
+    return values
+
+
+def entry_to_dict(entry: PresetLibraryEntry) -> Dict[str, Any]:
+    """Public representation of a library row"""
+    return {
+        "key": entry.combination_key,
+        "property_type": entry.property_type,
+        "design_style": entry.design_style,
+        "room_type": entry.room_type,
+        "budget_range": entry.budget_range,
+        "area_bucket": entry.area_bucket,
+        "request_count": entry.request_count or 0,
+        "last_requested_at": entry.last_requested_at,
+        "concept_id": entry.concept_id,
+        "generated_at": entry.generated_at,
+        "served_count": entry.served_count or 0,
+    }
+
+
+class PresetLibrary:
+    """
+    Request-frequency stats and precomputed concepts per preset room
+
+    Args:
+        warmup_size: Combinations generated per warm-up run
+        min_requests: Requests before a combination is worth precomputing
+        max_age_hours: Stored concepts older than this are regenerated by the warm-up
+        warmup_hour: UTC hour at which the scheduler enqueues the daily
+            warm-up (None disables the scheduler)
+    """
+
+    def __init__(self, warmup_size: int, min_requests: int, max_age_hours: float, warmup_hour: Optional[int]):
+        self.warmup_size = max(1, warmup_size)
+        self.min_requests = max(1, min_requests)
+        self.max_age_hours = max_age_hours
+        self.warmup_hour = warmup_hour
+        self._scheduler: Optional[asyncio.Task] = None
+        self._stats = {
+            "rooms_counted": 0, "rooms_served": 0, "warmups_enqueued": 0,
+            "concepts_generated": 0, "generation_failures": 0, "errors": 0,
+        }
+
+    # ---- Database operations (blocking, run in threads) ----
+
+    def _count_requests(self, db, combinations: Sequence[Dict[str, str]], now: datetime) -> None:
+        keys = {c["key"]: c for c in combinations}
+        existing = {
+            key for (key,) in db.query(PresetLibraryEntry.combination_key)
+            .filter(PresetLibraryEntry.combination_key.in_(keys)).all()
+        }
+        if existing:
+            db.query(PresetLibraryEntry).filter(PresetLibraryEntry.combination_key.in_(existing)).update({
+                PresetLibraryEntry.request_count: PresetLibraryEntry.request_count + 1,
+                PresetLibraryEntry.last_requested_at: now,
+            }, synchronize_session=False)
+        for key in keys.keys() - existing:
+            c = keys[key]
+            db.add(PresetLibraryEntry(
+                combination_key=key, property_type=c["property_type"], design_style=c["design_style"],
+                room_type=c["room_type"], budget_range=c["budget_range"], area_bucket=c["area_bucket"],
+                request_count=1, last_requested_at=now, served_count=0,
+            ))
+        db.commit()
+
+    def checkout_sync(self, combinations: Sequence[Dict[str, str]], serve: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Count one request for each combination and return the stored
+        concepts by combination key (only when ``serve``)
+        """
+        now = _utcnow()
+        db = SessionLocal()
+        try:
+            try:
+                self._count_requests(db, combinations, now)
+            except IntegrityError:
+                # Another process inserted one of the rows first; they all exist now
+                db.rollback()
+                self._count_requests(db, combinations, now)
+            self._stats["rooms_counted"] += len({c["key"] for c in combinations})
+            if not serve:
+                return {}
+
+            rows = db.query(PresetLibraryEntry, DesignConcept).join(
+                DesignConcept, DesignConcept.id == PresetLibraryEntry.concept_id
+            ).filter(PresetLibraryEntry.combination_key.in_([c["key"] for c in combinations])).all()
+            stored = {
+                entry.combination_key: {
+                    "concept_id": concept.id,
+                    "description": concept.description,
+                    "image_url": concept.image_url,
+                    "style": concept.style,
+                    "color_scheme": concept.color_scheme,
+                    "generated_at": entry.generated_at,
+                    "area_bucket": entry.area_bucket,
+                    "generated_area": bucket_area(entry.area_bucket, entry.property_type, entry.room_type),
+                }
+                for entry, concept in rows
+            }
+            if stored:
+                db.query(PresetLibraryEntry).filter(PresetLibraryEntry.combination_key.in_(stored)).update({
+                    PresetLibraryEntry.served_count: PresetLibraryEntry.served_count + 1,
+                }, synchronize_session=False)
+                db.commit()
+            return stored
+        finally:
+            db.close()
+
+    def candidates_sync(
+        self,
+        limit: int,
+        keys: Optional[Sequence[str]] = None,
+        force: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Combinations the warm-up should (re)generate: the given keys, or the
+        most-requested ones that have no concept yet or a stale one
+        """
+        db = SessionLocal()
+        try:
+            query = db.query(PresetLibraryEntry)
+            if keys:
+                query = query.filter(PresetLibraryEntry.combination_key.in_(list(keys)))
+            else:
+                # Rows counted before area buckets existed are never served again
+                query = query.filter(
+                    PresetLibraryEntry.request_count >= self.min_requests,
+                    PresetLibraryEntry.area_bucket.isnot(None),
+                )
+            if not force:
+                stale_before = _utcnow() - timedelta(hours=self.max_age_hours)
+                query = query.filter(or_(
+                    PresetLibraryEntry.concept_id.is_(None),
+                    PresetLibraryEntry.generated_at < stale_before,
+                ))
+            entries = query.order_by(PresetLibraryEntry.request_count.desc(), PresetLibraryEntry.id).limit(limit).all()
+            return [entry_to_dict(entry) for entry in entries]
+        finally:
+            db.close()
+
+    def store_sync(self, key: str, concept: Dict[str, Any]) -> int:
+        """Save a generated concept and make it the library entry of ``key``"""
+        db = SessionLocal()
+        try:
+            db_concept = DesignConcept(
+                project_id=None,
+                description=concept["description"],
+                image_url=concept.get("image_url"),
+                style=concept.get("style"),
+                color_scheme=concept.get("color_scheme"),
+            )
+            db.add(db_concept)
+            db.flush()
+            db.query(PresetLibraryEntry).filter(PresetLibraryEntry.combination_key == key).update({
+                PresetLibraryEntry.concept_id: db_concept.id,
+                PresetLibraryEntry.generated_at: _utcnow(),
+            }, synchronize_session=False)
+            db.commit()
+            return db_concept.id
+        finally:
+            db.close()
+
+    def top_sync(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most-requested combinations with their library state"""
+        db = SessionLocal()
+        try:
+            entries = db.query(PresetLibraryEntry).order_by(
+                PresetLibraryEntry.request_count.desc(), PresetLibraryEntry.id
+            ).limit(limit).all()
+            return [entry_to_dict(entry) for entry in entries]
+        finally:
+            db.close()
+
+    def _warmup_pending(self) -> bool:
+        db = SessionLocal()
+        try:
+            return db.query(DesignJob.id).filter(
+                DesignJob.kind == WARMUP_JOB, DesignJob.status.in_(["queued", "running"])
+            ).first() is not None
+        finally:
+            db.close()
+
+    def enqueue_warmup(
+        self,
+        limit: Optional[int] = None,
+        keys: Optional[Sequence[str]] = None,
+        force: bool = False,
+    ) -> DesignJob:
+        """Queue a warm-up job (see ``run_warmup`` for the payload)"""
+        job = design_job_queue.enqueue(WARMUP_JOB, {
+            "limit": limit or self.warmup_size,
+            "keys": list(keys) if keys else None,
+            "force": force,
+        })
+        self._stats["warmups_enqueued"] += 1
+        return job
+
+    # ---- Async API ----
+
+    async def checkout(self, combinations: Sequence[Dict[str, str]], serve: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Async ``checkout_sync``. Never raises: on database errors the rooms
+        are simply generated as usual.
+        """
+        if not combinations:
+            return {}
+        try:
+            stored = await asyncio.to_thread(self.checkout_sync, combinations, serve)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Preset library checkout failed: {e!r}")
+            return {}
+        self._stats["rooms_served"] += len(stored)
+        return stored
+
+    async def run_warmup(self, payload: Dict[str, Any], report_progress: Callable) -> Dict[str, Any]:
+        """
+        Job handler: generate and store concepts for the selected combinations
+
+        Payload:
+            limit: Maximum combinations to generate
+            keys: Explicit combination keys (e.g. a background refresh)
+            force: Regenerate even fresh entries, bypassing the AI response cache
+
+        Combinations are generated one at a time at an area representative of
+        their bucket (see ``bucket_area``), so a warm-up never competes with live traffic for the provider
+        rate limits. Fallback output (provider down) is not stored.
+        """
+        from services.design_service import design_service
+
+        force = bool(payload.get("force"))
+        candidates = await asyncio.to_thread(
+            self.candidates_sync, int(payload.get("limit") or self.warmup_size), payload.get("keys"), force
+        )
+        generated, failed = [], []
+        for index, entry in enumerate(candidates):
+            client_preferences, project_details = build_room_prompts(
+                entry["property_type"], entry["design_style"], entry["room_type"],
+                bucket_area(entry["area_bucket"], entry["property_type"], entry["room_type"]), entry["budget_range"],
+            )
+            with deadline.deadline_scope(settings.design_generate_deadline_seconds):
+                concept = await design_service.generate_design_concept(
+                    client_preferences, project_details, use_cache=not force
+                )
+            if concept and design_service.is_reusable(concept):
+                concept_id = await asyncio.to_thread(self.store_sync, entry["key"], concept)
+                generated.append({"key": entry["key"], "concept_id": concept_id})
+                self._stats["concepts_generated"] += 1
+            else:
+                failed.append(entry["key"])
+                self._stats["generation_failures"] += 1
+            report_progress((index + 1) * 100 // len(candidates), entry["key"])
+        return {"candidates": len(candidates), "generated": generated, "failed": failed}
+
+    # ---- Off-peak scheduler ----
+
+    def next_warmup_at(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Next time the scheduler enqueues a warm-up (UTC)"""
+        if self.warmup_hour is None:
+            return None
+        now = now or _utcnow()
+        run_at = now.replace(hour=self.warmup_hour % 24, minute=0, second=0, microsecond=0)
+        return run_at if run_at > now else run_at + timedelta(days=1)
+
+    async def _schedule(self) -> None:
+        while True:
+            run_at = self.next_warmup_at()
+            await asyncio.sleep((run_at - _utcnow()).total_seconds())
+            try:
+                # Several app processes share the jobs table; one pending warm-up is enough
+                if not await asyncio.to_thread(self._warmup_pending):
+                    await asyncio.to_thread(self.enqueue_warmup)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"Could not enqueue the preset library warm-up: {e!r}")
+
+    async def start(self) -> None:
+        """Start the daily warm-up scheduler (called from the app lifespan)"""
+        if self._scheduler or not settings.preset_library_enabled or self.warmup_hour is None:
+            return
+        self._scheduler = asyncio.create_task(self._schedule())
+
+    async def stop(self) -> None:
+        if self._scheduler:
+            self._scheduler.cancel()
+            await asyncio.gather(self._scheduler, return_exceptions=True)
+            self._scheduler = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            combinations = db.query(PresetLibraryEntry).count()
+            precomputed = db.query(PresetLibraryEntry).filter(PresetLibraryEntry.concept_id.isnot(None)).count()
+        finally:
+            db.close()
+        next_warmup = self.next_warmup_at() if self._scheduler else None
+        return {
+            "enabled": settings.preset_library_enabled,
+            "combinations": combinations,
+            "precomputed": precomputed,
+            "next_warmup_at": next_warmup.isoformat() if next_warmup else None,
+            **self._stats,
+        }
+
+
+# Global library instance
+preset_library = PresetLibrary(
+    warmup_size=settings.preset_library_warmup_size,
+    min_requests=settings.preset_library_min_requests,
+    max_age_hours=settings.preset_library_max_age_hours,
+    warmup_hour=settings.preset_library_warmup_hour,
+)
@@ -11,9 +11,29 @@ from reportlab.lib.units import inch
 class ReportService:
     """Service to generate PDF reports for projects"""
 
-    def generate_master_report(self, project: Any, design: Optional[Any], estimation: Optional[Any]) -> bytes:
+    # Stored renders are embedded as a small JPEG derivative instead of the full image
+    preview_width = 512
+
+    async def preview_path(self, image_url: Optional[str]):
+        """Path of a JPEG preview for a render in the blob store, or None (rendered in the process pool)"""
+        from ai_modules.blob_store import blob_store
+        from ai_modules.image_derivatives import derivative_generator
+
+        digest = blob_store.digest_from_url(image_url)
+        if not digest or not blob_store.exists(digest):
+            return None
+        try:
+            return await derivative_generator.ensure(blob_store.path_for(digest), digest, self.preview_width, "jpeg")
+        except Exception as e:
+            print(f"Could not build report preview for {digest}: {e}")
+            return None
+
+    def generate_master_report(
+        self, project: Any, design: Optional[Any], estimation: Optional[Any], preview: Optional[Any] = None
+    ) -> bytes:
         """
         Generate a comprehensive PDF report combining Project, Design, and Estimation data.
+        ``preview`` is the local path of the design render (see ``preview_path``).
         Returns PDF bytes.
         """
         buffer = io.BytesIO()
@@ -83,7 +103,9 @@ class ReportService:
             # If image_url is remote, we might simulate it. 
             # For this MVP, if it's external, we might skip it or try validation.
             # Assuming image_url might be a placeholder or local asset for now.
-            if design.image_url and design.image_url.startswith('http'):
+            if preview:
+                elements.append(Image(str(preview), width=5 * inch, height=5 * inch, kind='proportional'))
+            elif design.image_url and design.image_url.startswith('http'):
                  elements.append(Paragraph(f"[Image Render available at: {design.image_url}]", normal_style))
             
             elements.append(Spacer(1, 10))
@@ -0,0 +1,75 @@
+"""
+Single-flight coalescing of identical in-flight requests
+
+When the same request arrives while an identical one is still running
+(double clicks, frontend retries), followers await the leader's result
+instead of starting their own expensive AI generation.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+def _normalize(value: Any) -> Any:
+    """Collapse whitespace and case in strings so trivially different payloads match"""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().casefold()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def request_key(kind: str, payload: Dict[str, Any]) -> str:
+    """Build a coalescing key from a request kind and its (pydantic-dumped) payload"""
+    canonical = json.dumps({"kind": kind, "payload": _normalize(payload)}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers share its result
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "failures": 0}
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieve the exception so it is not reported as unhandled
+            self._stats["failures"] += 1
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``func`` unless an identical call is in flight, then await its result
+
+        The shared call is shielded, so a caller that disconnects does not
+        cancel the work other callers are waiting on.
+        """
+        self._stats["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._in_flight), **self._stats}
+
+
+# Global instance shared by the design endpoints
+design_single_flight = SingleFlight("design")
@@ -0,0 +1,115 @@
+import hashlib
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_modules.blob_store import BlobStore
+from ai_modules.image_derivatives import DerivativeGenerator
+from api.routes import media
+
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(tmp_path / "media", "/api/v1/media")
+
+
+@pytest.fixture
+def derivatives(store):
+    generator = DerivativeGenerator(store.root / "derivatives", max_workers=1)
+    yield generator
+    generator.shutdown()
+
+
+@pytest.fixture
+def client(store, derivatives, monkeypatch):
+    monkeypatch.setattr(media, "blob_store", store)
+    monkeypatch.setattr(media, "derivative_generator", derivatives)
+    app = FastAPI()
+    app.include_router(media.router, prefix="/api/v1/media")
+    return TestClient(app)
+
+
+def test_put_is_content_addressed_and_deduplicated(store):
+    digest = store.put(JPEG)
+
+    assert digest == hashlib.sha256(JPEG).hexdigest()
+    assert store.put(JPEG) == digest
+    assert store.path_for(digest).read_bytes() == JPEG
+    assert store.get_stats()["writes"] == 1
+    assert store.get_stats()["deduplicated"] == 1
+    assert not [p for p in store.path_for(digest).parent.iterdir() if p.name.startswith(".tmp-")]
+
+
+def test_rejects_malformed_keys(store):
+    assert store.path_for("../../etc/passwd") is None
+    assert store.digest_from_url("https://example.com/a.png") is None
+    digest = store.put(JPEG)
+    assert store.digest_from_url(store.url_for(digest)) == digest
+
+
+def test_media_served_with_immutable_caching(store, client):
+    digest = store.put(JPEG)
+
+    response = client.get(f"/api/v1/media/{digest}")
+    assert response.status_code == 200
+    assert response.content == JPEG
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["etag"] == f'"{digest}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    revalidated = client.get(f"/api/v1/media/{digest}", headers={"If-None-Match": f'"{digest}"'})
+    assert revalidated.status_code == 304
+
+
+def test_media_range_requests(store, client):
+    digest = store.put(JPEG)
+    size = len(JPEG)
+
+    partial = client.get(f"/api/v1/media/{digest}", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == JPEG[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{size}"
+
+    suffix = client.get(f"/api/v1/media/{digest}", headers={"Range": "bytes=-4"})
+    assert suffix.content == JPEG[-4:]
+
+    unsatisfiable = client.get(f"/api/v1/media/{digest}", headers={"Range": f"bytes={size}-"})
+    assert unsatisfiable.status_code == 416
+
+
+def test_unknown_media_is_404(client):
+    assert client.get("/api/v1/media/" + "0" * 64).status_code == 404
+    assert client.get("/api/v1/media/not-a-digest").status_code == 404
+
+
+def _png(width, height):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 160, 60)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_media_derivatives_rendered_on_first_request(store, derivatives, client):
+    from PIL import Image
+
+    digest = store.put(_png(1024, 768))
+    width = derivatives.widths[0]
+
+    response = client.get(f"/api/v1/media/{digest}?size={width}&format=jpeg")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["etag"] == f'"{digest}-{width}.jpeg"'
+    assert Image.open(io.BytesIO(response.content)).size == (width, width * 768 // 1024)
+
+    again = client.get(f"/api/v1/media/{digest}?size={width}&format=jpeg")
+    assert again.content == response.content
+    stats = derivatives.get_stats()
+    assert stats["generated"] == 1 and stats["served_existing"] == 1
+
+    assert client.get(f"/api/v1/media/{digest}?size=123").status_code == 400
+    assert client.get(f"/api/v1/media/{digest}?size={width}&format=gif").status_code == 400
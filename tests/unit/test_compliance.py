@@ -57,3 +57,76 @@ def test_compliance_fail_logic(mock_rag_engine):
     assert result["is_compliant"] is False
     # assert result["score"] < 100 # RAG might not return score in failure mock
     assert "Too tall" in result["issues"]
+
+def test_requests_wait_for_background_warmup(monkeypatch):
+    """Checks arriving during the warm-up wait for it, up to the ready timeout"""
+    import threading
+    from config.settings import settings
+
+    release = threading.Event()
+
+    class SlowEngine:
+        db = object()
+
+        def __init__(self, docs_path):
+            release.wait(5)
+
+        def check_compliance(self, description):
+            return {"is_compliant": True}
+
+        def get_cache_stats(self):
+            return {}
+
+    monkeypatch.setattr('services.compliance_service.RAGEngine', SlowEngine)
+    monkeypatch.setattr(settings, "rag_ready_timeout_seconds", 0.05)
+    service = ComplianceService()
+    service.start_warmup()
+
+    result = service.check_design_compliance({"project_details": "Villa"})
+    assert result == {"status": "skipped", "reason": "Regulations index is still loading"}
+
+    release.set()
+    service._warmup_thread.join(5)
+    assert service.is_ready
+    assert service.check_design_compliance({"project_details": "Villa"}) == {"is_compliant": True}
+    assert service.get_stats()["wait_timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_check_runs_off_loop_with_timeout(mock_rag_engine):
+    """The async API reports through the executor and gives up after the timeout"""
+    import threading
+    from ai_modules import deadline
+
+    service = ComplianceService()
+    seen = {}
+
+    def check(description):
+        seen["thread"] = threading.current_thread().name
+        seen["remaining"] = deadline.remaining()
+        return {"is_compliant": True}
+
+    mock_rag_engine.check_compliance.side_effect = check
+    with deadline.deadline_scope(10):
+        assert await service.check({"project_details": "Villa"}) == {"is_compliant": True}
+    assert seen["thread"].startswith("compliance")
+    assert 0 < seen["remaining"] <= 10
+
+    release = threading.Event()
+    mock_rag_engine.check_compliance.side_effect = lambda description: release.wait(5)
+    result = await service.check({"project_details": "Villa"}, timeout=0.05)
+    release.set()
+    assert result == {"status": "skipped", "reason": "Compliance check timed out"}
+    assert service.get_stats()["abandoned"] == 1
+
+
+def test_engine_without_an_index_counts_as_failed(mock_rag_engine):
+    """RAGEngine swallows its load errors; a missing index must not look ready"""
+    mock_rag_engine.db = None
+    service = ComplianceService()
+
+    result = service.check_design_compliance({"project_details": "Villa"})
+    assert result == {"status": "skipped", "reason": "Regulations index unavailable"}
+    assert service._rag_engine is None
+    assert service.get_stats()["state"] == "failed"
+    mock_rag_engine.check_compliance.assert_not_called()
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import pytest
+
+from ai_modules import deadline
+from ai_modules.resilience import ProviderResilience
+from services.pipeline import Stage, StageGraph
+
+
+def test_scope_keeps_the_tighter_deadline():
+    assert deadline.remaining() is None
+    with deadline.deadline_scope(10):
+        with deadline.deadline_scope(60):
+            assert deadline.remaining() <= 10
+        with deadline.deadline_scope(1):
+            assert deadline.remaining() <= 1
+        assert deadline.timeout_for(30) <= 10
+    assert deadline.remaining() is None
+
+
+def test_budget_from_header():
+    assert deadline.budget_from_header("15", default=120, maximum=600) == 15
+    assert deadline.budget_from_header("1m30s", default=120, maximum=600) == 90
+    assert deadline.budget_from_header("soon", default=120, maximum=600) == 120
+    assert deadline.budget_from_header(None, default=120, maximum=600) == 120
+    assert deadline.budget_from_header("3600", default=120, maximum=600) == 600
+
+
+@pytest.mark.asyncio
+async def test_run_within_raises_when_budget_runs_out():
+    with deadline.deadline_scope(0.05):
+        with pytest.raises(deadline.DeadlineExceeded):
+            await deadline.run_within(asyncio.sleep(5))
+        with pytest.raises(deadline.DeadlineExceeded):
+            await deadline.run_within(asyncio.sleep(0))
+
+
+@pytest.mark.asyncio
+async def test_retry_skipped_when_backoff_outlasts_deadline():
+    provider = ProviderResilience(
+        "test", rate_per_second=0, burst=1, max_attempts=3, base_delay=10.0, max_delay=10.0,
+        failure_threshold=10, recovery_timeout=60.0,
+    )
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("503")
+
+    started = time.monotonic()
+    with deadline.deadline_scope(0.5):
+        with pytest.raises(RuntimeError):
+            await provider.execute(failing, classify=lambda e: (True, 10.0))
+    assert calls == 1
+    assert time.monotonic() - started < 0.5
+    assert provider.get_stats()["deadline_exceeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stages_fall_back_at_deadline():
+    async def slow(results):
+        await asyncio.sleep(5)
+        return "slow"
+
+    async def required(results):
+        return "saved"
+
+    graph = StageGraph("deadline-test", [
+        Stage("slow", slow, timeout=30, fallback=lambda e: "fallback"),
+        Stage("after", slow, depends_on=["slow"], timeout=30, fallback=lambda e: "fallback"),
+        Stage("persist", required, depends_on=["after"]),
+    ])
+    started = time.monotonic()
+    with deadline.deadline_scope(0.1):
+        run = await graph.run()
+
+    assert time.monotonic() - started < 1
+    assert run["results"] == {"slow": "fallback", "after": "fallback", "persist": "saved"}
+    assert run["timings"]["slow"]["status"] == "deadline"
+    assert run["timings"]["after"]["status"] == "deadline"
+    assert run["timings"]["persist"]["status"] == "ok"
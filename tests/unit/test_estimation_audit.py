@@ -0,0 +1,144 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database.models import Client, DesignConcept, Estimation, EstimationAudit, Project, User
+from api.routes import estimation as estimation_routes
+from services.estimation_service import AUDIT_FALLBACK_INSIGHT, estimation_service
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/audits.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[
+        User.__table__, Client.__table__, Project.__table__, DesignConcept.__table__,
+        Estimation.__table__, EstimationAudit.__table__,
+    ])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def audits(monkeypatch):
+    calls = []
+
+    async def fake_audit(project, estimation_result):
+        calls.append(estimation_result["total_cost"])
+        return {"original_total": estimation_result["total_cost"], "buffer_percent": 10,
+                "risk_factors": ["Marble lead times"], "expert_insight": f"Audit #{len(calls)}"}
+
+    monkeypatch.setattr(estimation_service, "audit_estimation", fake_audit)
+    return calls
+
+
+def _stored(db, project):
+    return db.query(EstimationAudit).filter(EstimationAudit.project_id == project.id).first()
+
+
+def _project_with_estimation(db):
+    project = Project(title="Villa", property_type="villa", area=400, location="Dubai Hills")
+    db.add(project)
+    db.commit()
+    estimation = Estimation(project_id=project.id, total_cost=1_000_000, materials_cost=600_000,
+                            labor_cost=300_000, furniture_cost=100_000)
+    db.add(estimation)
+    db.commit()
+    return project, estimation
+
+
+@pytest.mark.asyncio
+async def test_audit_is_reused_until_inputs_change(db, audits):
+    project, estimation = _project_with_estimation(db)
+
+    first = await estimation_routes._run_audit(db, project, estimation, _stored(db, project))
+    second = await estimation_routes._run_audit(db, project, estimation, _stored(db, project))
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["expert_insight"] == first["expert_insight"] == "Audit #1"
+
+    forced = await estimation_routes._run_audit(db, project, estimation, _stored(db, project), force=True)
+    assert forced["expert_insight"] == "Audit #2"
+
+    project.area = 450
+    db.commit()
+    changed = await estimation_routes._run_audit(db, project, estimation, _stored(db, project))
+    assert (changed["cached"], changed["expert_insight"]) == (False, "Audit #3")
+    assert db.query(EstimationAudit).count() == 1
+
+
+@pytest.mark.asyncio
+async def test_fallback_audit_is_not_stored(db, monkeypatch):
+    project, estimation = _project_with_estimation(db)
+
+    async def unreachable(project, estimation_result):
+        return {"original_total": estimation_result["total_cost"], "expert_insight": AUDIT_FALLBACK_INSIGHT}
+
+    monkeypatch.setattr(estimation_service, "audit_estimation", unreachable)
+    result = await estimation_routes._run_audit(db, project, estimation, _stored(db, project))
+
+    assert result["cached"] is False
+    assert db.query(EstimationAudit).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_calculate_estimation_invalidates_stored_audit(db, audits):
+    project, estimation = _project_with_estimation(db)
+    await estimation_routes._run_audit(db, project, estimation, _stored(db, project))
+
+    await estimation_routes.calculate_estimation(project.id, db=db)
+
+    assert db.query(EstimationAudit).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_audit_streams_ndjson_under_a_concurrency_limit(db, monkeypatch):
+    import asyncio
+    import json
+
+    from fastapi import FastAPI
+    import httpx
+
+    running, peak = 0, 0
+
+    async def slow_audit(project, estimation_result):
+        nonlocal running, peak
+        if project.title == "Broken":
+            raise RuntimeError("AI service down")
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return {"original_total": estimation_result["total_cost"], "adjusted_total": estimation_result["total_cost"] * 1.1,
+                "expert_insight": "ok"}
+
+    monkeypatch.setattr(estimation_service, "audit_estimation", slow_audit)
+    monkeypatch.setattr(estimation_routes, "SessionLocal", lambda **kwargs: db)
+    monkeypatch.setattr(estimation_routes.settings, "estimation_audit_batch_concurrency", 2)
+    monkeypatch.setattr(db, "close", lambda: None)
+
+    audited = [_project_with_estimation(db)[0] for _ in range(4)]
+    broken = _project_with_estimation(db)[0]
+    broken.title = "Broken"
+    no_estimate = Project(title="Empty", property_type="villa", area=100)
+    db.add(no_estimate)
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(estimation_routes.router, prefix="/estimation")
+    ids = [p.id for p in audited] + [broken.id, no_estimate.id, 999]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        response = await client.post("/estimation/audit/batch", json={"project_ids": ids})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["project_id"]: line for line in lines if "project_id" in line}
+    assert {pid for pid, line in results.items() if line["status"] == "ok"} == {p.id for p in audited}
+    assert results[999]["error"] == "Project not found"
+    assert results[no_estimate.id]["status"] == "error"
+    # A failed audit is reported against its project
+    assert (results[broken.id]["title"], results[broken.id]["error"]) == ("Broken", "AI service down")
+    assert lines[-1]["summary"]["audited"] == 4
+    assert lines[-1]["summary"]["errors"] == 3
+    assert lines[-1]["summary"]["adjusted_total"] == pytest.approx(4_400_000)
+    assert peak == 2
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database.models import DesignJob
+from services import job_queue as job_queue_module
+from services.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/jobs.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[DesignJob.__table__])
+    monkeypatch.setattr(job_queue_module, "SessionLocal", sessionmaker(bind=engine))
+    return JobQueue(workers=2, poll_interval=0.05, lease_seconds=60, max_attempts=2)
+
+
+async def _wait_for(queue, job_id, statuses=("succeeded", "failed"), timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_with_progress_and_result(queue):
+    running, peak = 0, 0
+
+    async def handler(payload, report_progress):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        report_progress(50, "half")
+        await asyncio.sleep(0.05)
+        running -= 1
+        return {"echo": payload["value"]}
+
+    queue.register("echo", handler)
+    await queue.start()
+    try:
+        ids = [queue.enqueue("echo", {"value": i}).id for i in range(4)]
+        jobs = [await _wait_for(queue, job_id) for job_id in ids]
+    finally:
+        await queue.stop()
+
+    assert [job["status"] for job in jobs] == ["succeeded"] * 4
+    assert [job["result"] for job in jobs] == [{"echo": i} for i in range(4)]
+    assert all(job["progress"] == 100 and job["attempts"] == 1 for job in jobs)
+    assert peak <= 2
+
+
+@pytest.mark.asyncio
+async def test_failed_handler_marks_job_failed(queue):
+    async def handler(payload, report_progress):
+        raise RuntimeError("provider down")
+
+    queue.register("broken", handler)
+    await queue.start()
+    try:
+        job = await _wait_for(queue, queue.enqueue("broken", {}).id)
+    finally:
+        await queue.stop()
+
+    assert job["status"] == "failed"
+    assert job["error"] == "provider down"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_from_a_thread_wakes_an_idle_worker(queue):
+    async def handler(payload, report_progress):
+        return {"ok": True}
+
+    queue.register("echo", handler)
+    queue.poll_interval = 30
+    await queue.start()
+    try:
+        await asyncio.sleep(0.05)  # the workers are now idle until woken
+        job = await asyncio.to_thread(queue.enqueue, "echo", {})
+        job = await _wait_for(queue, job.id, timeout=2.0)
+    finally:
+        await queue.stop()
+
+    assert job["status"] == "succeeded"
+
+
+def test_enqueue_rejects_unknown_kind(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("missing", {})
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed_until_max_attempts(queue):
+    async def handler(payload, report_progress):
+        return {"ok": True}
+
+    queue.register("echo", handler)
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db = job_queue_module.SessionLocal()
+    try:
+        orphan = DesignJob(kind="echo", status="running", payload=json.dumps({}), attempts=1, lease_expires_at=expired)
+        exhausted = DesignJob(kind="echo", status="running", payload=json.dumps({}), attempts=2, lease_expires_at=expired)
+        db.add_all([orphan, exhausted])
+        db.commit()
+        orphan_id, exhausted_id = orphan.id, exhausted.id
+    finally:
+        db.close()
+
+    await queue.start()
+    try:
+        recovered = await _wait_for(queue, orphan_id)
+        given_up = await _wait_for(queue, exhausted_id)
+    finally:
+        await queue.stop()
+
+    assert recovered["status"] == "succeeded" and recovered["attempts"] == 2
+    assert given_up["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_lease_and_throttles_progress_writes(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/heartbeat.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[DesignJob.__table__])
+    monkeypatch.setattr(job_queue_module, "SessionLocal", sessionmaker(bind=engine))
+    # Two workers: the idle one would reclaim the job if its lease lapsed
+    queue = JobQueue(workers=2, poll_interval=0.02, lease_seconds=0.3, max_attempts=3, progress_interval=0.1)
+
+    writes = []
+    original = queue._heartbeat_update
+    monkeypatch.setattr(queue, "_heartbeat_update", lambda job_id, **fields: (writes.append(fields), original(job_id, **fields)))
+    runs = 0
+
+    async def handler(payload, report_progress):
+        nonlocal runs
+        runs += 1
+        for percent in range(50):
+            report_progress(percent, "busy")
+        # A long stage that reports nothing
+        await asyncio.sleep(0.8)
+        return {"ok": True}
+
+    queue.register("slow", handler)
+    await queue.start()
+    try:
+        job = await _wait_for(queue, queue.enqueue("slow", {}).id)
+    finally:
+        await queue.stop()
+
+    assert (job["status"], job["attempts"], runs) == ("succeeded", 1, 1)
+    progress_writes = [w for w in writes if "progress" in w]
+    assert len(progress_writes) <= 2 and progress_writes[-1]["progress"] == 49
+    assert len(writes) >= 3  # Lease renewals while the stage ran
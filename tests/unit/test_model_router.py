@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from ai_modules.model_router import Candidate, ModelRouter
+
+
+def _router(**overrides):
+    options = dict(window=20, min_samples=2, max_error_rate=0.5, hedging=False, hedge_min_delay=0.0)
+    options.update(overrides)
+    return ModelRouter(**options)
+
+
+def _route(provider, model, delay, result="ok", log=None):
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"{provider}:cancelled")
+            raise
+        return result
+
+    return Candidate(provider, model, call)
+
+
+def _warm(router, key, seconds, ok=True, count=3):
+    for _ in range(count):
+        router.stats_for(key).record(seconds, ok)
+
+
+@pytest.mark.asyncio
+async def test_configured_order_until_enough_samples():
+    router = _router()
+    fast, slow = _route("b", "fast", 0), _route("a", "slow", 0)
+
+    result, key = await router.run("text", [slow, fast])
+
+    assert (result, key) == ("ok", "a:slow")
+
+
+@pytest.mark.asyncio
+async def test_ranks_by_p50_and_skips_unhealthy_routes():
+    router = _router()
+    slow, fast, broken = _route("a", "slow", 0), _route("b", "fast", 0), _route("c", "broken", 0)
+    _warm(router, slow.key, 2.0)
+    _warm(router, fast.key, 0.5)
+    _warm(router, broken.key, 0.1, ok=False)
+
+    assert [c.key for c in router.rank([slow, broken, fast])] == ["b:fast", "a:slow", "c:broken"]
+
+
+@pytest.mark.asyncio
+async def test_failed_route_falls_through_to_next():
+    router = _router()
+    failing = _route("a", "down", 0, result=None)
+    backup = _route("b", "up", 0)
+
+    result, key = await router.run("text", [failing, backup])
+
+    assert (result, key) == ("ok", "b:up")
+    assert router.stats_for("a:down").error_rate == 1.0
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_and_cancels_slow_primary():
+    log = []
+    router = _router(hedging=True)
+    primary = _route("a", "primary", 1.0, result="slow", log=log)
+    secondary = _route("b", "secondary", 0.01, result="fast", log=log)
+    _warm(router, primary.key, 0.05)
+    _warm(router, secondary.key, 0.5)
+
+    result, key = await router.run("image", [primary, secondary])
+    await asyncio.sleep(0)
+
+    assert (result, key) == ("fast", "b:secondary")
+    assert log == ["a:cancelled"]
+    stats = router.get_stats()["routes"]
+    assert stats["b:secondary"]["hedges_started"] == 1
+    assert stats["a:primary"]["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pinned_request_keeps_the_requested_route_primary():
+    router = _router()
+    requested, other = _route("a", "pro", 0), _route("b", "standard", 0)
+    _warm(router, requested.key, 2.0)
+    _warm(router, other.key, 0.5)
+
+    result, key = await router.run("image_pro", [requested, other], pinned=True)
+    assert key == "a:pro"
+
+    # The other route only serves the request when the requested one fails
+    failing = _route("a", "pro", 0, result=None)
+    result, key = await router.run("image_pro", [failing, other], pinned=True)
+    assert key == "b:standard"
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from services.pipeline import Stage, StageGraph
+
+
+async def _sleep_value(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently():
+    """Stages without dependencies between them overlap in time"""
+    graph = StageGraph("test", [
+        Stage("a", lambda r: _sleep_value("a", 0.2)),
+        Stage("b", lambda r: _sleep_value("b", 0.2)),
+        Stage("c", lambda r: _sleep_value(r["a"] + r["b"], 0.0), depends_on=["a", "b"]),
+    ])
+
+    started = time.perf_counter()
+    run = await graph.run()
+    elapsed = time.perf_counter() - started
+
+    assert run["results"]["c"] == "ab"
+    assert elapsed < 0.35
+    assert run["critical_path"][-1] == "c"
+
+
+@pytest.mark.asyncio
+async def test_timeout_uses_fallback():
+    graph = StageGraph("test", [
+        Stage("slow", lambda r: _sleep_value("late", 1.0), timeout=0.05, fallback=lambda e: "fallback"),
+    ])
+
+    run = await graph.run()
+
+    assert run["results"]["slow"] == "fallback"
+    assert run["timings"]["slow"]["status"] == "timeout"
+    assert run["timings"]["slow"]["fallback"] is True
+
+
+@pytest.mark.asyncio
+async def test_required_stage_failure_raises():
+    async def boom(results):
+        raise RuntimeError("boom")
+
+    graph = StageGraph("test", [Stage("required", boom)])
+
+    with pytest.raises(RuntimeError):
+        await graph.run()
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        StageGraph("test", [
+            Stage("a", lambda r: _sleep_value(1, 0), depends_on=["b"]),
+            Stage("b", lambda r: _sleep_value(1, 0), depends_on=["a"]),
+        ])
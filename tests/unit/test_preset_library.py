@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database.models import DesignConcept, DesignJob, PresetLibraryEntry
+from services import preset_library as preset_library_module
+from services.design_service import design_service
+from services.preset_library import PresetLibrary, combination
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/library.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[
+        DesignConcept.__table__, DesignJob.__table__, PresetLibraryEntry.__table__
+    ])
+    monkeypatch.setattr(preset_library_module, "SessionLocal", sessionmaker(bind=engine))
+    return PresetLibrary(warmup_size=10, min_requests=2, max_age_hours=24, warmup_hour=None)
+
+
+def test_combination_only_for_preset_rooms():
+    room = combination(" Villa ", "modern_luxury", "Living_Room", "500k  -  1M AED", 48)
+    assert room["key"] == "villa|modern_luxury|living_room|500k - 1m aed|35-60"
+    assert room["budget_range"] == "500k - 1M AED"
+    assert combination("villa", "modern_luxury", "wine_cellar", "Premium", 20) is None
+    assert combination("castle", "modern_luxury", "living_room", "Premium", 20) is None
+    assert combination("villa", "modern_luxury", "living_room", "", 20) is None
+
+
+@pytest.mark.asyncio
+async def test_warmup_precomputes_most_requested_rooms(library, monkeypatch):
+    living = combination("villa", "modern_luxury", "living_room", "Premium", 50)
+    kitchen = combination("villa", "modern_luxury", "kitchen", "Premium", 20)
+    for _ in range(3):
+        assert await library.checkout([living]) == {}
+    await library.checkout([kitchen])
+
+    prompts = []
+
+    async def fake_concept(client_preferences, project_details, model_type="standard", use_cache=True):
+        prompts.append(project_details)
+        return {
+            "description": f"Concept: {client_preferences}",
+            "image_url": "/api/v1/media/abc.jpg",
+            "style": "Modern",
+            "color_scheme": "Gold",
+        }
+
+    monkeypatch.setattr(design_service, "generate_design_concept", fake_concept)
+    progress = []
+    result = await library.run_warmup({}, lambda percent, stage: progress.append((percent, stage)))
+
+    # The kitchen was requested once, below min_requests
+    assert [g["key"] for g in result["generated"]] == [living["key"]]
+    assert prompts == ["living_room - 50 sqm, Premium budget"]
+    assert progress == [(100, living["key"])]
+
+    stored = await library.checkout([living, kitchen])
+    assert list(stored) == [living["key"]]
+    assert stored[living["key"]]["description"] == "Concept: modern_luxury style for living_room in villa"
+
+    top = library.top_sync()
+    assert [(e["room_type"], e["request_count"], e["served_count"]) for e in top] == [
+        ("living_room", 4, 1), ("kitchen", 2, 0)
+    ]
+    # Fresh entries are skipped by the next warm-up unless forced
+    assert library.candidates_sync(10) == [e for e in top if e["room_type"] == "kitchen"]
+    assert len(library.candidates_sync(10, force=True)) == 2
+
+
+@pytest.mark.asyncio
+async def test_fallback_output_is_not_stored(library, monkeypatch):
+    living = combination("apartment", "minimalist", "living_room", "Standard", 30)
+    await library.checkout([living])
+
+    async def fallback_concept(client_preferences, project_details, model_type="standard", use_cache=True):
+        return {"description": "text", "image_url": "https://placehold.co/1024x768/png", "style": "", "color_scheme": ""}
+
+    monkeypatch.setattr(design_service, "generate_design_concept", fallback_concept)
+    result = await library.run_warmup({"keys": [living["key"]]}, lambda percent, stage: None)
+
+    assert result["failed"] == [living["key"]]
+    assert await library.checkout([living]) == {}
+
+
+def test_area_buckets_separate_small_and_large_rooms():
+    small = combination("villa", "modern_luxury", "bathroom", "Premium", 12)
+    large = combination("villa", "modern_luxury", "bathroom", "Premium", 60)
+    assert small["key"] != large["key"]
+    assert (small["area_bucket"], large["area_bucket"]) == ("10-20", "60-100")
+    assert combination("villa", "modern_luxury", "bathroom", "Premium", 18)["key"] == small["key"]
+
+    # Concepts are generated at the typical area, or the bucket midpoint
+    typical = preset_library_module.typical_room_area("villa", "bathroom")
+    assert preset_library_module.bucket_area(preset_library_module.area_bucket(typical), "villa", "bathroom") == typical
+    assert preset_library_module.bucket_area("60-100", "villa", "bathroom") == 80
+
+
+@pytest.mark.asyncio
+async def test_warmup_job_writes_progress_and_stage(library, monkeypatch):
+    from services import job_queue as job_queue_module
+    from services.job_queue import JobQueue
+
+    monkeypatch.setattr(job_queue_module, "SessionLocal", preset_library_module.SessionLocal)
+    queue = JobQueue(workers=1, poll_interval=0.02, lease_seconds=60, max_attempts=1, progress_interval=0)
+    queue.register(preset_library_module.WARMUP_JOB, library.run_warmup)
+
+    living = combination("villa", "modern_luxury", "living_room", "Premium", 50)
+    kitchen = combination("villa", "modern_luxury", "kitchen", "Premium", 20)
+    await library.checkout([living])
+    await library.checkout([living])
+    await library.checkout([kitchen])
+    await library.checkout([kitchen])
+
+    seen = []
+
+    async def fake_concept(client_preferences, project_details, model_type="standard", use_cache=True):
+        if seen:
+            # The first room's progress is written while the second is still generating
+            await asyncio.sleep(0.2)
+            seen.append(queue.get(job_id))
+        else:
+            seen.append(None)
+        return {"description": "text", "image_url": "/api/v1/media/abc.jpg", "style": "", "color_scheme": ""}
+
+    monkeypatch.setattr(design_service, "generate_design_concept", fake_concept)
+    job_id = queue.enqueue(preset_library_module.WARMUP_JOB, {}).id
+    await queue.start()
+    try:
+        for _ in range(100):
+            job = queue.get(job_id)
+            if job["status"] == "succeeded":
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await queue.stop()
+
+    assert (seen[1]["progress"], seen[1]["stage"]) == (50, living["key"])
+    assert (job["status"], job["progress"], job["stage"]) == ("succeeded", 100, kitchen["key"])
@@ -0,0 +1,88 @@
+from ai_modules.prompt_compactor import (
+    PromptCompactor,
+    compact_description,
+    estimate_tokens,
+    extract_palette,
+    extract_visual_details,
+    token_budget_for,
+)
+from ai_modules.prompts import get_image_generation_prompt
+
+SECTION = """1. DESIGN STYLE: Contemporary Arabesque luxury with clean modern lines and geometric motifs.
+
+2. COLOR PALETTE:
+- Ivory White (#FFFFF0) for walls, chosen for brightness.
+- Champagne Gold: #d4af37 accents on fixtures.
+
+3. MAIN DESIGN ELEMENTS:
+### Flooring
+Calacatta marble flooring with book-matched veins in the living area.
+### Lighting Strategy
+A sculptural brass chandelier over the dining table and cove lighting in the ceiling.
+### Furniture
+A low-profile modular sofa in sand boucle faces the panoramic windows.
+
+6. SUSTAINABLE ELEMENTS: Low-VOC paints and locally sourced stone reduce the footprint.
+
+7. ROOM-BY-ROOM BREAKDOWN:
+Living Room. Electrical outlets are placed in floor boxes. The estimated budget is 400,000 AED.
+"""
+
+DESCRIPTION = SECTION * 10
+
+
+def test_extract_palette_keeps_names_and_hex_codes():
+    assert extract_palette(SECTION) == ["Ivory White #FFFFF0", "Champagne Gold #D4AF37"]
+
+
+def test_compaction_respects_budget_and_keeps_visual_details():
+    compacted = compact_description(DESCRIPTION, max_tokens=120)
+
+    assert estimate_tokens(compacted) <= 120
+    assert "#FFFFF0" in compacted
+    assert "Calacatta marble" in compacted
+    assert "chandelier" in compacted
+    assert "sofa" in compacted
+    # Technical details a render cannot show are dropped
+    assert "Electrical" not in compacted
+    assert "VOC" not in compacted
+
+
+def test_short_descriptions_are_unchanged():
+    assert compact_description("Minimal Japanese loft", max_tokens=100) == "Minimal Japanese loft"
+
+
+def test_budgets_are_per_model():
+    assert token_budget_for("dall-e-2") < token_budget_for("dall-e-3")
+    assert token_budget_for("imagen-3.0-generate-001") == token_budget_for("imagen")
+
+
+def test_compactor_caches_by_description_hash():
+    compactor = PromptCompactor(max_entries=2)
+
+    first = compactor.compact(DESCRIPTION, model="dall-e-3")
+    assert compactor.compact(DESCRIPTION, model="dall-e-3") == first
+    stats = compactor.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["compression_ratio"] < 0.5
+
+
+def test_image_prompt_uses_compacted_description():
+    full = get_image_generation_prompt(DESCRIPTION, model=None)
+    compacted = get_image_generation_prompt(DESCRIPTION, model="dall-e-3")
+
+    assert DESCRIPTION in full
+    assert len(compacted) < len(full) / 3
+    assert compacted.startswith("Create a photorealistic 3D render")
+
+
+def test_technical_keywords_match_whole_words():
+    description = (
+        "MATERIALS: An evocative marble floor that advocates calm luxury. "
+        "Low-VOC paints keep the walls healthy. Sustainable bamboo panels line the ceiling."
+    )
+    materials = " ".join(extract_visual_details(description).get("Materials", []))
+
+    assert "evocative marble floor" in materials
+    assert "VOC" not in materials
+    assert "Sustainable" not in materials
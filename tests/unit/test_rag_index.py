@@ -0,0 +1,104 @@
+import pytest
+
+faiss = pytest.importorskip("faiss")
+np = pytest.importorskip("numpy")
+
+from ai_modules.rag_engine import index_key, load_index, remove_stale_indexes, save_index
+
+
+def test_index_key_tracks_document_and_model(tmp_path):
+    docs = tmp_path / "code.txt"
+    docs.write_text("Maximum height 100m", encoding="utf-8")
+    key = index_key(str(docs), "all-MiniLM-L6-v2")
+
+    assert index_key(str(docs), "all-MiniLM-L6-v2") == key
+    assert index_key(str(docs), "all-mpnet-base-v2") != key
+    docs.write_text("Maximum height 120m", encoding="utf-8")
+    assert index_key(str(docs), "all-MiniLM-L6-v2") != key
+
+
+def test_saved_index_is_memory_mapped_back(tmp_path):
+    vectors = np.random.rand(3, 8).astype("float32")
+    index = faiss.IndexFlatL2(8)
+    index.add(vectors)
+    chunks = [{"page_content": f"Rule {i}", "metadata": {"source": "code.txt"}} for i in range(3)]
+
+    assert load_index(tmp_path / "abc") is None
+    save_index(tmp_path / "abc", index, chunks, "all-MiniLM-L6-v2")
+    loaded, loaded_chunks = load_index(tmp_path / "abc")
+
+    assert loaded_chunks == chunks
+    _, ids = loaded.search(vectors[1:2], 1)
+    assert ids[0][0] == 1
+    assert not [p for p in (tmp_path / "abc").iterdir() if p.name.startswith(".tmp-")]
+
+    (tmp_path / "old").mkdir()
+    remove_stale_indexes(tmp_path, keep="abc")
+    assert [p.name for p in tmp_path.iterdir()] == ["abc"]
+
+
+def test_repeated_queries_reuse_embeddings_and_results(tmp_path, monkeypatch):
+    from config.settings import settings
+    from ai_modules.rag_engine import RAGEngine
+
+    monkeypatch.setattr(settings, "rag_query_cache_size", 2)
+    embedded, searched = [], []
+
+    class Embeddings:
+        def embed_query(self, text):
+            embedded.append(text)
+            return [float(len(text))]
+
+    class Doc:
+        def __init__(self, page_content, metadata):
+            self.page_content, self.metadata = page_content, metadata
+
+    class Store:
+        def similarity_search_by_vector(self, vector, k):
+            searched.append((vector, k))
+            return [Doc(f"rule-{i}", {"source": "code.txt"}) for i in range(k)]
+
+    engine = RAGEngine(docs_path=str(tmp_path / "missing.txt"))
+    engine.db, engine.embeddings, engine.index_key = Store(), Embeddings(), "v1"
+
+    first = engine.query("Project: Villa.  Preferences: Marble")
+    assert [d.page_content for d in first] == ["rule-0", "rule-1", "rule-2"]
+    # Callers never share (or corrupt) the cached documents
+    first[0].metadata["source"] = "edited"
+    again = engine.query("project: villa. preferences: marble ")
+    assert [d.page_content for d in again] == ["rule-0", "rule-1", "rule-2"]
+    assert again[0].metadata == {"source": "code.txt"}
+    engine.query("Project: Villa. Preferences: Marble", k=1)
+    assert embedded == ["project: villa. preferences: marble"]
+    assert len(searched) == 2
+
+    # A rebuilt index invalidates both caches
+    engine.index_key = "v2"
+    engine.query("Project: Villa. Preferences: Marble")
+    assert len(embedded) == 2
+
+    stats = engine.get_cache_stats()
+    assert (stats["results"]["hits"], stats["embeddings"]["hits"]) == (1, 1)
+    assert stats["embeddings"]["size"] == 2
+
+
+def test_only_uncased_models_lowercase_queries():
+    from ai_modules.rag_engine import normalize_query
+
+    assert normalize_query(" Villa  in\nDubai ", "all-MiniLM-L6-v2") == "villa in dubai"
+    assert normalize_query(" Villa  in\nDubai ", "sentence-transformers/all-MiniLM-L6-v2") == "villa in dubai"
+    assert normalize_query(" Villa  in\nDubai ", "BAAI/bge-m3") == "Villa in Dubai"
+
+
+def test_query_stops_once_the_deadline_has_passed(tmp_path):
+    from ai_modules import deadline
+    from ai_modules.rag_engine import RAGEngine
+
+    class Embeddings:
+        def embed_query(self, text):
+            raise AssertionError("abandoned query must not embed")
+
+    engine = RAGEngine(docs_path=str(tmp_path / "missing.txt"))
+    engine.db, engine.embeddings, engine.index_key = object(), Embeddings(), "v1"
+    with deadline.deadline_scope(0):
+        assert engine.query("Project: Villa") == []
@@ -0,0 +1,154 @@
+import pytest
+
+from ai_modules.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ProviderResilience,
+    parse_duration,
+)
+
+
+def _provider(**overrides):
+    options = dict(
+        rate_per_second=0,
+        burst=1,
+        max_attempts=3,
+        base_delay=0.0,
+        max_delay=0.0,
+        failure_threshold=2,
+        recovery_timeout=60.0,
+    )
+    options.update(overrides)
+    return ProviderResilience("test", **options)
+
+
+class _Flaky:
+    """Fails a fixed number of times before succeeding"""
+
+    def __init__(self, failures, error=RuntimeError("503")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+def test_parse_duration_formats():
+    assert parse_duration("2") == 2.0
+    assert parse_duration("1s") == 1.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("soon") is None
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried():
+    provider = _provider(failure_threshold=5)
+    operation = _Flaky(failures=2)
+
+    result = await provider.execute(operation, classify=lambda e: (True, None))
+
+    assert result == "ok"
+    assert operation.calls == 3
+    assert provider.get_stats()["retries"] == 2
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_immediately():
+    provider = _provider()
+    operation = _Flaky(failures=1, error=ValueError("400"))
+
+    with pytest.raises(ValueError):
+        await provider.execute(operation, classify=lambda e: (False, None))
+
+    assert operation.calls == 1
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast():
+    provider = _provider(failure_threshold=2)
+    operation = _Flaky(failures=10)
+
+    with pytest.raises(RuntimeError):
+        await provider.execute(operation, classify=lambda e: (True, None))
+    assert provider.breaker.state == CircuitBreaker.OPEN
+    calls_before = operation.calls
+
+    with pytest.raises(CircuitOpenError):
+        await provider.execute(operation, classify=lambda e: (True, None))
+    assert operation.calls == calls_before
+    assert provider.get_stats()["short_circuited"] == 1
+
+
+def test_breaker_half_open_allows_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+
+    assert breaker.allow() is True  # half-open trial
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_past_the_deadline_releases_the_breaker():
+    import asyncio
+    from ai_modules import deadline
+
+    provider = _provider(failure_threshold=1, recovery_timeout=0.0)
+    provider.breaker.record_failure()
+    assert provider.breaker.state == CircuitBreaker.HALF_OPEN
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with deadline.deadline_scope(0.01):
+        with pytest.raises(deadline.DeadlineExceeded):
+            await provider.execute(slow, classify=lambda e: (True, None))
+    assert provider.breaker.state == CircuitBreaker.HALF_OPEN
+
+    # A cancelled trial is released too
+    task = asyncio.ensure_future(provider.execute(slow, classify=lambda e: (True, None)))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # The next call becomes the trial and closes the breaker
+    assert await provider.execute(_Flaky(failures=0), classify=lambda e: (True, None)) == "ok"
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_client_errors_opening_a_stream_do_not_trip_the_breaker(monkeypatch):
+    import httpx
+    from ai_modules import proxyapi_client as proxyapi_module
+
+    provider = _provider(failure_threshold=1)
+    monkeypatch.setattr(proxyapi_module, "proxyapi_resilience", provider)
+    monkeypatch.setattr(proxyapi_module.usage_log, "record", lambda *args, **kwargs: None)
+    statuses = [400, 503]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json={"error": "nope"})
+
+    client = proxyapi_module.ProxyAPIClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://proxy")
+    messages = [{"role": "user", "content": "Design a villa"}]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        [c async for c in client.stream_chat_completion("gpt-4", messages, use_cache=False)]
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+    assert provider.get_stats()["failures"] == 1
+
+    # A server error on stream open still counts against the provider
+    with pytest.raises(httpx.HTTPStatusError):
+        [c async for c in client.stream_chat_completion("gpt-4", messages, use_cache=False)]
+    await client.aclose()
+    assert provider.breaker.state == CircuitBreaker.OPEN
@@ -0,0 +1,61 @@
+import pytest
+
+from ai_modules.response_cache import ResponseCache, make_cache_key
+
+
+def test_cache_key_is_order_independent():
+    """Identical parameters produce the same key regardless of ordering"""
+    key_a = make_cache_key("chat_completion", model="gpt-4", temperature=0.7, max_tokens=10)
+    key_b = make_cache_key("chat_completion", max_tokens=10, model="gpt-4", temperature=0.7)
+    assert key_a == key_b
+    assert key_a != make_cache_key("chat_completion", model="gpt-4", temperature=0.2, max_tokens=10)
+
+
+@pytest.mark.asyncio
+async def test_memory_lru_eviction_and_counters():
+    """Least recently used entries are evicted once the memory tier is full"""
+    cache = ResponseCache(backend="memory", max_entries=2)
+
+    await cache.set("a", {"v": 1}, ttl=60)
+    await cache.set("b", {"v": 2}, ttl=60)
+    assert await cache.get("a", ttl=60) == {"v": 1}  # "a" becomes most recent
+    await cache.set("c", {"v": 3}, ttl=60)
+
+    assert await cache.get("b", ttl=60) is None
+    assert await cache.get("c", ttl=60) == {"v": 3}
+
+    stats = cache.get_stats()
+    assert stats["hits_memory"] == 2
+    assert stats["misses"] == 1
+    assert stats["memory_evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses():
+    cache = ResponseCache(backend="memory")
+    await cache.set("k", {"v": 1}, ttl=-1)
+    assert await cache.get("k", ttl=60) is None
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_serves_after_memory_is_cleared(tmp_path):
+    """Entries written to disk survive a cold in-process cache"""
+    cache = ResponseCache(backend="disk", cache_dir=tmp_path)
+    await cache.set("deadbeef", {"v": 1}, ttl=60)
+
+    cold = ResponseCache(backend="disk", cache_dir=tmp_path)
+    assert await cold.get("deadbeef", ttl=60) == {"v": 1}
+    assert cold.get_stats()["hits_tier"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tier_hits_are_promoted_for_their_remaining_time(tmp_path):
+    """A promoted entry expires from memory when it expires on disk"""
+    import time
+
+    await ResponseCache(backend="disk", cache_dir=tmp_path).set("deadbeef", {"v": 1}, ttl=60)
+
+    cold = ResponseCache(backend="disk", cache_dir=tmp_path)
+    assert await cold.get("deadbeef", ttl=3600) == {"v": 1}
+    expires_at, _ = cold._memory["deadbeef"]
+    assert expires_at <= time.time() + 60
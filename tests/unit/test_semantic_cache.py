@@ -0,0 +1,81 @@
+import re
+
+import pytest
+
+from ai_modules.semantic_cache import SemanticCache, request_scope, request_text
+
+VOCABULARY = ["modern", "luxury", "villa", "sqm", "classic", "apartment", "arabic", "minimalist"]
+
+
+def bag_of_words(texts):
+    """Tiny deterministic embedder: word counts over a fixed vocabulary"""
+    return [[re.findall(r"[a-z]+", text).count(word) + 0.01 for word in VOCABULARY] for text in texts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    pytest.importorskip("numpy")
+    pytest.importorskip("faiss")
+    return SemanticCache(tmp_path / "index", model_name="bag-of-words", threshold=0.9, embedder=bag_of_words)
+
+
+def test_scope_pins_numbers_and_options():
+    assert request_scope("Modern luxury", "villa 400 sqm", variants=1) == request_scope(
+        "400 sqm villa", "modern luxury style", variants=1
+    )
+    assert request_scope("Modern luxury", "villa 400 sqm") != request_scope("Modern luxury", "villa 200 sqm")
+    assert request_scope("Modern luxury", "villa 400 sqm", variants=1) != request_scope(
+        "Modern luxury", "villa 400 sqm", variants=2
+    )
+
+
+@pytest.mark.asyncio
+async def test_rephrased_request_hits(cache):
+    await cache.add(7, "Modern luxury", "villa 400 sqm", variants=1)
+
+    match = await cache.lookup("400 sqm villa", "modern luxury style", variants=1)
+    assert match["concept_id"] == 7
+    assert match["similarity"] >= 0.9
+
+    assert await cache.lookup("Classic arabic", "apartment 400 sqm", variants=1) is None
+    assert await cache.lookup("Modern luxury", "villa 200 sqm", variants=1) is None
+    assert cache.get_stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_index_persists_and_forgets(cache, tmp_path):
+    await cache.add(7, "Modern luxury", "villa 400 sqm")
+    await cache.add(8, "Classic arabic", "apartment 120 sqm")
+    # Entries are written in batches, not on every add
+    assert not (tmp_path / "index").exists()
+    assert cache.get_stats()["unsaved_changes"] is True
+    await cache.stop()
+    assert cache.get_stats()["saves"] == 1
+    assert cache.get_stats()["unsaved_changes"] is False
+
+    reloaded = SemanticCache(tmp_path / "index", model_name="bag-of-words", threshold=0.9, embedder=bag_of_words)
+    assert (await reloaded.lookup("Modern luxury", "villa 400 sqm"))["concept_id"] == 7
+
+    await reloaded.forget([7])
+    assert await reloaded.lookup("Modern luxury", "villa 400 sqm") is None
+
+    other_model = SemanticCache(tmp_path / "index", model_name="another-model", threshold=0.9, embedder=bag_of_words)
+    assert await other_model.lookup("Modern luxury", "villa 400 sqm") is None
+
+
+def test_request_text_normalises_whitespace_and_case():
+    assert request_text("  Modern   Luxury ", "Villa\n400 sqm") == "modern luxury. villa 400 sqm"
+
+
+def test_default_embedder_shares_the_rag_engine_model(monkeypatch):
+    from ai_modules import rag_engine
+    from ai_modules.semantic_cache import _default_embedder
+
+    class Model:
+        def embed_documents(self, texts):
+            return bag_of_words(texts)
+
+    model = Model()
+    monkeypatch.setitem(rag_engine._embedding_models, "all-MiniLM-L6-v2", model)
+    assert rag_engine.load_embeddings("all-MiniLM-L6-v2") is model
+    assert _default_embedder("all-MiniLM-L6-v2")(["villa"]) == bag_of_words(["villa"])
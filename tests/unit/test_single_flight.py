@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight, request_key
+
+
+def test_request_key_normalizes_whitespace_and_case():
+    a = request_key("generate", {"client_preferences": "Modern  Villa\n", "use_cache": True})
+    b = request_key("generate", {"use_cache": True, "client_preferences": "modern villa"})
+
+    assert a == b
+    assert a != request_key("generate-by-presets", {"client_preferences": "modern villa", "use_cache": True})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": calls}
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert calls == 1
+    assert all(r == {"id": 1} for r in results)
+    stats = flight.get_stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+    # Once finished, the next call runs again
+    await flight.do("k", work)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    flight = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.get_stats()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    leader = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "done"
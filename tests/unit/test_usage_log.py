@@ -0,0 +1,113 @@
+import json
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database.connection
+from database.connection import Base
+from database.models import AICall
+from ai_modules.proxyapi_client import ProxyAPIClient
+from ai_modules.usage_log import UsageLog, estimate_cost, usage_context, attribute, current_attribution
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/usage.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[AICall.__table__])
+    monkeypatch.setattr(database.connection, "SessionLocal", sessionmaker(bind=engine))
+    return UsageLog(flush_interval=60, flush_size=100, max_buffer=1000)
+
+
+def test_estimate_cost():
+    assert estimate_cost("gpt-4", prompt_tokens=1000, completion_tokens=500) == pytest.approx(0.06)
+    # Dated snapshots use the base model's price
+    assert estimate_cost("gpt-4o-2024-08-06", prompt_tokens=1_000_000) == pytest.approx(2.5)
+    assert estimate_cost("dall-e-3", images=2, quality="hd") == pytest.approx(0.16)
+    assert estimate_cost("unknown-model", prompt_tokens=1000) == 0.0
+
+
+def test_attribution_context():
+    assert current_attribution() == {"endpoint": None, "user_id": None, "project_id": None}
+    scope = {"method": "POST", "path": "/api/v1/estimation/7", "path_params": {"project_id": "7"}}
+    with usage_context(scope=scope, user_id=3):
+        assert current_attribution() == {"endpoint": "POST /api/v1/estimation/7", "user_id": 3, "project_id": 7}
+        attribute(project_id=9)
+        with usage_context(endpoint="job:generate"):
+            assert current_attribution() == {"endpoint": "job:generate", "user_id": 3, "project_id": 9}
+
+
+@pytest.mark.asyncio
+async def test_records_are_flushed_and_aggregated(log):
+    with usage_context(endpoint="POST /api/v1/design/generate", project_id=1):
+        log.record("proxyapi", "gpt-4", "chat", 1200.0, prompt_tokens=1000, completion_tokens=500)
+        log.record("proxyapi", "dall-e-3", "image", 8000.0, images=1)
+        log.record("proxyapi", "gpt-4", "chat", 0.0, outcome="cached")
+    with usage_context(endpoint="POST /api/v1/estimation/{project_id}", project_id=2):
+        log.record("gemini", "gemini-1.5-flash", "text", 900.0, outcome="timeout")
+
+    assert await log.flush() == 4
+    by_endpoint = {row["endpoint"]: row for row in log.aggregate_sync("endpoint")}
+    design = by_endpoint["POST /api/v1/design/generate"]
+    assert (design["calls"], design["succeeded"], design["cached"], design["failed"]) == (3, 2, 1, 0)
+    assert design["cost_usd"] == pytest.approx(0.1)
+    assert design["avg_latency_ms"] == pytest.approx(4600.0)
+    assert by_endpoint["POST /api/v1/estimation/{project_id}"]["failed"] == 1
+
+    by_model = {row["model"]: row for row in log.aggregate_sync("model")}
+    assert by_model["gpt-4"]["prompt_tokens"] == 1000
+    assert [row["project"] for row in log.aggregate_sync("project")] == [1, 2]
+    with pytest.raises(ValueError):
+        log.aggregate_sync("color")
+
+
+@pytest.mark.asyncio
+async def test_proxyapi_calls_record_provider_usage(monkeypatch):
+    from ai_modules import proxyapi_client as proxyapi_module
+
+    records = []
+    monkeypatch.setattr(proxyapi_module.usage_log, "record", lambda *args, **kwargs: records.append((args, kwargs)))
+    cache_calls = []
+
+    async def cache_get(key, ttl):
+        cache_calls.append("get")
+
+    async def cache_set(key, value, ttl):
+        cache_calls.append("set")
+
+    # Never touch the real cache (its disk tier lives in the working tree)
+    monkeypatch.setattr(proxyapi_module.response_cache, "get", cache_get)
+    monkeypatch.setattr(proxyapi_module.response_cache, "set", cache_set)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if not body.get("stream"):
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "Marble and brass"}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 4},
+            })
+        events = [
+            {"choices": [{"delta": {"content": "Marble"}, "finish_reason": None}]},
+            {"choices": [{"delta": {}, "finish_reason": "stop"}]},
+            {"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 2}},
+        ]
+        text = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=text, headers={"content-type": "text/event-stream"})
+
+    client = ProxyAPIClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://proxy")
+    messages = [{"role": "user", "content": "Design a villa"}]
+
+    await client.chat_completion("gpt-4", messages, use_cache=False)
+    chunks = [c async for c in client.stream_chat_completion("gpt-4", messages, use_cache=False)]
+    await client.aclose()
+
+    assert chunks == ["Marble"]
+    # use_cache=False neither reads nor writes the response cache
+    assert cache_calls == []
+    (chat_args, chat_kwargs), (stream_args, stream_kwargs) = records
+    assert chat_args[:3] == ("proxyapi", "gpt-4", "chat")
+    assert (chat_kwargs["prompt_tokens"], chat_kwargs["completion_tokens"]) == (12, 4)
+    assert stream_args[2] == "chat_stream"
+    assert (stream_kwargs["completion_tokens"], stream_kwargs["estimated_tokens"]) == (2, False)